@@ -9,6 +9,9 @@ from app.core.db import get_db
 from app.core.models import Dataset, RawRecord, Organization
 from app.deps import get_current_org_id
 from app.config import settings
+from app.core.services.aggregate_service import AggregateService
+from app.core.services.streaming_service import StreamingSignalService
+from app.core.services.signal_sources import record_spans
 
 router = APIRouter(prefix="/ingest", tags=["data ingestion"])
 
@@ -39,13 +42,18 @@ async def process_csv_file(dataset_id: int, org_id: int, db: Session):
                 # Read CSV
                 df = pd.read_csv(file_path)
                 
+                # Business-time span of each row, so signal reads can bound their periods in SQL
+                active_from, active_until = record_spans(df)
+                
                 # Convert to records
                 for index, row in df.iterrows():
                     raw_record = RawRecord(
                         dataset_id=dataset_id,
                         source_pk=str(index),
                         payload=json.dumps(row.to_dict()),
-                        status="processed"
+                        status="processed",
+                        active_from=active_from[index],
+                        active_until=active_until[index]
                     )
                     db.add(raw_record)
                 
@@ -55,6 +63,12 @@ async def process_csv_file(dataset_id: int, org_id: int, db: Session):
                 # Log error and continue with next file
                 print(f"Error processing {filename}: {str(e)}")
                 continue
+        
+        # Fold the new records into the daily signal aggregates
+        AggregateService().refresh(org_id, db)
+        
+        # Update streaming statistics and flag anomalies in the new records
+        StreamingSignalService().observe_records(org_id, db)
                 
     except Exception as e:
         print(f"Error in background task: {str(e)}")
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
 import json
 from app.core.db import get_db
 from app.core.models import Rule, Signal, Entity
-from app.core.schemas import RuleCreate, RuleResponse
+from app.core.schemas import RuleCreate, RuleResponse, RuleBacktestRequest
 from app.deps import get_current_org_id
 from app.core.services.rule_engine import RuleEngine
+from app.core.services.incremental_rules import incremental_evaluator
+from app.core.services.segment_service import SegmentService
+from app.core.services.rule_profiler import RuleProfile, rule_metrics
+from app.core.services.rule_compiler import compile_rule
+from app.core.services.backtest_service import BacktestService
+from app.core.services.rule_pack_service import RulePackError, RulePackService
 
 router = APIRouter(prefix="/playbooks", tags=["playbooks"])
 
@@ -48,6 +54,15 @@ async def list_rules(
     return rules
 
 
+@router.get("/metrics")
+async def get_rule_metrics(
+    limit: int = Query(None, ge=1),
+    org_id: int = Depends(get_current_org_id)
+):
+    """Aggregated timings of profiled evaluations in this process, slowest rules first"""
+    return rule_metrics.snapshot(org_id, limit)
+
+
 @router.get("/{rule_id}", response_model=RuleResponse)
 async def get_rule(
     rule_id: int,
@@ -88,8 +103,31 @@ async def toggle_rule(
     return {"message": f"Rule {'enabled' if rule.enabled else 'disabled'}", "rule": rule}
 
 
+@router.post("/{rule_id}/segment")
+async def segment_rule(
+    rule_id: int,
+    db: Session = Depends(get_db),
+    org_id: int = Depends(get_current_org_id)
+):
+    """Entities matching a rule across the latest per-entity signals"""
+    rule = db.query(Rule).filter(
+        Rule.id == rule_id,
+        Rule.org_id == org_id
+    ).first()
+    
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    
+    try:
+        return SegmentService().segment(rule, org_id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Rule cannot be evaluated: {str(e)}")
+
+
 @router.post("/evaluate")
 async def evaluate_rules(
+    incremental: bool = False,
+    profile: bool = False,
     db: Session = Depends(get_db),
     org_id: int = Depends(get_current_org_id)
 ):
@@ -105,18 +143,85 @@ async def evaluate_rules(
     if not active_rules:
         raise HTTPException(status_code=400, detail="No active rules found")
     
+    if incremental:
+        # Only signals since the org's previous incremental call, from any worker, are examined
+        # and only newly triggered rules returned
+        evaluation = incremental_evaluator.evaluate(org_id, active_rules, db)
+        return {
+            "message": f"Evaluated {len(active_rules)} rules against {evaluation['new_signals']} new signals",
+            **evaluation
+        }
+    
     # Get current signals
     signals = db.query(Signal).filter(
         Signal.org_id == org_id
     ).all()
     
     # Evaluate rules
-    results = rule_engine.evaluate_rules(active_rules, signals, db)
+    rule_profile = RuleProfile(org_id) if profile else None
+    results = rule_engine.evaluate_rules(active_rules, signals, db, profile=rule_profile)
     
-    return {
+    response = {
         "message": f"Evaluated {len(active_rules)} rules",
         "results": results
     }
+    if rule_profile is not None:
+        response["profile"] = rule_profile.report()
+    return response
+
+
+@router.post("/backtest")
+async def backtest_rule(
+    request: RuleBacktestRequest,
+    db: Session = Depends(get_db),
+    org_id: int = Depends(get_current_org_id)
+):
+    """Replay a stored rule or a draft definition over signal history, period by period"""
+    if (request.rule_id is None) == (request.definition is None):
+        raise HTTPException(status_code=400, detail="Provide either rule_id or definition")
+    
+    if request.rule_id is not None:
+        rule = db.query(Rule).filter(
+            Rule.id == request.rule_id,
+            Rule.org_id == org_id
+        ).first()
+        
+        if not rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+    else:
+        rule = Rule(name=request.definition.get("name", "Draft rule"), definition=json.dumps(request.definition))
+    
+    try:
+        # A private compile, so the replay leaves the cached rule's condition statistics alone
+        compiled = compile_rule(rule)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rule definition: {str(e)}")
+    
+    try:
+        return BacktestService().backtest(
+            compiled, org_id, request.start, request.end, request.period, db, entities=request.entities
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/import")
+async def import_rule_pack(
+    file: UploadFile = File(...),
+    replace: bool = False,
+    db: Session = Depends(get_db),
+    org_id: int = Depends(get_current_org_id)
+):
+    """Import a YAML or JSON rule pack; nothing is stored unless every rule is valid"""
+    content = await file.read()
+    try:
+        return RulePackService().import_pack(
+            org_id, content.decode("utf-8"), db, filename=file.filename, replace=replace
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Rule pack must be UTF-8 text")
+    except RulePackError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "errors": e.errors})
 
 
 @router.get("/categories/available")
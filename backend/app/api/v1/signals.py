@@ -1,41 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timedelta
 import json
 from app.core.db import get_db
 from app.core.models import Signal, RawRecord, Dataset, Entity
-from app.core.schemas import SignalCreate, SignalResponse
+from app.core.schemas import SignalCreate, SignalResponse, SignalComputeResponse
 from app.deps import get_current_org_id
 from app.core.services.signal_service import SignalService
+from app.core.services.signal_registry import SIGNAL_REGISTRY
+from app.core.services.signal_history import SignalHistoryService, RESOLUTIONS
+from app.core.services.streaming_service import STREAMING_SIGNAL_KINDS
 
 router = APIRouter(prefix="/signals", tags=["signals"])
 
 
-@router.post("/compute", response_model=List[SignalResponse])
+@router.post("/compute", response_model=SignalComputeResponse)
 async def compute_signals(
     dataset_id: int = None,
     period_days: int = 90,
+    kinds: List[str] = Query(None),
     db: Session = Depends(get_db),
     org_id: int = Depends(get_current_org_id)
 ):
-    """Compute signals for the organization"""
+    """Compute signals for the organization, optionally only the given kinds"""
     signal_service = SignalService()
     
+    unknown = [kind for kind in kinds or [] if kind not in SIGNAL_REGISTRY]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown signal kinds: {', '.join(unknown)}")
+    
     # Set time period
     period_end = datetime.utcnow()
     period_start = period_end - timedelta(days=period_days)
     
     # Compute signals
-    signals = signal_service.compute_signals(
+    run = signal_service.run_signals(
         org_id=org_id,
         period_start=period_start,
         period_end=period_end,
         dataset_id=dataset_id,
-        db=db
+        db=db,
+        kinds=kinds
     )
     
-    return signals
+    return {
+        "signals": run.signals,
+        "errors": [
+            {"kind": error.kind, "stage": error.stage, "message": error.message}
+            for error in run.errors
+        ]
+    }
 
 
 @router.get("/", response_model=List[SignalResponse])
@@ -43,19 +58,49 @@ async def list_signals(
     kind: str = None,
     limit: int = 50,
     offset: int = 0,
+    before_id: int = None,
     db: Session = Depends(get_db),
     org_id: int = Depends(get_current_org_id)
 ):
-    """List signals for the organization"""
+    """List signals for the organization, newest first; pass the last id seen as before_id to page"""
     query = db.query(Signal).filter(Signal.org_id == org_id)
     
     if kind:
         query = query.filter(Signal.kind == kind)
     
-    signals = query.order_by(Signal.created_at.desc()).offset(offset).limit(limit).all()
+    # Keyset paging seeks straight to the page instead of skipping offset rows
+    if before_id is not None:
+        query = query.filter(Signal.id < before_id)
+    
+    signals = query.order_by(Signal.id.desc()).offset(offset).limit(limit).all()
     return signals
 
 
+@router.get("/history")
+async def get_signal_history(
+    kind: str,
+    metric: str = "score",
+    resolution: str = "day",
+    days: int = 365,
+    db: Session = Depends(get_db),
+    org_id: int = Depends(get_current_org_id)
+):
+    """Get downsampled history of a signal metric from the rollups"""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Resolution must be one of: {', '.join(RESOLUTIONS)}")
+    
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    points = SignalHistoryService().history(org_id, kind, metric, resolution, start, end, db)
+    
+    return {
+        "kind": kind,
+        "metric": metric,
+        "resolution": resolution,
+        "points": points
+    }
+
+
 @router.get("/{signal_id}", response_model=SignalResponse)
 async def get_signal(
     signal_id: int,
@@ -86,6 +131,7 @@ async def create_signal(
         org_id=org_id
     )
     db.add(db_signal)
+    SignalHistoryService().record(org_id, [db_signal], db)
     db.commit()
     db.refresh(db_signal)
     return db_signal
@@ -94,15 +140,13 @@ async def create_signal(
 @router.get("/types/available")
 async def get_available_signal_types():
     """Get list of available signal types"""
+    signal_types = list(SIGNAL_REGISTRY)
+    for kind in ["market_headwind", "operational_efficiency"] + STREAMING_SIGNAL_KINDS:
+        if kind not in signal_types:
+            signal_types.append(kind)
+    
     return {
-        "signal_types": [
-            "pipeline_velocity_delta",
-            "late_invoice_risk", 
-            "stalled_deal_motif",
-            "support_churn_flag",
-            "market_headwind",
-            "revenue_trend",
-            "customer_satisfaction",
-            "operational_efficiency"
-        ]
+        "signal_types": signal_types,
+        "computable": list(SIGNAL_REGISTRY),
+        "streaming": STREAMING_SIGNAL_KINDS
     }
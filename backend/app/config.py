@@ -25,6 +25,32 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
     
+    # Entity resolution index snapshots
+    RESOLVER_INDEX_DIR: str = "./resolver_index"
+    RESOLVER_DELETION_CHECK_SECONDS: int = 300  # how often catch-up looks for deleted entities
+    
+    # Signal computation
+    SIGNAL_WORKERS: int = 4
+    
+    # Periodic signal recomputation (runs in every API process that enables it)
+    SIGNAL_SCHEDULER_ENABLED: bool = False
+    SIGNAL_SCHEDULE_INTERVAL_SECONDS: int = 3600
+    SIGNAL_SCHEDULE_PERIOD_DAYS: int = 90
+    SIGNAL_SCHEDULER_CONCURRENCY: int = 2
+    
+    # Trained signal models
+    MODEL_DIR: str = "./models"
+    
+    # Compiled rule evaluators kept per process
+    RULE_CACHE_SIZE: int = 10000
+    RULE_REORDER_INTERVAL: int = 1000  # evaluations between re-sorting a rule's conditions
+    
+    # Streaming anomaly detection
+    STREAMING_ALPHA: float = 0.1  # EWMA smoothing factor
+    STREAMING_Z_THRESHOLD: float = 3.0
+    STREAMING_WARMUP: int = 10  # observations before a subject can flag anomalies
+    STREAMING_LOOKBACK_DAYS: int = 30  # older events update statistics without raising signals
+    
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8080"]
     
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from typing import List
 from app.config import settings
 import os
 
@@ -30,3 +31,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def bulk_insert(db: Session, objects: List, chunk_size: int = 500) -> List:
+    """Insert objects in a single transaction and reload them with one query per chunk"""
+    if not objects:
+        return []
+    
+    try:
+        db.add_all(objects)
+        db.flush()
+        ids = [obj.id for obj in objects]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    # Committing expired the objects; reload them in bulk instead of one refresh each
+    model = type(objects[0])
+    for start in range(0, len(ids), chunk_size):
+        db.query(model).filter(model.id.in_(ids[start:start + chunk_size])).all()
+    
+    return objects
@@ -1,3 +1,4 @@
+from sqlalchemy.orm import relationship
 from .base import BaseModel
 from .org import Organization
 from .dataset import Dataset
@@ -9,6 +10,11 @@ from .rule import Rule
 from .signal import Signal
 from .audit import AuditLog
 from .raw_record import RawRecord
+from .daily_aggregate import DailyAggregate
+from .streaming_stat import StreamingStat
+from .signal_rollup import SignalRollup
+from .empty_signal import EmptySignal
+from .rule_evaluation_state import RuleEvaluationState
 
 # Establish relationships
 Organization.datasets = relationship("Dataset", back_populates="organization")
@@ -19,6 +25,11 @@ Organization.narratives = relationship("Narrative", back_populates="organization
 Organization.rules = relationship("Rule", back_populates="organization")
 Organization.signals = relationship("Signal", back_populates="organization")
 Organization.audit_logs = relationship("AuditLog", back_populates="organization")
+Organization.daily_aggregates = relationship("DailyAggregate", back_populates="organization")
+Organization.streaming_stats = relationship("StreamingStat", back_populates="organization")
+Organization.signal_rollups = relationship("SignalRollup", back_populates="organization")
+Organization.empty_signals = relationship("EmptySignal", back_populates="organization")
+Organization.rule_evaluation_states = relationship("RuleEvaluationState", back_populates="organization")
 
 Entity.audit_actions = relationship("AuditLog", back_populates="actor")
 
@@ -33,5 +44,10 @@ __all__ = [
     "Rule",
     "Signal",
     "AuditLog",
-    "RawRecord"
+    "RawRecord",
+    "DailyAggregate",
+    "StreamingStat",
+    "SignalRollup",
+    "EmptySignal",
+    "RuleEvaluationState"
 ]
@@ -9,7 +9,7 @@ class AuditLog(BaseModel):
     action = Column(String, nullable=False)  # create, read, update, delete, etc.
     resource_type = Column(String, nullable=False)  # entity, narrative, signal, etc.
     resource_id = Column(Integer, nullable=True)  # ID of affected resource
-    metadata = Column(Text, default="{}")  # JSON string of additional context
+    meta = Column("metadata", Text, default="{}")  # JSON string of additional context ("metadata" is reserved by SQLAlchemy)
     
     # Relationships
     organization = relationship("Organization", back_populates="audit_logs")
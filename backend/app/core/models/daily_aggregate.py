@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Float, Date, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.models.base import BaseModel
+
+
+class DailyAggregate(BaseModel):
+    org_id = Column(Integer, ForeignKey("organization.id"), nullable=False)
+    metric = Column(String, nullable=False)  # deals_closed, invoices_due, tickets_opened, etc.
+    day = Column(Date, nullable=False)
+    count = Column(Integer, default=0)  # number of source rows in the bucket
+    total = Column(Float, default=0.0)  # sum of the metric value (amount, cycle days, etc.)
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "metric", "day", name="uq_dailyaggregate_bucket"),
+    )
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="daily_aggregates")
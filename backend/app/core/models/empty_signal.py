@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.models.base import BaseModel
+
+
+class EmptySignal(BaseModel):
+    org_id = Column(Integer, ForeignKey("organization.id"), nullable=False)
+    kind = Column(String, nullable=False)  # signal kind whose compute had too little data for a result
+    period_bucket = Column(String, nullable=False)  # period length and end day, e.g. 90d@2024-01-31
+    data_version = Column(String, nullable=False)  # hash of the ingestion watermarks the compute read
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "kind", "period_bucket", "data_version", name="uq_emptysignal_version"),
+    )
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="empty_signals")
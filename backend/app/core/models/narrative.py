@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Text, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, Text, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.models.base import BaseModel
 
@@ -12,6 +12,11 @@ class Narrative(BaseModel):
     generated_at = Column(DateTime, nullable=False)
     author = Column(String, default="ai")  # ai or analyst
     status = Column(String, default="active")  # active, archived, dismissed
+    fingerprint = Column(String, nullable=True)  # hash of source, evidence and period; null for analyst narratives
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "fingerprint", name="uq_narrative_fingerprint"),
+    )
     
     # Relationships
     organization = relationship("Organization", back_populates="narratives")
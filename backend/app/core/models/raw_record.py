@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, ForeignKey, Text, DateTime
 from sqlalchemy.orm import relationship
 from app.core.models.base import BaseModel
 
@@ -9,6 +9,9 @@ class RawRecord(BaseModel):
     payload = Column(Text, nullable=False)  # JSON string of raw data
     status = Column(String, default="pending")  # pending, processed, error
     error_message = Column(Text, nullable=True)
+    aggregate_batch = Column(String, nullable=True, index=True)  # refresh that folded the record into daily aggregates
+    active_from = Column(DateTime, nullable=True, index=True)  # business time the record becomes relevant to a period
+    active_until = Column(DateTime, nullable=True, index=True)  # and stops being relevant; null when unbounded
     
     # Relationships
     dataset = relationship("Dataset", back_populates="raw_records")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, ForeignKey, Text, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.models.base import BaseModel
+
+
+class RuleEvaluationState(BaseModel):
+    org_id = Column(Integer, ForeignKey("organization.id"), nullable=False)
+    watermark = Column(Integer, default=0)  # highest signal id incremental evaluation has folded in
+    triggered = Column(Text, default="{}")  # JSON rule id -> rule version of the rules that held at the watermark
+    revision = Column(Integer, default=0)  # bumped on every save; concurrent evaluations compare-and-swap on it
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", name="uq_ruleevaluationstate_org"),
+    )
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="rule_evaluation_states")
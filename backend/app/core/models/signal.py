@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Float, Text
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Float, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.models.base import BaseModel
 
@@ -11,6 +11,12 @@ class Signal(BaseModel):
     payload = Column(Text, default="{}")  # JSON string of signal data
     score = Column(Float, default=0.0)  # normalized score 0-1
     threshold = Column(Float, default=0.5)  # threshold for triggering
+    period_bucket = Column(String, nullable=True)  # period length and end day, e.g. 90d@2024-01-31
+    data_version = Column(String, nullable=True)  # hash of the ingestion watermarks the signal was computed from
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "kind", "period_bucket", "data_version", name="uq_signal_version"),
+    )
     
     # Relationships
     organization = relationship("Organization", back_populates="signals")
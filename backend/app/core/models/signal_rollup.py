@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Float, DateTime, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.models.base import BaseModel
+
+
+class SignalRollup(BaseModel):
+    org_id = Column(Integer, ForeignKey("organization.id"), nullable=False)
+    kind = Column(String, nullable=False)  # signal kind
+    metric = Column(String, nullable=False)  # score or a numeric payload field
+    resolution = Column(String, nullable=False)  # hour, day, week
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, default=0)
+    sum = Column(Float, default=0.0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+    last = Column(Float, nullable=True)  # value of the latest signal in the bucket
+    last_at = Column(DateTime, nullable=True)  # period end of that signal
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "kind", "metric", "resolution", "bucket_start", name="uq_signalrollup_bucket"),
+    )
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="signal_rollups")
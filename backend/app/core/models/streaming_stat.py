@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Float, Date, DateTime, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.models.base import BaseModel
+
+
+class StreamingStat(BaseModel):
+    org_id = Column(Integer, ForeignKey("organization.id"), nullable=False)
+    detector = Column(String, nullable=False)  # invoice_amount, ticket_volume, deal_stage_dwell
+    subject = Column(String, nullable=False)  # org, account:<id>, stage:<name>, deal:<id>
+    count = Column(Integer, default=0)  # observations folded into the running statistics
+    mean = Column(Float, default=0.0)  # exponentially weighted mean
+    variance = Column(Float, default=0.0)  # exponentially weighted variance
+    last_value = Column(Float, nullable=True)
+    last_seen_at = Column(DateTime, nullable=True)  # time of the last observation (stage entry for deals)
+    bucket_start = Column(Date, nullable=True)  # open day of a volume counter
+    bucket_count = Column(Integer, default=0)  # events counted in the open day
+    state = Column(String, nullable=True)  # current deal stage, or the day a spike was last flagged
+    last_record_id = Column(Integer, default=0)  # highest RawRecord id observed by the detector
+    
+    __table_args__ = (
+        UniqueConstraint("org_id", "detector", "subject", name="uq_streamingstat_subject"),
+    )
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="streaming_stats")
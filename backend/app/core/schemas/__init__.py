@@ -3,8 +3,8 @@ from .org import OrganizationCreate, OrganizationResponse
 from .dataset import DatasetCreate, DatasetResponse
 from .entity import EntityCreate, EntityResponse, EntitySearch
 from .narrative import NarrativeCreate, NarrativeResponse
-from .signal import SignalCreate, SignalResponse
-from .rule import RuleCreate, RuleResponse
+from .signal import SignalCreate, SignalResponse, SignalComputeError, SignalComputeResponse
+from .rule import RuleCreate, RuleResponse, RuleBacktestRequest
 
 __all__ = [
     "Token",
@@ -21,6 +21,9 @@ __all__ = [
     "NarrativeResponse",
     "SignalCreate",
     "SignalResponse",
+    "SignalComputeError",
+    "SignalComputeResponse",
     "RuleCreate",
-    "RuleResponse"
+    "RuleResponse",
+    "RuleBacktestRequest"
 ]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from datetime import datetime
 
 
 class RuleCreate(BaseModel):
@@ -19,3 +20,12 @@ class RuleResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class RuleBacktestRequest(BaseModel):
+    rule_id: Optional[int] = None  # a stored rule, or
+    definition: Optional[Dict[str, Any]] = None  # a draft definition
+    start: datetime
+    end: datetime
+    period: str = "week"  # day, week or month
+    entities: bool = False  # also count matching entities per period
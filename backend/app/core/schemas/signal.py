@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -23,3 +23,14 @@ class SignalResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class SignalComputeError(BaseModel):
+    kind: str
+    stage: str
+    message: str
+
+
+class SignalComputeResponse(BaseModel):
+    signals: List[SignalResponse]
+    errors: List[SignalComputeError]
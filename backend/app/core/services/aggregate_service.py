@@ -0,0 +1,192 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import List, Dict, Tuple, Optional
+from datetime import datetime, date, timedelta
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from app.core.models import DailyAggregate, Dataset, RawRecord
+from app.core.services.signal_sources import SOURCES, load_source_frame
+
+WON_DEAL_STAGES = ["closed_won", "won"]
+HIGH_SEVERITIES = ["high", "critical"]
+RESOLVED_STATUSES = ["resolved", "closed"]
+RATING_SCALES = [1.0, 5.0, 10.0, 100.0]  # scales ticket ratings are given on, the largest one catch-all
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+UPSERT_CHUNK_SIZE = 500  # rows per statement, well under SQLite's bound-parameter limit
+
+# Refreshes of one org in this process run one at a time
+_refresh_locks: Dict[int, threading.Lock] = {}
+_refresh_locks_guard = threading.Lock()
+
+
+class AggregateService:
+    """Service maintaining per-org daily metric buckets folded incrementally from raw records"""
+    
+    def refresh(self, org_id: int, db: Session) -> int:
+        """Fold processed raw records not yet aggregated into the daily buckets"""
+        with self._org_lock(org_id):
+            try:
+                batch = self._claim_records(org_id, db)
+                if batch is None:
+                    return 0
+                
+                folded = 0
+                for source in SOURCES:
+                    frame = load_source_frame(org_id, source, db, aggregate_batch=batch)
+                    if frame.empty:
+                        continue
+                    self._merge_buckets(org_id, self._bucket_source(source, frame), db)
+                    folded += len(frame)
+                
+                # Claims and bucket increments commit together, so a failed refresh leaves records unclaimed
+                db.commit()
+                return folded
+            except Exception:
+                db.rollback()
+                raise
+    
+    def _org_lock(self, org_id: int) -> threading.Lock:
+        """Lock serializing an org's refreshes within the process"""
+        with _refresh_locks_guard:
+            return _refresh_locks.setdefault(org_id, threading.Lock())
+    
+    def _claim_records(self, org_id: int, db: Session) -> Optional[str]:
+        """Mark every unaggregated processed record of the org with a new batch id, or None if there are none"""
+        # The conditional UPDATE is atomic per row: a record claimed by a concurrent refresh,
+        # in this or another process, no longer matches and is never folded twice.
+        # Records processed late are picked up whenever they appear, whatever their id.
+        datasets = db.query(Dataset.id).filter(Dataset.org_id == org_id, Dataset.is_active == True)
+        unclaimed = db.query(RawRecord).filter(
+            RawRecord.dataset_id.in_(datasets.scalar_subquery()),
+            RawRecord.status == "processed",
+            RawRecord.aggregate_batch == None
+        )
+        # Most refreshes find nothing new; checking first keeps them read-only
+        if not db.query(unclaimed.exists()).scalar():
+            return None
+        
+        batch = uuid.uuid4().hex
+        claimed = unclaimed.update({RawRecord.aggregate_batch: batch}, synchronize_session=False)
+        return batch if claimed else None
+    
+    def load_frame(self, org_id: int, start: datetime, end: datetime, db: Session,
+                   metrics: List[str] = None) -> pd.DataFrame:
+        """Load the buckets covering [start, end) in one query"""
+        first_day, last_day = self.day_range(start, end)
+        query = db.query(
+            DailyAggregate.metric, DailyAggregate.day, DailyAggregate.count, DailyAggregate.total
+        ).filter(
+            DailyAggregate.org_id == org_id,
+            DailyAggregate.day >= first_day,
+            DailyAggregate.day <= last_day
+        )
+        if metrics:
+            query = query.filter(DailyAggregate.metric.in_(metrics))
+        
+        frame = pd.DataFrame(query.all(), columns=["metric", "day", "count", "total"])
+        frame["day"] = pd.to_datetime(frame["day"])
+        frame["count"] = frame["count"].astype("int64")
+        frame["total"] = frame["total"].astype("float64")
+        return frame
+    
+    def window(self, frame: pd.DataFrame, metric: str, start: datetime, end: datetime) -> Tuple[int, float]:
+        """Sum (count, total) of a metric's buckets over [start, end)"""
+        first_day, last_day = self.day_range(start, end)
+        mask = (
+            (frame["metric"] == metric)
+            & (frame["day"] >= pd.Timestamp(first_day))
+            & (frame["day"] <= pd.Timestamp(last_day))
+        )
+        return int(frame.loc[mask, "count"].sum()), float(frame.loc[mask, "total"].sum())
+    
+    def day_range(self, start: datetime, end: datetime) -> Tuple[date, date]:
+        """Inclusive day buckets whose midnight falls inside [start, end)"""
+        first_day = start.date() if start.time() == datetime.min.time() else start.date() + timedelta(days=1)
+        last_day = end.date() - timedelta(days=1) if end.time() == datetime.min.time() else end.date()
+        return first_day, last_day
+    
+    def _bucket_source(self, source: str, frame: pd.DataFrame) -> pd.DataFrame:
+        """Group one source frame into (metric, day) buckets"""
+        parts = [self._daily(f"{source}_records", frame["ingested_at"], None)]
+        
+        if source == "deals":
+            closed = frame["closed_at"]
+            cycle_days = (closed - frame["created_at"]).dt.total_seconds() / 86400
+            won = frame["stage"].str.lower().isin(WON_DEAL_STAGES).fillna(False)
+            parts.append(self._daily("deals_closed", closed.where(cycle_days.notna()), cycle_days))
+            parts.append(self._daily("deals_won", closed.where(won), frame["amount"]))
+        
+        elif source == "invoices":
+            due = frame["due_date"]
+            paid = frame["paid_at"]
+            paid_late = (paid.notna() & (paid > due)).fillna(False)
+            # Windows place invoices without a due date on their issue date, as the raw path does
+            parts.append(self._daily("invoices_due", due.fillna(frame["issued_at"]), frame["amount"]))
+            parts.append(self._daily("invoices_paid_late", due.where(paid_late), frame["amount"]))
+            parts.append(self._daily("invoices_unpaid", due.where(paid.isna()), frame["amount"]))
+        
+        elif source == "tickets":
+            opened = frame["opened_at"]
+            high = frame["severity"].str.lower().isin(HIGH_SEVERITIES).fillna(False)
+            unresolved = ~frame["status"].str.lower().isin(RESOLVED_STATUSES).fillna(False)
+            parts.append(self._daily("tickets_opened", opened, None))
+            parts.append(self._daily("tickets_high_severity", opened.where(high), None))
+            parts.append(self._daily("tickets_unresolved", opened.where(unresolved), None))
+            
+            # Ratings also fold per scale, so a window can tell its scale and dissatisfied count like the raw path
+            ratings = frame["csat"]
+            parts.append(self._daily("tickets_rated", opened.where(ratings.notna()), ratings.clip(0, RATING_SCALES[-1])))
+            for scale in RATING_SCALES:
+                if scale < RATING_SCALES[-1]:
+                    parts.append(self._daily(f"tickets_rated_over_{scale:g}", opened.where(ratings > scale), None))
+                parts.append(self._daily(f"tickets_dissatisfied_{scale:g}", opened.where(ratings < scale / 2), None))
+        
+        return pd.concat(parts, ignore_index=True)
+    
+    def _daily(self, metric: str, timestamps: pd.Series, values: Optional[pd.Series]) -> pd.DataFrame:
+        """Bucket rows with a timestamp by day: count and value total"""
+        mask = timestamps.notna()
+        rows = pd.DataFrame({
+            "day": timestamps[mask].dt.normalize(),
+            "value": values[mask].fillna(0.0) if values is not None else np.zeros(int(mask.sum())),
+        })
+        grouped = rows.groupby("day").agg(
+            count=("value", "size"),
+            total=("value", "sum"),
+        ).reset_index()
+        grouped.insert(0, "metric", metric)
+        return grouped
+    
+    def _merge_buckets(self, org_id: int, buckets: pd.DataFrame, db: Session):
+        """Add bucket deltas onto the stored rows with one atomic upsert, creating missing ones"""
+        if buckets.empty:
+            return
+        
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            raise ValueError(f"Daily aggregates need an upsert-capable database, not {dialect}")
+        
+        now = datetime.utcnow()
+        rows = [
+            {"org_id": org_id, "metric": metric, "day": day, "count": int(count), "total": float(total),
+             "created_at": now, "updated_at": now}
+            for metric, day, count, total in zip(
+                buckets["metric"], buckets["day"].dt.date, buckets["count"], buckets["total"]
+            )
+        ]
+        
+        # The increment happens in the database, so concurrent refreshes add up instead of overwriting
+        table = DailyAggregate.__table__
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            statement = UPSERT_DIALECTS[dialect](table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.org_id, table.c.metric, table.c.day],
+                set_={
+                    "count": table.c.count + statement.excluded.count,
+                    "total": table.c.total + statement.excluded.total,
+                    "updated_at": statement.excluded.updated_at,
+                }
+            )
+            db.execute(statement)
@@ -0,0 +1,185 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from app.config import settings
+from app.core.services.signal_sources import load_entity_events, INVOICE_EVENT_TYPES, TICKET_EVENT_TYPES
+
+MODEL_NAME = "churn_propensity"
+FEATURE_WINDOW_DAYS = 180  # history each entity's features are built from
+CHURN_EVENT_TYPES = ["churn", "churned", "cancellation", "cancelled"]
+FEATURE_COLUMNS = [
+    "events_30d",
+    "events_90d",
+    "events_180d",
+    "tickets_90d",
+    "overdue_invoices",
+    "overdue_amount",
+    "days_since_last_event",
+    "tenure_days",
+    "activity_trend",
+]
+
+
+def load_feature_events(org_id: int, db: Session, as_of: datetime, horizon_days: int = 0) -> pd.DataFrame:
+    """Events feeding features as of `as_of`, plus the label horizon after it, in one query"""
+    start = as_of - timedelta(days=FEATURE_WINDOW_DAYS)
+    return load_entity_events(org_id, db, start, as_of + timedelta(days=horizon_days))
+
+
+def build_churn_features(events: pd.DataFrame, as_of: datetime) -> pd.DataFrame:
+    """Per-entity feature matrix as of `as_of`, indexed by entity id, in one group-by"""
+    as_of = pd.Timestamp(as_of)
+    events = events[events["timestamp"] < as_of]
+    
+    # Entities that already churned are not scored
+    churned = events.loc[events["event_type"].isin(CHURN_EVENT_TYPES), "entity_id"].unique()
+    events = events[~events["entity_id"].isin(churned)]
+    if events.empty:
+        return pd.DataFrame(columns=FEATURE_COLUMNS, dtype=float)
+    
+    age_days = (as_of - events["timestamp"]).dt.total_seconds() / 86400
+    invoice = events["event_type"].isin(INVOICE_EVENT_TYPES)
+    paid = events["paid_at"].notna() & (events["paid_at"] < as_of)
+    overdue = (invoice & ~paid & (events["due_date"] < as_of)).fillna(False)
+    recent = age_days < FEATURE_WINDOW_DAYS
+    
+    frame = pd.DataFrame({
+        "entity_id": events["entity_id"],
+        "events_30d": recent & (age_days < 30),
+        "events_90d": recent & (age_days < 90),
+        "events_180d": recent,
+        "tickets_90d": (age_days < 90) & events["event_type"].isin(TICKET_EVENT_TYPES),
+        "overdue_invoices": overdue,
+        "overdue_amount": events["amount"].where(overdue, 0.0).fillna(0.0),
+        "age_days": age_days.where(recent),
+    })
+    features = frame.groupby("entity_id").agg(
+        events_30d=("events_30d", "sum"),
+        events_90d=("events_90d", "sum"),
+        events_180d=("events_180d", "sum"),
+        tickets_90d=("tickets_90d", "sum"),
+        overdue_invoices=("overdue_invoices", "sum"),
+        overdue_amount=("overdue_amount", "sum"),
+        days_since_last_event=("age_days", "min"),
+        tenure_days=("age_days", "max"),
+    ).sort_index()
+    
+    # Entities only present through old invoices have no recent activity at all
+    features["days_since_last_event"] = features["days_since_last_event"].fillna(FEATURE_WINDOW_DAYS)
+    features["tenure_days"] = features["tenure_days"].fillna(FEATURE_WINDOW_DAYS)
+    features["activity_trend"] = features["events_30d"] / (features["events_90d"] / 3 + 1)
+    return features[FEATURE_COLUMNS].astype(float)
+
+
+def build_churn_labels(events: pd.DataFrame, entity_ids: pd.Index, as_of: datetime,
+                       horizon_days: int) -> np.ndarray:
+    """1 for entities with a churn event within the horizon after `as_of`"""
+    as_of = pd.Timestamp(as_of)
+    horizon_end = as_of + pd.Timedelta(days=horizon_days)
+    churn = events["event_type"].isin(CHURN_EVENT_TYPES) & (events["timestamp"] >= as_of) & (events["timestamp"] < horizon_end)
+    return entity_ids.isin(events.loc[churn, "entity_id"].unique()).astype(int)
+
+
+class ChurnModelTrainer:
+    """Offline trainer fitting a churn propensity model from an org's event history"""
+    
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.MODEL_DIR
+    
+    def train(self, org_id: int, db: Session, as_of: datetime = None, horizon_days: int = 90) -> Dict[str, Any]:
+        """Fit on features as of `as_of` labelled by churn in the following horizon and save the model"""
+        as_of = as_of or datetime.utcnow() - timedelta(days=horizon_days)
+        
+        events = load_feature_events(org_id, db, as_of, horizon_days)
+        features = build_churn_features(events, as_of)
+        labels = build_churn_labels(events, features.index, as_of, horizon_days)
+        
+        positives = int(labels.sum())
+        if positives < 2 or positives > len(labels) - 2:
+            raise ValueError(f"Need churned and retained entities to train; got {positives} of {len(labels)}")
+        
+        model = make_pipeline(StandardScaler(), LogisticRegression(class_weight="balanced", max_iter=1000))
+        
+        # Hold out a stratified sample to report ranking quality
+        x_train, x_test, y_train, y_test = train_test_split(
+            features.to_numpy(), labels, test_size=0.25, stratify=labels, random_state=0
+        )
+        model.fit(x_train, y_train)
+        auc = float(roc_auc_score(y_test, model.predict_proba(x_test)[:, 1]))
+        
+        # Refit on everything for the saved model
+        model.fit(features.to_numpy(), labels)
+        
+        version = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        metadata = {
+            "name": MODEL_NAME,
+            "version": version,
+            "trained_at": datetime.utcnow().isoformat(),
+            "as_of": as_of.isoformat(),
+            "horizon_days": horizon_days,
+            "features": FEATURE_COLUMNS,
+            "entities": int(len(labels)),
+            "churned": positives,
+            "holdout_auc": auc,
+        }
+        self.save(org_id, model, metadata)
+        return metadata
+    
+    def save(self, org_id: int, model: Any, metadata: Dict[str, Any]):
+        """Write the model file, then atomically point the org's current version at it"""
+        directory = os.path.join(self.directory, str(org_id), MODEL_NAME)
+        os.makedirs(directory, exist_ok=True)
+        
+        joblib.dump({"model": model, "metadata": metadata}, os.path.join(directory, f"{metadata['version']}.joblib"))
+        
+        pointer = os.path.join(directory, "current.json")
+        with open(pointer + ".tmp", "w") as f:
+            json.dump(metadata, f)
+        os.replace(pointer + ".tmp", pointer)
+
+
+class ModelCache:
+    """Process-level cache of fitted models keyed by org and current version"""
+    
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.MODEL_DIR
+        self._models: Dict[Tuple[int, str], Tuple[str, Any, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+    
+    def current_version(self, org_id: int, name: str = MODEL_NAME) -> Optional[str]:
+        """Version the org's pointer file names, or None when no model was trained"""
+        try:
+            with open(os.path.join(self.directory, str(org_id), name, "current.json")) as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def get(self, org_id: int, name: str = MODEL_NAME) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """(model, metadata) of the current version, loaded from disk only when the version changes"""
+        version = self.current_version(org_id, name)
+        if version is None:
+            return None
+        
+        with self._lock:
+            cached = self._models.get((org_id, name))
+            if cached is None or cached[0] != version:
+                bundle = joblib.load(os.path.join(self.directory, str(org_id), name, f"{version}.joblib"))
+                cached = (version, bundle["model"], bundle["metadata"])
+                self._models[(org_id, name)] = cached
+        
+        return cached[1], cached[2]
+
+
+# Shared by all signal computations in the process
+model_cache = ModelCache()
@@ -0,0 +1,266 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Set, Tuple
+from datetime import datetime
+import json
+import threading
+from app.core.models import Rule, RuleEvaluationState, Signal
+from app.core.services.rule_compiler import MISSING, Condition, CompiledRule, SignalIndex, field_matches, rule_cache
+from app.core.services.rule_engine import RuleEngine
+
+
+# Conditions only ask whether some signal of a kind exists and whether some signal satisfies
+# each where field, so their match state only ever moves from unmatched to matched and can be
+# updated from newly arrived signals alone.
+#
+# Memories are a per-process cache; the watermark and the set of rules that held there are kept
+# per org in RuleEvaluationState, so every API worker reports a trigger relative to the same state.
+
+MAX_SAVE_ATTEMPTS = 5  # evaluations redone after losing a compare-and-swap to another worker
+
+
+class AlphaMemory:
+    """Partial match state of one condition over every signal seen so far"""
+    __slots__ = ("condition", "seen", "matched_fields")
+    
+    def __init__(self, condition: Condition):
+        self.condition = condition
+        self.seen = False
+        self.matched_fields = [False] * len(condition.fields)
+    
+    def update(self, index: SignalIndex) -> bool:
+        """Fold in newly arrived signals; True if the condition's outcome may have changed"""
+        entries = index.of_kind(self.condition.kind)
+        if not entries:
+            return False
+        
+        changed = not self.seen
+        self.seen = True
+        for position, (field, check) in enumerate(self.condition.fields):
+            if not self.matched_fields[position] and field_matches(entries, field, check):
+                self.matched_fields[position] = True
+                changed = True
+        return changed
+    
+    @property
+    def satisfied(self) -> bool:
+        return self.seen and all(self.matched_fields)
+
+
+class RuleState:
+    """A registered rule, the version it was compiled from and whether it last held"""
+    __slots__ = ("rule", "compiled", "version", "triggered")
+    
+    def __init__(self, rule: Rule, compiled: CompiledRule):
+        self.rule = rule
+        self.compiled = compiled
+        self.version = rule.updated_at
+        self.triggered = False
+
+
+class OrgRuleNetwork:
+    """Alpha memories routed by signal kind and the rules joined over them, for one org"""
+    
+    def __init__(self):
+        self.watermark = 0  # highest signal id folded in
+        self.memories: Dict[Tuple[str, str], AlphaMemory] = {}
+        self.memories_by_kind: Dict[str, List[AlphaMemory]] = {}
+        self.rules: Dict[int, RuleState] = {}
+        self.rules_by_condition: Dict[Tuple[str, str], Set[int]] = {}
+        self.signal_variables: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+    
+    def sync_rules(self, rules: List[Rule]) -> Tuple[Set[int], List[AlphaMemory]]:
+        """Register new or edited rules and drop removed ones; returns new rule ids and new memories"""
+        added = set()
+        for rule in rules:
+            state = self.rules.get(rule.id)
+            if state is not None and state.version == rule.updated_at:
+                state.rule = rule
+                continue
+            self.rules[rule.id] = RuleState(rule, rule_cache.get(rule))
+            added.add(rule.id)
+        
+        active = {rule.id for rule in rules}
+        removed = set(self.rules) - active
+        for rule_id in removed:
+            del self.rules[rule_id]
+        
+        if not added and not removed:
+            return added, []
+        
+        # Rebuild routing so memories only live while some rule uses them
+        memories, new_memories = {}, []
+        self.rules_by_condition = {}
+        for rule_id, state in self.rules.items():
+            for condition in state.compiled.tree.conditions():
+                memory = memories.get(condition.key) or self.memories.get(condition.key)
+                if memory is None:
+                    memory = AlphaMemory(condition)
+                    new_memories.append(memory)
+                memories[condition.key] = memory
+                self.rules_by_condition.setdefault(condition.key, set()).add(rule_id)
+        
+        self.memories = memories
+        self.memories_by_kind = {}
+        for memory in memories.values():
+            self.memories_by_kind.setdefault(memory.condition.kind, []).append(memory)
+        
+        return added, new_memories
+    
+    def resolve(self, condition: Condition) -> bool:
+        return self.memories[condition.key].satisfied
+    
+    def variable(self, name: str) -> Any:
+        """Narrative variable from the latest signal providing it, or MISSING"""
+        return self.signal_variables.get(name, MISSING)
+
+
+class IncrementalRuleEvaluator:
+    """Keeps per-org match state between evaluations so only new signals are examined"""
+    
+    def __init__(self):
+        self.rule_engine = RuleEngine()
+        self._networks: Dict[int, OrgRuleNetwork] = {}
+        self._lock = threading.Lock()
+    
+    def evaluate(self, org_id: int, rules: List[Rule], db: Session) -> Dict[str, Any]:
+        """Fold in signals that arrived since the org's last evaluation and return rules that newly triggered"""
+        with self._lock:
+            network = self._networks.setdefault(org_id, OrgRuleNetwork())
+        
+        with network.lock:
+            rules = [rule for rule in rules if self._compiles(rule)]
+            for _ in range(MAX_SAVE_ATTEMPTS):
+                state = self._load_state(org_id, db)
+                evaluation, triggered = self._advance(network, org_id, rules, state, db)
+                if self._save_state(state, network.watermark, triggered, db):
+                    return evaluation
+        
+        raise RuntimeError(f"Rule evaluation state of org {org_id} kept changing; try again")
+    
+    def _advance(self, network: OrgRuleNetwork, org_id: int, rules: List[Rule], state: RuleEvaluationState,
+                 db: Session) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Bring the process network up to the latest signal and diff its rules against the stored state"""
+        added, new_memories = network.sync_rules(rules)
+        
+        # Memories created for new conditions have to catch up on signals already folded in
+        if new_memories and network.watermark:
+            history = SignalIndex(self._load_signals(
+                org_id, db, through=network.watermark,
+                kinds={memory.condition.kind for memory in new_memories}
+            ))
+            for memory in new_memories:
+                memory.update(history)
+        
+        new_signals = self._load_signals(org_id, db, after=network.watermark)
+        index = SignalIndex(new_signals)
+        if new_signals:
+            network.watermark = new_signals[-1].id
+            network.signal_variables.update(index.template_variables())
+        
+        # Alpha: route new signals to the memories of their kind
+        affected = set(added)
+        for kind in index.by_kind:
+            for memory in network.memories_by_kind.get(kind, []):
+                if memory.update(index):
+                    affected.update(network.rules_by_condition[memory.condition.key])
+        
+        # Beta: re-join only the rules whose conditions changed
+        for rule_id in affected:
+            rule_state = network.rules[rule_id]
+            with rule_state.compiled.lock:
+                rule_state.triggered = rule_state.compiled.tree.evaluate(network.resolve)
+        
+        # A rule is new when it holds now but did not hold, in its current version, at the stored watermark
+        previous = json.loads(state.triggered or "{}")
+        triggered = {
+            str(rule_id): str(rule_state.version)
+            for rule_id, rule_state in network.rules.items() if rule_state.triggered
+        }
+        results = [
+            self.rule_engine.build_result(network.rules[int(rule_id)].rule, network.rules[int(rule_id)].compiled,
+                                          True, network.variable, db)
+            for rule_id, version in sorted(triggered.items(), key=lambda item: int(item[0]))
+            if previous.get(rule_id) != version
+        ]
+        
+        return {
+            "results": results,
+            "new_signals": self._count_signals(org_id, db, after=state.watermark or 0, through=network.watermark),
+            "rules_checked": len(affected),
+            "watermark": network.watermark
+        }, triggered
+    
+    def _load_state(self, org_id: int, db: Session) -> RuleEvaluationState:
+        """The org's stored evaluation state, created empty on first use"""
+        query = db.query(RuleEvaluationState).filter(RuleEvaluationState.org_id == org_id).populate_existing()
+        state = query.first()
+        if state is None:
+            db.add(RuleEvaluationState(org_id=org_id, watermark=0, triggered="{}", revision=0))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker created it first
+                db.rollback()
+            state = query.one()
+        return state
+    
+    def _save_state(self, state: RuleEvaluationState, watermark: int, triggered: Dict[str, str],
+                    db: Session) -> bool:
+        """Store the new watermark and triggered rules unless another worker saved since `state` was read"""
+        try:
+            saved = db.query(RuleEvaluationState).filter(
+                RuleEvaluationState.id == state.id,
+                RuleEvaluationState.revision == state.revision
+            ).update({
+                "watermark": watermark,
+                "triggered": json.dumps(triggered, sort_keys=True),
+                "revision": state.revision + 1,
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return saved == 1
+    
+    def reset(self, org_id: int = None):
+        """Forget this process's match state for one org, or for all orgs; the stored state is kept"""
+        with self._lock:
+            if org_id is None:
+                self._networks.clear()
+            else:
+                self._networks.pop(org_id, None)
+    
+    def _compiles(self, rule: Rule) -> bool:
+        """Whether a rule's definition compiles; broken rules are reported and left out"""
+        try:
+            rule_cache.get(rule)
+            return True
+        except Exception as e:
+            print(f"Error evaluating rule {rule.id}: {str(e)}")
+            return False
+    
+    def _load_signals(self, org_id: int, db: Session, after: int = 0, through: int = None,
+                      kinds: Set[str] = None) -> List[Signal]:
+        """Org signals in id order within (after, through], optionally limited to some kinds"""
+        query = db.query(Signal).filter(Signal.org_id == org_id, Signal.id > after)
+        if through is not None:
+            query = query.filter(Signal.id <= through)
+        if kinds is not None:
+            query = query.filter(Signal.kind.in_(kinds))
+        return query.order_by(Signal.id).all()
+    
+    def _count_signals(self, org_id: int, db: Session, after: int, through: int) -> int:
+        """Number of org signals with ids in (after, through]"""
+        if through <= after:
+            return 0
+        return db.query(func.count(Signal.id)).filter(
+            Signal.org_id == org_id, Signal.id > after, Signal.id <= through
+        ).scalar()
+
+
+# Shared by all incremental evaluations in the process
+incremental_evaluator = IncrementalRuleEvaluator()
@@ -1,11 +1,55 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+import hashlib
 import json
+from app.core.db import bulk_insert
 from app.core.models import Narrative, Signal, Rule, Entity
+from app.core.services.rule_compiler import CompiledRule
 from app.core.services.rule_engine import RuleEngine
 
 
+def narrative_fingerprint(source: str, evidence: Any, period: str) -> str:
+    """Hash identifying a narrative by what it is about, the evidence behind it and its period"""
+    key = json.dumps([source, evidence, period], sort_keys=True, default=str)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class NarrativeFingerprints:
+    """Fingerprints of an org's stored narratives that a generation run can reproduce"""
+    
+    def __init__(self, org_id: int, signals: List[Signal], db: Session):
+        self.periods: Dict[str, datetime] = {}
+        for signal in signals:
+            if signal.period_end and (signal.kind not in self.periods or signal.period_end > self.periods[signal.kind]):
+                self.periods[signal.kind] = signal.period_end
+        
+        # A narrative is generated after the period it covers ends, and bumping only moves it later
+        query = db.query(Narrative.fingerprint, Narrative.id).filter(
+            Narrative.org_id == org_id,
+            Narrative.fingerprint != None
+        )
+        if self.periods:
+            earliest = min(self.periods.values())
+            query = query.filter(Narrative.generated_at >= datetime(earliest.year, earliest.month, earliest.day))
+        self.stored: Dict[str, int] = dict(query.all())
+        self.unchanged: List[int] = []
+    
+    def period(self, kinds: List[str]) -> str:
+        """Day of the latest period among the signals of the given kinds"""
+        ends = [self.periods[kind] for kind in kinds if kind in self.periods]
+        return max(ends).date().isoformat() if ends else ""
+    
+    def check(self, source: str, evidence: Any, period: str) -> Optional[str]:
+        """Fingerprint of a narrative about to be rendered, or None when it is already stored"""
+        fingerprint = narrative_fingerprint(source, evidence, period)
+        if fingerprint in self.stored:
+            self.unchanged.append(self.stored[fingerprint])
+            return None
+        return fingerprint
+
+
 class NarrativeService:
     """Service for generating narratives and insights"""
     
@@ -15,53 +59,96 @@ class NarrativeService:
     def generate_narrative(self, title: str, summary: str, evidence: Dict, 
                           actions: List[str], org_id: int, db: Session) -> Narrative:
         """Generate a new narrative"""
-        narrative = Narrative(
+        narrative = self.build_narrative(title, summary, evidence, actions, org_id)
+        
+        db.add(narrative)
+        db.commit()
+        db.refresh(narrative)
+        
+        return narrative
+    
+    def build_narrative(self, title: str, summary: str, evidence: Dict,
+                        actions: List[str], org_id: int, fingerprint: str = None) -> Narrative:
+        """Build a narrative without persisting it"""
+        return Narrative(
             org_id=org_id,
             title=title,
             summary=summary,
             evidence=json.dumps(evidence),
             actions=json.dumps(actions),
             generated_at=datetime.utcnow(),
-            author="ai"
+            author="ai",
+            fingerprint=fingerprint
         )
-        
-        db.add(narrative)
-        db.commit()
-        db.refresh(narrative)
-        
-        return narrative
     
     def auto_generate_narratives(self, signals: List[Signal], rules: List[Rule], 
                                org_id: int, db: Session) -> List[Narrative]:
-        """Automatically generate narratives based on signals and rules"""
+        """Automatically generate narratives based on signals and rules; unchanged ones are only re-dated"""
         narratives = []
+        fingerprints = NarrativeFingerprints(org_id, signals, db)
+        rule_fingerprints = {}
+        
+        def seen(rule: Rule, compiled: CompiledRule, evidence: Dict) -> bool:
+            kinds = [condition.kind for condition in compiled.tree.conditions()]
+            # Editing the rule's template or actions changes its narratives too
+            fingerprint = fingerprints.check(
+                f"rule:{rule.id}", [compiled.definition["then"], evidence], fingerprints.period(kinds)
+            )
+            rule_fingerprints[rule.id] = fingerprint
+            return fingerprint is None
         
         # Evaluate rules to find triggered ones
-        rule_results = self.rule_engine.evaluate_rules(rules, signals, db)
+        rule_results = self.rule_engine.evaluate_rules(rules, signals, db, seen=seen)
         
         for result in rule_results:
-            if result.get('triggered', False):
+            if result.get('triggered', False) and result.get('narrative'):
                 narrative_data = result['narrative']
                 
                 # Create narrative from rule result
-                narrative = self.generate_narrative(
+                narrative = self.build_narrative(
                     title=narrative_data['title'],
                     summary=narrative_data['summary'],
                     evidence=narrative_data['evidence'],
                     actions=narrative_data['actions'],
                     org_id=org_id,
-                    db=db
+                    fingerprint=rule_fingerprints.get(result['rule_id'])
                 )
                 
                 narratives.append(narrative)
         
         # Generate additional narratives based on signal patterns
-        signal_narratives = self._generate_signal_based_narratives(signals, org_id, db)
+        signal_narratives = self._generate_signal_based_narratives(signals, org_id, fingerprints)
         narratives.extend(signal_narratives)
         
-        return narratives
+        return self._store_narratives(narratives, fingerprints.unchanged, org_id, db)
+    
+    def _store_narratives(self, narratives: List[Narrative], unchanged: List[int],
+                          org_id: int, db: Session) -> List[Narrative]:
+        """Re-date unchanged narratives and insert new ones, all in one transaction"""
+        if unchanged:
+            db.query(Narrative).filter(Narrative.id.in_(unchanged)).update(
+                {Narrative.generated_at: datetime.utcnow()}, synchronize_session=False
+            )
+        if not narratives:
+            db.commit()
+            return []
+        
+        try:
+            # Persist everything at once instead of a commit and refresh per narrative
+            return bulk_insert(db, narratives)
+        except IntegrityError:
+            # Stored before the fingerprint window or by a concurrent run; re-date those instead
+            stored = dict(db.query(Narrative.fingerprint, Narrative.id).filter(
+                Narrative.org_id == org_id,
+                Narrative.fingerprint.in_([narrative.fingerprint for narrative in narratives])
+            ).all())
+            if not stored:
+                raise
+            fresh = [narrative for narrative in narratives if narrative.fingerprint not in stored]
+            return self._store_narratives(fresh, unchanged + list(stored.values()), org_id, db)
     
-    def _generate_signal_based_narratives(self, signals: List[Signal], org_id: int, db: Session) -> List[Narrative]:
+    def _generate_signal_based_narratives(self, signals: List[Signal], org_id: int,
+                                          fingerprints: NarrativeFingerprints = None) -> List[Narrative]:
         """Generate narratives based on signal patterns"""
         narratives = []
         
@@ -77,14 +164,14 @@ class NarrativeService:
             high_score_signals = [s for s in signal_list if s.score > s.threshold]
             
             if high_score_signals:
-                narrative = self._create_signal_narrative(signal_kind, high_score_signals, org_id, db)
+                narrative = self._create_signal_narrative(signal_kind, high_score_signals, org_id, fingerprints)
                 if narrative:
                     narratives.append(narrative)
         
         return narratives
     
     def _create_signal_narrative(self, signal_kind: str, signals: List[Signal], 
-                                org_id: int, db: Session) -> Narrative:
+                                org_id: int, fingerprints: NarrativeFingerprints = None) -> Narrative:
         """Create a narrative for a specific signal type"""
         if not signals:
             return None
@@ -95,11 +182,21 @@ class NarrativeService:
         try:
             payload = json.loads(top_signal.payload)
             
+            fingerprint = None
+            if fingerprints is not None:
+                # Checked before rendering, so unchanged signals cost no content generation
+                fingerprint = fingerprints.check(
+                    f"signal:{signal_kind}", [payload, top_signal.score, len(signals)],
+                    fingerprints.period([signal_kind])
+                )
+                if fingerprint is None:
+                    return None
+            
             # Generate title and summary based on signal type
             title, summary, actions = self._generate_signal_content(signal_kind, payload, top_signal.score)
             
             # Create narrative
-            narrative = self.generate_narrative(
+            narrative = self.build_narrative(
                 title=title,
                 summary=summary,
                 evidence={
@@ -110,11 +207,11 @@ class NarrativeService:
                 },
                 actions=actions,
                 org_id=org_id,
-                db=db
+                fingerprint=fingerprint
             )
             
             return narrative
-            
+        
         except Exception as e:
             print(f"Error creating signal narrative: {str(e)}")
             return None
@@ -213,7 +310,7 @@ class NarrativeService:
             }
             
             return insights
-            
+        
         except Exception as e:
             print(f"Error getting narrative insights: {str(e)}")
             return None
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Dict, Any, FrozenSet
+import re
+from jinja2 import Template, Undefined, meta
+from jinja2.sandbox import SandboxedEnvironment
+
+PLACEHOLDER_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+LITERAL_BRACE_PATTERN = re.compile(r"[{}]")
+# Names Jinja reads as literals or operators, so they stay plain text
+RESERVED_NAMES = {"and", "or", "not", "in", "is", "if", "else", "true", "false", "none", "True", "False", "None"}
+
+
+class PlaceholderUndefined(Undefined):
+    """Renders a variable no signal provides as its original `{name}` placeholder"""
+    
+    def __str__(self) -> str:
+        return f"{{{self._undefined_name}}}"
+
+
+_environment = SandboxedEnvironment(undefined=PlaceholderUndefined, autoescape=False, keep_trailing_newline=True)
+
+
+@dataclass
+class NarrativeTemplate:
+    """A rule's narrative template compiled once, with the variable names it references"""
+    source: str
+    template: Template
+    variables: FrozenSet[str]
+    
+    def render(self, variables: Dict[str, Any]) -> str:
+        return self.template.render(variables)
+
+
+def to_jinja(source: str) -> str:
+    """Turn `{name}` placeholders into Jinja expressions; every other brace is kept as literal text"""
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(source):
+        parts.append(_literal(source[position:match.start()]))
+        name = match.group(1)
+        parts.append(_literal(match.group(0)) if name in RESERVED_NAMES else f"{{{{ {name} }}}}")
+        position = match.end()
+    parts.append(_literal(source[position:]))
+    return "".join(parts)
+
+
+def _literal(text: str) -> str:
+    """Text Jinja outputs verbatim; braces are the only characters that can open a tag"""
+    return LITERAL_BRACE_PATTERN.sub(lambda match: f'{{{{ "{match.group(0)}" }}}}', text)
+
+
+def compile_template(source: str) -> NarrativeTemplate:
+    """Compile a narrative template and find the variables it uses"""
+    source = source or ""
+    # Parse once for both the variable scan and code generation
+    ast = _environment.parse(to_jinja(source))
+    return NarrativeTemplate(
+        source=source,
+        template=_environment.from_string(ast),
+        variables=frozenset(meta.find_undeclared_variables(ast))
+    )
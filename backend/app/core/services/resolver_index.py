@@ -0,0 +1,363 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Set
+from contextlib import contextmanager
+from datetime import datetime
+import fcntl
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from app.config import settings
+from app.core.models import Entity
+
+# Bump whenever the on-disk layout changes;
+# snapshots with another version are ignored and rebuilt from the database.
+SNAPSHOT_VERSION = 2
+
+INDEX_FIELDS = ("name", "email", "phone", "company")
+
+def normalize_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """Extract the matchable fields of a record in comparison form"""
+    fields = {}
+    for field in INDEX_FIELDS:
+        value = data.get(field)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        value = str(value)
+        # Phones are compared as-is, everything else case-insensitively
+        fields[field] = value if field == "phone" else value.lower()
+    return fields
+
+
+class ResolverIndex:
+    """Per-org index of the normalized fields of resolved entities, persisted as a snapshot"""
+
+    def __init__(self, org_id: int):
+        self.org_id = org_id
+        self.watermark: Optional[datetime] = None
+        self.watermark_ids: Set[int] = set()
+        self.generation = 0
+        # Monotonic time of the last check for deleted entities
+        self.deletions_checked_at = 0.0
+        # Watermark of the snapshot on disk; a save is needed once it moves
+        self._saved_watermark: Tuple[Optional[datetime], Set[int]] = (None, set())
+
+        # Base rows loaded (memory-mapped) from the last snapshot
+        self.type_names: List[str] = []
+        self._ids = np.empty(0, dtype=np.int64)
+        self._types = np.empty(0, dtype=np.int16)
+        self._offsets: Dict[str, np.ndarray] = {f: np.zeros(1, dtype=np.int64) for f in INDEX_FIELDS}
+        self._blobs: Dict[str, np.ndarray] = {f: np.empty(0, dtype=np.uint8) for f in INDEX_FIELDS}
+        self._base_ids: Set[int] = set()
+        # Decoded base rows per entity type, filled on first use
+        self._base_by_type: Dict[str, List[Tuple[int, Dict[str, str]]]] = {}
+
+        # Entities created or updated since the snapshot; these shadow base rows
+        self._delta: Dict[int, Tuple[str, Dict[str, str]]] = {}
+        # Delta entities without a base row, and base rows of deleted entities
+        self._added: Set[int] = set()
+        self._removed: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._removed) + len(self._added)
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the index differs from its snapshot"""
+        return bool(self._removed) or (self.watermark, self.watermark_ids) != self._saved_watermark
+
+    def entity_ids(self) -> Set[int]:
+        """Ids of every indexed entity"""
+        return (set(self._ids.tolist()) - self._removed) | set(self._delta)
+
+    def remove(self, entity_ids: Set[int]):
+        """Drop deleted entities from the index"""
+        for entity_id in entity_ids:
+            self._delta.pop(entity_id, None)
+            self._added.discard(entity_id)
+        self._removed |= set(entity_ids) & self._base_ids
+
+    def upsert(self, entity_id: int, entity_type: str, data: Dict[str, Any],
+               updated_at: Optional[datetime] = None):
+        """Add or replace an entity in the index"""
+        self._delta[entity_id] = (entity_type, normalize_fields(data))
+        self._removed.discard(entity_id)
+        if entity_id not in self._base_ids:
+            self._added.add(entity_id)
+
+        if updated_at is not None:
+            if self.watermark is None or updated_at > self.watermark:
+                self.watermark = updated_at
+                self.watermark_ids = {entity_id}
+            elif updated_at == self.watermark:
+                self.watermark_ids = self.watermark_ids | {entity_id}
+
+    def is_current(self, entity_id: int, updated_at: datetime) -> bool:
+        """Whether a change at the watermark has already been applied"""
+        return updated_at == self.watermark and entity_id in self.watermark_ids
+
+    def candidates(self, entity_type: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """Yield (entity_id, fields) for every entity of the type"""
+        for entity_id, fields in self._base_entities(entity_type):
+            if entity_id not in self._delta and entity_id not in self._removed:
+                yield entity_id, fields
+
+        for entity_id, (delta_type, delta_fields) in list(self._delta.items()):
+            if delta_type == entity_type:
+                yield entity_id, delta_fields
+
+    def _base_entities(self, entity_type: str) -> List[Tuple[int, Dict[str, str]]]:
+        """(entity_id, fields) of the snapshot rows of a type, decoded once per generation"""
+        decoded = self._base_by_type.get(entity_type)
+        if decoded is None:
+            rows = np.flatnonzero(self._types == self.type_names.index(entity_type)) \
+                if entity_type in self.type_names else []
+            decoded = [(int(self._ids[row]), self._base_fields(row)) for row in rows]
+            self._base_by_type[entity_type] = decoded
+        return decoded
+
+    def _base_fields(self, row: int) -> Dict[str, str]:
+        """Decode the stored fields of a snapshot row"""
+        fields = {}
+        for field in INDEX_FIELDS:
+            start, end = self._offsets[field][row], self._offsets[field][row + 1]
+            if end > start:
+                fields[field] = self._blobs[field][start:end].tobytes().decode("utf-8")
+        return fields
+
+    def save(self, directory: str):
+        """Merge pending changes and write a new snapshot generation, one process at a time"""
+        org_dir = os.path.join(directory, f"org_{self.org_id}")
+        os.makedirs(org_dir, exist_ok=True)
+        header_path = os.path.join(org_dir, "header.json")
+
+        with open(os.path.join(org_dir, "lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            previous = _read_header(header_path)
+            if _compatible(previous, self.org_id) and previous["generation"] != self.generation:
+                # Another process saved since this index was loaded; apply our changes on top of its snapshot
+                self._rebase(org_dir, previous)
+            generation = (previous or {}).get("generation", 0) + 1
+            self._write(org_dir, header_path, generation)
+
+    def _rebase(self, org_dir: str, header: Dict[str, Any]):
+        """Use a newer snapshot as the base, keeping pending changes and the older watermark"""
+        self._load_arrays(os.path.join(org_dir, f"gen_{header['generation']}"), header["type_names"])
+        self.generation = header["generation"]
+        self._removed &= self._base_ids
+        self._added = set(self._delta) - self._base_ids
+
+        # Catch-up starts from the earlier watermark so neither snapshot's gaps are skipped
+        theirs = datetime.fromisoformat(header["watermark"]) if header.get("watermark") else None
+        if theirs is None or (self.watermark is not None and theirs < self.watermark):
+            self.watermark = theirs
+            self.watermark_ids = set(header.get("watermark_ids", [])) if theirs else set()
+
+    def _write(self, org_dir: str, header_path: str, generation: int):
+        """Write the merged arrays as a generation, then point the header at it"""
+        dropped = list(self._delta) + list(self._removed)
+        keep = ~np.isin(self._ids, dropped) if dropped else np.ones(len(self._ids), dtype=bool)
+        delta_items = sorted(self._delta.items())
+
+        type_names = list(self.type_names)
+        type_codes = {name: code for code, name in enumerate(type_names)}
+        for _, (entity_type, _) in delta_items:
+            if entity_type not in type_codes:
+                type_codes[entity_type] = len(type_names)
+                type_names.append(entity_type)
+
+        ids = np.concatenate([self._ids[keep], np.array([i for i, _ in delta_items], dtype=np.int64)])
+        types = np.concatenate([
+            self._types[keep],
+            np.array([type_codes[t] for _, (t, _) in delta_items], dtype=np.int16),
+        ])
+
+        arrays = {"ids": ids, "types": types}
+        for field in INDEX_FIELDS:
+            offsets, blob = self._offsets[field], self._blobs[field]
+            lengths = np.diff(offsets)[keep]
+            starts = offsets[:-1][keep]
+            # Gather the kept byte ranges in one vectorized pass
+            gather = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+            extra = [fields.get(field, "").encode("utf-8") for _, (_, fields) in delta_items]
+            arrays[f"{field}_blob"] = np.concatenate([
+                blob[gather.astype(np.int64)],
+                np.frombuffer(b"".join(extra), dtype=np.uint8),
+            ])
+            arrays[f"{field}_offsets"] = np.concatenate([
+                [0],
+                np.cumsum(np.concatenate([lengths, np.array([len(e) for e in extra], dtype=np.int64)])),
+            ]).astype(np.int64)
+
+        # Readers only ever see complete generations: arrays land in a temp directory renamed into place
+        gen_dir = os.path.join(org_dir, f"gen_{generation}")
+        tmp_dir = tempfile.mkdtemp(prefix=".gen_", dir=org_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        shutil.rmtree(gen_dir, ignore_errors=True)  # left behind by a save that died before its header
+        os.rename(tmp_dir, gen_dir)
+
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "org_id": self.org_id,
+            "generation": generation,
+            "count": len(ids),
+            "fields": list(INDEX_FIELDS),
+            "type_names": type_names,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "watermark_ids": sorted(self.watermark_ids),
+            "saved_at": datetime.utcnow().isoformat(),
+        }
+        tmp_path = header_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, header_path)
+
+        # Older generations may still be mapped by other processes; keep the previous one
+        for entry in os.listdir(org_dir):
+            if entry.startswith("gen_") and entry not in (f"gen_{generation}", f"gen_{generation - 1}"):
+                shutil.rmtree(os.path.join(org_dir, entry), ignore_errors=True)
+
+        self._load_arrays(gen_dir, type_names)
+        self.generation = generation
+        self._delta.clear()
+        self._added.clear()
+        self._removed.clear()
+        self._saved_watermark = (self.watermark, self.watermark_ids)
+
+    @classmethod
+    def load(cls, directory: str, org_id: int) -> Optional["ResolverIndex"]:
+        """Load an org snapshot, or return None if it is missing or incompatible"""
+        org_dir = os.path.join(directory, f"org_{org_id}")
+        header = _read_header(os.path.join(org_dir, "header.json"))
+        if not _compatible(header, org_id):
+            return None
+
+        index = cls(org_id)
+        try:
+            index._load_arrays(os.path.join(org_dir, f"gen_{header['generation']}"), header["type_names"])
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable resolver snapshot for org {org_id}: {str(e)}")
+            return None
+
+        if header.get("watermark"):
+            index.watermark = datetime.fromisoformat(header["watermark"])
+            index.watermark_ids = set(header.get("watermark_ids", []))
+        index.generation = header["generation"]
+        index._saved_watermark = (index.watermark, index.watermark_ids)
+        return index
+
+    def _load_arrays(self, gen_dir: str, type_names: List[str]):
+        """Memory-map the arrays of a snapshot generation"""
+        def _load(name):
+            return np.load(os.path.join(gen_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.type_names = list(type_names)
+        self._ids = _load("ids")
+        self._types = _load("types")
+        for field in INDEX_FIELDS:
+            self._offsets[field] = _load(f"{field}_offsets")
+            self._blobs[field] = _load(f"{field}_blob")
+        self._base_ids = set(self._ids.tolist())
+        self._base_by_type = {}
+
+
+def _compatible(header: Optional[Dict[str, Any]], org_id: int) -> bool:
+    """Whether a snapshot header can be loaded by this code for the org"""
+    return bool(header) and header.get("version") == SNAPSHOT_VERSION and header.get("org_id") == org_id
+
+
+def _read_header(path: str) -> Optional[Dict[str, Any]]:
+    """Read a snapshot header if present"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ResolverIndexStore:
+    """Process-level cache of per-org resolver indexes backed by disk snapshots"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.RESOLVER_INDEX_DIR
+        self._indexes: Dict[int, ResolverIndex] = {}
+        self._org_locks: Dict[int, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, org_id: int, db: Session) -> Iterator[ResolverIndex]:
+        """Caught-up org index, held exclusively until the block exits and then saved if it changed"""
+        with self._org_lock(org_id):
+            index = self.get(org_id, db)
+            yield index
+            self.save(org_id)
+
+    def get(self, org_id: int, db: Session) -> ResolverIndex:
+        """Return the org index, loading the snapshot lazily and catching up from its watermark"""
+        with self._org_lock(org_id):
+            with self._lock:
+                index = self._indexes.get(org_id)
+                if index is None:
+                    index = ResolverIndex.load(self.directory, org_id) or ResolverIndex(org_id)
+                    self._indexes[org_id] = index
+
+            self._catch_up(index, db)
+            return index
+
+    def _org_lock(self, org_id: int) -> threading.RLock:
+        """Lock serializing use of one org's index within the process"""
+        with self._lock:
+            return self._org_locks.setdefault(org_id, threading.RLock())
+
+    def _catch_up(self, index: ResolverIndex, db: Session):
+        """Apply entity changes made since the index watermark, and deletions"""
+        query = db.query(Entity.id, Entity.type, Entity.canonical, Entity.updated_at).filter(
+            Entity.org_id == index.org_id
+        )
+        if index.watermark is not None:
+            # >= so rows sharing the watermark timestamp are not missed; upsert is idempotent
+            query = query.filter(Entity.updated_at >= index.watermark)
+
+        applied = 0
+        for entity_id, entity_type, canonical, updated_at in query.yield_per(1000):
+            if index.is_current(entity_id, updated_at):
+                continue
+            try:
+                data = json.loads(canonical)
+            except (TypeError, ValueError):
+                continue
+            index.upsert(entity_id, entity_type, data, updated_at)
+            applied += 1
+
+        # Deletions leave no watermark trail; they are looked for after outside changes or periodically
+        now = time.monotonic()
+        if not applied and now - index.deletions_checked_at < settings.RESOLVER_DELETION_CHECK_SECONDS:
+            return
+        index.deletions_checked_at = now
+
+        # A count mismatch triggers an id-only comparison
+        count = db.query(func.count(Entity.id)).filter(Entity.org_id == index.org_id).scalar()
+        if count != len(index):
+            stored = {entity_id for (entity_id,) in db.query(Entity.id).filter(Entity.org_id == index.org_id)}
+            deleted = index.entity_ids() - stored
+            if deleted:
+                index.remove(deleted)
+
+    def save(self, org_id: int):
+        """Persist the org index if it changed"""
+        with self._org_lock(org_id):
+            index = self._indexes.get(org_id)
+            if index is None or not index.dirty:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            index.save(self.directory)
+
+
+# Shared by all resolvers in the process
+resolver_index_store = ResolverIndexStore()
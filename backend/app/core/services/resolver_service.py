@@ -3,20 +3,36 @@ from typing import List, Dict, Any
 import json
 from rapidfuzz import fuzz
 from app.core.models import Entity, RawRecord
+from app.core.services.resolver_index import (
+    ResolverIndex, ResolverIndexStore, normalize_fields, resolver_index_store
+)
 
 
 class EntityResolver:
     """Service for resolving entities from raw data"""
     
-    def __init__(self):
+    def __init__(self, index_store: ResolverIndexStore = None):
         self.name_threshold = 0.8
         self.email_threshold = 0.9
         self.phone_threshold = 0.85
+        self.index_store = index_store or resolver_index_store
     
     def resolve_entities(self, raw_records: List[RawRecord], org_id: int, db: Session) -> List[Entity]:
         """Resolve entities from raw records"""
         entities = []
         
+        try:
+            # Warm index from the on-disk snapshot plus changes since its watermark, saved on exit
+            with self.index_store.open(org_id, db) as index:
+                self._resolve_records(raw_records, org_id, db, index, entities)
+        except OSError as e:
+            print(f"Error saving resolver index snapshot for org {org_id}: {str(e)}")
+        
+        return entities
+    
+    def _resolve_records(self, raw_records: List[RawRecord], org_id: int, db: Session,
+                         index: ResolverIndex, entities: List[Entity]):
+        """Match or create an entity for each record against the held index"""
         for record in raw_records:
             try:
                 data = json.loads(record.payload)
@@ -26,22 +42,22 @@ class EntityResolver:
                 
                 if entity_type:
                     # Check if entity already exists
-                    existing_entity = self._find_existing_entity(data, entity_type, org_id, db)
+                    existing_entity = self._find_existing_entity(data, entity_type, org_id, db, index)
                     
                     if existing_entity:
                         # Update existing entity
-                        self._update_entity(existing_entity, data, db)
+                        merged_data = self._update_entity(existing_entity, data, db)
+                        index.upsert(existing_entity.id, entity_type, merged_data, existing_entity.updated_at)
                         entities.append(existing_entity)
                     else:
                         # Create new entity
                         new_entity = self._create_entity(data, entity_type, org_id, db)
+                        index.upsert(new_entity.id, entity_type, data, new_entity.updated_at)
                         entities.append(new_entity)
                         
             except Exception as e:
                 print(f"Error processing record {record.id}: {str(e)}")
                 continue
-        
-        return entities
     
     def _detect_entity_type(self, data: Dict[str, Any]) -> str:
         """Detect entity type from data structure"""
@@ -58,49 +74,37 @@ class EntityResolver:
         else:
             return 'generic'
     
-    def _find_existing_entity(self, data: Dict[str, Any], entity_type: str, org_id: int, db: Session) -> Entity:
+    def _find_existing_entity(self, data: Dict[str, Any], entity_type: str, org_id: int, db: Session,
+                              index: ResolverIndex) -> Entity:
         """Find existing entity using fuzzy matching"""
-        existing_entities = db.query(Entity).filter(
-            Entity.org_id == org_id,
-            Entity.type == entity_type
-        ).all()
+        fields = normalize_fields(data)
+        threshold = self._get_threshold_for_field(data)
         
-        best_match = None
+        best_match_id = None
         best_score = 0
         
-        for entity in existing_entities:
-            canonical = json.loads(entity.canonical)
-            score = self._calculate_similarity(data, canonical)
+        # Every entity of the type is scored; ties go to the oldest entity
+        for entity_id, candidate_fields in index.candidates(entity_type):
+            score = self._field_similarity(fields, candidate_fields)
             
-            if score > best_score and score > self._get_threshold_for_field(data):
+            if score > threshold and (score > best_score or (score == best_score and entity_id < best_match_id)):
                 best_score = score
-                best_match = entity
+                best_match_id = entity_id
         
-        return best_match
+        return db.get(Entity, best_match_id) if best_match_id is not None else None
     
     def _calculate_similarity(self, data1: Dict[str, Any], data2: Dict[str, Any]) -> float:
         """Calculate similarity between two data records"""
+        return self._field_similarity(normalize_fields(data1), normalize_fields(data2))
+    
+    def _field_similarity(self, fields1: Dict[str, str], fields2: Dict[str, str]) -> float:
+        """Calculate similarity between two normalized field sets"""
         scores = []
         
-        # Compare names
-        if 'name' in data1 and 'name' in data2:
-            name_score = fuzz.ratio(data1['name'].lower(), data2['name'].lower()) / 100
-            scores.append(name_score)
-        
-        # Compare emails
-        if 'email' in data1 and 'email' in data2:
-            email_score = fuzz.ratio(data1['email'].lower(), data2['email'].lower()) / 100
-            scores.append(email_score)
-        
-        # Compare phone numbers
-        if 'phone' in data1 and 'phone' in data2:
-            phone_score = fuzz.ratio(data1['phone'], data2['phone']) / 100
-            scores.append(phone_score)
-        
-        # Compare company names
-        if 'company' in data1 and 'company' in data2:
-            company_score = fuzz.ratio(data1['company'].lower(), data2['company'].lower()) / 100
-            scores.append(company_score)
+        # Compare names, emails, phone numbers and company names
+        for field in ('name', 'email', 'phone', 'company'):
+            if field in fields1 and field in fields2:
+                scores.append(fuzz.ratio(fields1[field], fields2[field]) / 100)
         
         return max(scores) if scores else 0
     
@@ -129,7 +133,7 @@ class EntityResolver:
         
         return entity
     
-    def _update_entity(self, entity: Entity, new_data: Dict[str, Any], db: Session):
+    def _update_entity(self, entity: Entity, new_data: Dict[str, Any], db: Session) -> Dict[str, Any]:
         """Update existing entity with new data"""
         canonical = json.loads(entity.canonical)
         
@@ -141,3 +145,5 @@ class EntityResolver:
         entity.confidence = min(1.0, entity.confidence + 0.1)
         
         db.commit()
+        
+        return merged_data
@@ -0,0 +1,424 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from datetime import datetime
+import json
+import operator
+import threading
+from app.config import settings
+from app.core.models import Rule, Signal
+from app.core.services.narrative_templates import NarrativeTemplate, compile_template
+
+ValueCheck = Callable[[Any], bool]
+MISSING = object()  # resolved value of a narrative variable no signal provides
+
+# Comparison operators a where clause may use, as (value, threshold) callables
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "gte": operator.ge,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "in": lambda value, threshold: value in threshold,
+}
+
+
+@dataclass(slots=True)
+class IndexedSignal:
+    """A signal with its payload decoded; payload is None when it could not be decoded"""
+    signal: Signal
+    kind: str
+    payload: Any
+    position: int  # place in the evaluation's input order
+
+
+class SignalIndex:
+    """Signals of one evaluation grouped by kind, each payload decoded once and shared by all rules"""
+    
+    def __init__(self, signals: List[Signal]):
+        self.entries: List[IndexedSignal] = []
+        self.by_kind: Dict[str, List[IndexedSignal]] = {}
+        self._template_variables: Optional[Dict[str, Any]] = None
+        self._resolved: Dict[str, Any] = {}
+        self.decoded = 0  # payloads parsed from JSON text
+        
+        for signal in signals:
+            payload = signal.payload
+            if not isinstance(payload, (dict, list)):
+                self.decoded += 1
+                try:
+                    payload = json.loads(payload)
+                except Exception as e:
+                    print(f"Error decoding payload of signal {signal.id}: {str(e)}")
+                    payload = None
+            entry = IndexedSignal(signal, signal.kind, payload, len(self.entries))
+            self.entries.append(entry)
+            self.by_kind.setdefault(signal.kind, []).append(entry)
+    
+    def of_kind(self, kind: str) -> List[IndexedSignal]:
+        """Indexed signals of one kind, in input order"""
+        return self.by_kind.get(kind, [])
+    
+    def variable(self, name: str) -> Any:
+        """A `<kind>_data` or `<kind>_<field>` value from the last signal providing it, or MISSING"""
+        if name in self._resolved:
+            return self._resolved[name]
+        
+        position, value = -1, MISSING
+        for kind, entries in self.by_kind.items():
+            if not name.startswith(f"{kind}_"):
+                continue
+            key = name[len(kind) + 1:]
+            for entry in reversed(entries):
+                if entry.position < position:
+                    break
+                payload = entry.payload
+                # A payload field named "data" shadows the payload itself
+                if isinstance(payload, dict) and key in payload:
+                    position, value = entry.position, payload[key]
+                    break
+                if key == "data" and payload is not None:
+                    position, value = entry.position, payload
+                    break
+        
+        self._resolved[name] = value
+        return value
+    
+    def template_variables(self) -> Dict[str, Any]:
+        """`<kind>_data` and `<kind>_<field>` narrative variables, built once per index"""
+        if self._template_variables is None:
+            variables = {}
+            for entry in self.entries:
+                if entry.payload is None:
+                    continue
+                variables[f"{entry.kind}_data"] = entry.payload
+                if isinstance(entry.payload, dict):
+                    for key, value in entry.payload.items():
+                        variables[f"{entry.kind}_{key}"] = value
+            self._template_variables = variables
+        return self._template_variables
+
+
+class Node:
+    """Node of a compiled `when` tree, counting how often it held to guide child ordering"""
+    __slots__ = ("evaluations", "hits")
+    
+    def __init__(self):
+        self.evaluations = 0
+        self.hits = 0
+    
+    def record(self, result: bool) -> bool:
+        self.evaluations += 1
+        self.hits += result
+        return result
+    
+    def probability(self) -> float:
+        """Smoothed share of past evaluations in which the node held"""
+        return (self.hits + 1) / (self.evaluations + 2)
+    
+    def cost(self) -> float:
+        """Relative work to evaluate the node against an index"""
+        return 0.0
+    
+    def reorder(self):
+        """Re-sort children by observed cost and selectivity"""
+
+
+class Condition(Node):
+    """Leaf of a compiled `when` tree: a signal kind plus compiled where-field checks"""
+    __slots__ = ("kind", "where", "fields", "key")
+    
+    def __init__(self, kind: str, where: Dict):
+        super().__init__()
+        self.kind = kind
+        self.where = where
+        self.fields: List[Tuple[str, ValueCheck]] = [(field, compile_criteria(criteria)) for field, criteria in where.items()]
+        # Identical conditions in different rules share one key
+        self.key = (kind, json.dumps(where, sort_keys=True, default=str))
+    
+    def matches(self, index: SignalIndex) -> bool:
+        """True if the kind is present and every where field holds for some signal of it"""
+        entries = index.of_kind(self.kind)
+        if not entries:
+            return False
+        return all(field_matches(entries, field, check) for field, check in self.fields)
+    
+    def evaluate(self, resolve: "Resolve") -> bool:
+        return self.record(resolve(self))
+    
+    def cost(self) -> float:
+        # A kind-existence check is one lookup; each where field scans the kind's payloads
+        return 1.0 + 4.0 * len(self.fields)
+    
+    def conditions(self) -> List["Condition"]:
+        return [self]
+
+
+Resolve = Callable[[Condition], bool]
+
+
+class AllOf(Node):
+    """True when every child holds; stops at the first child that does not"""
+    __slots__ = ("children",)
+    
+    def __init__(self, children: List[Node]):
+        super().__init__()
+        self.children = children
+    
+    def evaluate(self, resolve: Resolve) -> bool:
+        return self.record(all(child.evaluate(resolve) for child in self.children))
+    
+    def cost(self) -> float:
+        return sum(child.cost() for child in self.children)
+    
+    def decides(self, child: Node) -> float:
+        """Chance that a child settles the outcome on its own"""
+        return 1.0 - child.probability()
+    
+    def reorder(self):
+        for child in self.children:
+            child.reorder()
+        # Cheapest work per decisive outcome first; assigned whole so concurrent readers see either order
+        self.children = sorted(self.children, key=lambda child: child.cost() / self.decides(child))
+    
+    def conditions(self) -> List[Condition]:
+        return [condition for child in self.children for condition in child.conditions()]
+
+
+class AnyOf(AllOf):
+    """True when at least one child holds; stops at the first child that does"""
+    __slots__ = ()
+    
+    def evaluate(self, resolve: Resolve) -> bool:
+        return self.record(any(child.evaluate(resolve) for child in self.children))
+    
+    def decides(self, child: Node) -> float:
+        return child.probability()
+
+
+class NotOf(Node):
+    """True when its child does not hold"""
+    __slots__ = ("child",)
+    
+    def __init__(self, child: Node):
+        super().__init__()
+        self.child = child
+    
+    def evaluate(self, resolve: Resolve) -> bool:
+        return self.record(not self.child.evaluate(resolve))
+    
+    def cost(self) -> float:
+        return self.child.cost()
+    
+    def reorder(self):
+        self.child.reorder()
+    
+    def conditions(self) -> List[Condition]:
+        return self.child.conditions()
+
+
+class Constant(Node):
+    """Fixed outcome, for an empty `when`, a condition without a signal kind or a folded subtree"""
+    __slots__ = ("value",)
+    
+    def __init__(self, value: bool):
+        super().__init__()
+        self.value = value
+    
+    def evaluate(self, resolve: Resolve) -> bool:
+        return self.value
+    
+    def conditions(self) -> List[Condition]:
+        return []
+
+
+@dataclass
+class CompiledRule:
+    """A rule definition parsed once, with its `when` clause compiled into a tree of conditions"""
+    rule_id: Optional[int]
+    definition: Dict[str, Any]
+    severity: str
+    tree: Node
+    template: NarrativeTemplate
+    evaluations: int = 0
+    # Cached rules are shared by request and scheduler threads; the lock keeps the node
+    # statistics exact and stops a reorder from running during another thread's evaluation
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    
+    def predicate(self, index: SignalIndex) -> bool:
+        """Evaluate the rule against indexed signals"""
+        return self.evaluate(lambda condition: condition.matches(index))
+    
+    def evaluate(self, resolve: Resolve) -> bool:
+        """Evaluate the tree with the given condition lookup, periodically re-sorting its conditions"""
+        with self.lock:
+            self.evaluations += 1
+            if self.evaluations % settings.RULE_REORDER_INTERVAL == 0:
+                self.tree.reorder()
+            return self.tree.evaluate(resolve)
+
+
+def normalize_rule_definition(definition: Dict) -> Dict:
+    """Canonical shape with narrative_template and actions under `then`, accepting them at the top level"""
+    normalized = dict(definition)
+    then = dict(normalized.get("then") or {}) if isinstance(normalized.get("then", {}), dict) else {}
+    for key in ("narrative_template", "actions"):
+        if key in normalized:
+            value = normalized.pop(key)
+            then.setdefault(key, value)
+    normalized["then"] = then
+    return normalized
+
+
+def compile_rule(rule: Rule) -> CompiledRule:
+    """Parse a rule's definition and compile it"""
+    return compile_definition(json.loads(rule.definition), rule.id)
+
+
+def compile_definition(definition: Dict, rule_id: Optional[int] = None) -> CompiledRule:
+    """Compile a rule definition's `when` clause and narrative template"""
+    definition = normalize_rule_definition(definition)
+    tree = compile_conditions(definition.get("when", {}))
+    # Until statistics accumulate, cheaper children go first
+    tree.reorder()
+    return CompiledRule(
+        rule_id=rule_id,
+        definition=definition,
+        severity=definition.get("severity", "medium"),
+        tree=tree,
+        template=compile_template(definition["then"].get("narrative_template", ""))
+    )
+
+
+def compile_conditions(conditions: Dict) -> Node:
+    """Tree for a `when` clause; an empty clause always holds"""
+    if not conditions:
+        return Constant(True)
+    return compile_node(conditions)
+
+
+def compile_node(node: Dict) -> Node:
+    """Tree for a nested all / any / not node or a single signal condition"""
+    if "all" in node:
+        return _fold(AllOf([compile_node(child) for child in node["all"]]))
+    
+    if "any" in node:
+        return _fold(AnyOf([compile_node(child) for child in node["any"]]))
+    
+    if "not" in node:
+        child = compile_node(node["not"])
+        return Constant(not child.value) if isinstance(child, Constant) else NotOf(child)
+    
+    kind = node.get("signal")
+    if not kind:
+        return Constant(False)
+    return Condition(kind, node.get("where") or {})
+
+
+def _fold(node: AllOf) -> Node:
+    """Drop constant children that cannot change a group's outcome and collapse decided groups"""
+    neutral = not isinstance(node, AnyOf)  # True cannot change an all, False cannot change an any
+    children = []
+    for child in node.children:
+        if isinstance(child, Constant):
+            if child.value != neutral:
+                return Constant(child.value)
+            continue
+        children.append(child)
+    
+    if not children:
+        return Constant(neutral)
+    if len(children) == 1:
+        return children[0]
+    node.children = children
+    return node
+
+
+def field_matches(entries: List[IndexedSignal], field: str, check: ValueCheck) -> bool:
+    """True if any decoded payload has a non-null value for the field that passes the check"""
+    for entry in entries:
+        if entry.payload is None:
+            continue
+        try:
+            value = entry.payload.get(field)
+            if value is not None and check(value):
+                return True
+        except Exception as e:
+            print(f"Error evaluating where clause: {str(e)}")
+    return False
+
+
+def compile_criteria(criteria: Dict) -> ValueCheck:
+    """Value check for a criteria dict; unknown operators are ignored"""
+    if not isinstance(criteria, dict):
+        return lambda value: False
+    
+    checks: List[ValueCheck] = []
+    for name, threshold in criteria.items():
+        if name == "count":
+            checks.append(_count_check(compile_criteria(threshold)))
+        elif name in OPERATORS:
+            checks.append(_operator_check(OPERATORS[name], threshold))
+    
+    if not checks:
+        return lambda value: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda value: all(check(value) for check in checks)
+
+
+def _operator_check(compare: Callable[[Any, Any], bool], threshold: Any) -> ValueCheck:
+    """Bind a comparison to its threshold"""
+    return lambda value: compare(value, threshold)
+
+
+def _count_check(check: ValueCheck) -> ValueCheck:
+    """Apply a check to the length of a list value, counting a scalar as one"""
+    return lambda value: check(len(value) if isinstance(value, (list, tuple)) else 1)
+
+
+class RuleCache:
+    """Process-level LRU cache of compiled rules keyed by rule id and last update"""
+    
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.RULE_CACHE_SIZE
+        self._rules: "OrderedDict[Tuple[int, Optional[datetime]], CompiledRule]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, rule: Rule) -> CompiledRule:
+        """Compiled form of a rule, compiling it only when it is new or was edited"""
+        if rule.id is None:
+            return compile_rule(rule)
+        
+        key = (rule.id, rule.updated_at)
+        with self._lock:
+            compiled = self._rules.get(key)
+            if compiled is not None:
+                self._rules.move_to_end(key)
+                return compiled
+        
+        compiled = compile_rule(rule)
+        self.put(rule, compiled)
+        return compiled
+    
+    def put(self, rule: Rule, compiled: CompiledRule):
+        """Cache a rule compiled elsewhere, such as during an import"""
+        key = (rule.id, rule.updated_at)
+        with self._lock:
+            self._rules[key] = compiled
+            self._rules.move_to_end(key)
+            while len(self._rules) > self.max_size:
+                self._rules.popitem(last=False)
+    
+    def clear(self):
+        """Drop every compiled rule"""
+        with self._lock:
+            self._rules.clear()
+    
+    def __len__(self) -> int:
+        return len(self._rules)
+
+
+# Shared by all rule evaluations in the process
+rule_cache = RuleCache()
@@ -1,179 +1,112 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable
 import json
+import time
 import yaml
 from app.core.models import Rule, Signal, Entity
+from app.core.services.rule_compiler import MISSING, CompiledRule, SignalIndex, normalize_rule_definition, rule_cache
+from app.core.services.rule_profiler import RuleProfile, rule_metrics
+
+# Called with a triggered rule and its evidence; True when that narrative already exists
+Seen = Callable[[Rule, CompiledRule, Dict], bool]
 
 
 class RuleEngine:
     """Service for evaluating business rules and generating insights"""
     
-    def evaluate_rules(self, rules: List[Rule], signals: List[Signal], db: Session) -> List[Dict]:
-        """Evaluate all rules against current signals"""
+    def evaluate_rules(self, rules: List[Rule], signals: List[Signal], db: Session,
+                       profile: RuleProfile = None, seen: Seen = None) -> List[Dict]:
+        """Evaluate all rules against current signals, recording timings into `profile` when given"""
         results = []
         
+        # Payloads are decoded once here and shared by every rule
+        started = time.perf_counter()
+        index = SignalIndex(signals)
+        if profile is not None:
+            profile.record_index(index, time.perf_counter() - started)
+        
         for rule in rules:
             try:
-                rule_result = self._evaluate_single_rule(rule, signals, db)
+                rule_result = self._evaluate_single_rule(rule, index, db, profile, seen)
                 if rule_result:
                     results.append(rule_result)
             except Exception as e:
                 print(f"Error evaluating rule {rule.id}: {str(e)}")
                 continue
         
+        if profile is not None:
+            profile.finish()
+            rule_metrics.record(profile)
+        
         return results
     
-    def _evaluate_single_rule(self, rule: Rule, signals: List[Signal], db: Session) -> Dict:
-        """Evaluate a single rule against signals"""
+    def _evaluate_single_rule(self, rule: Rule, index: SignalIndex, db: Session,
+                              profile: RuleProfile = None, seen: Seen = None) -> Dict:
+        """Evaluate a single rule against indexed signals"""
         try:
-            rule_def = json.loads(rule.definition)
+            started = time.perf_counter()
+            compiled = rule_cache.get(rule)
             
             # Check if rule conditions are met
-            conditions_met = self._check_conditions(rule_def.get('when', {}), signals)
+            if profile is None:
+                conditions_met = compiled.predicate(index)
+            else:
+                conditions_met = compiled.evaluate(profile.resolver(rule, index))
             
-            if conditions_met:
-                # Rule triggered - generate narrative
-                narrative = self._generate_rule_narrative(rule_def, signals, db)
-                
+            result = self.build_result(rule, compiled, conditions_met, index.variable, db, seen)
+            if profile is not None:
+                profile.record_rule(rule, time.perf_counter() - started, conditions_met)
+            return result
+        
+        except Exception as e:
+            print(f"Error evaluating rule {rule.id}: {str(e)}")
+            return None
+    
+    def build_result(self, rule: Rule, compiled: CompiledRule, triggered: bool,
+                     resolve: Callable[[str], Any], db: Session, seen: Seen = None) -> Dict:
+        """Result for an evaluated rule, with a narrative when triggered; `resolve` looks up signal variables"""
+        if triggered:
+            template_vars = self._extract_template_variables(compiled, resolve)
+            
+            # Evidence already narrated is not rendered again
+            if seen is not None and seen(rule, compiled, template_vars):
                 return {
                     "rule_id": rule.id,
                     "rule_name": rule.name,
                     "triggered": True,
-                    "narrative": narrative,
-                    "severity": rule_def.get('severity', 'medium'),
-                    "category": rule.category
-                }
-            else:
-                return {
-                    "rule_id": rule.id,
-                    "rule_name": rule.name,
-                    "triggered": False,
-                    "severity": rule_def.get('severity', 'medium'),
+                    "unchanged": True,
+                    "narrative": None,
+                    "severity": compiled.severity,
                     "category": rule.category
                 }
-                
-        except Exception as e:
-            print(f"Error evaluating rule {rule.id}: {str(e)}")
-            return None
-    
-    def _check_conditions(self, conditions: Dict, signals: List[Signal]) -> bool:
-        """Check if rule conditions are met"""
-        if not conditions:
-            return True
-        
-        # Handle 'all' conditions (AND logic)
-        if 'all' in conditions:
-            all_conditions = conditions['all']
-            for condition in all_conditions:
-                if not self._evaluate_condition(condition, signals):
-                    return False
-            return True
-        
-        # Handle 'any' conditions (OR logic)
-        elif 'any' in conditions:
-            any_conditions = conditions['any']
-            for condition in any_conditions:
-                if self._evaluate_condition(condition, signals):
-                    return True
-            return False
-        
-        # Single condition
+            
+            # Rule triggered - generate narrative
+            narrative = self._generate_rule_narrative(compiled, template_vars)
+            
+            return {
+                "rule_id": rule.id,
+                "rule_name": rule.name,
+                "triggered": True,
+                "narrative": narrative,
+                "severity": compiled.severity,
+                "category": rule.category
+            }
         else:
-            return self._evaluate_condition(conditions, signals)
-    
-    def _evaluate_condition(self, condition: Dict, signals: List[Signal]) -> bool:
-        """Evaluate a single condition"""
-        signal_kind = condition.get('signal')
-        if not signal_kind:
-            return False
-        
-        # Find matching signals
-        matching_signals = [s for s in signals if s.kind == signal_kind]
-        
-        if not matching_signals:
-            return False
-        
-        # Check where clause
-        where_clause = condition.get('where', {})
-        if not where_clause:
-            return True
-        
-        # Evaluate where conditions
-        for field, criteria in where_clause.items():
-            if not self._evaluate_where_clause(field, criteria, matching_signals):
-                return False
-        
-        return True
+            return {
+                "rule_id": rule.id,
+                "rule_name": rule.name,
+                "triggered": False,
+                "severity": compiled.severity,
+                "category": rule.category
+            }
     
-    def _evaluate_where_clause(self, field: str, criteria: Dict, signals: List[Signal]) -> bool:
-        """Evaluate where clause criteria"""
-        for signal in signals:
-            try:
-                payload = json.loads(signal.payload)
-                value = payload.get(field)
-                
-                if value is None:
-                    continue
-                
-                # Check if value meets criteria
-                if self._check_value_criteria(value, criteria):
-                    return True
-                    
-            except Exception as e:
-                print(f"Error evaluating where clause: {str(e)}")
-                continue
-        
-        return False
-    
-    def _check_value_criteria(self, value: Any, criteria: Dict) -> bool:
-        """Check if a value meets the criteria"""
-        for operator, threshold in criteria.items():
-            if operator == 'gte':
-                if not (value >= threshold):
-                    return False
-            elif operator == 'lte':
-                if not (value <= threshold):
-                    return False
-            elif operator == 'gt':
-                if not (value > threshold):
-                    return False
-            elif operator == 'lt':
-                if not (value < threshold):
-                    return False
-            elif operator == 'eq':
-                if not (value == threshold):
-                    return False
-            elif operator == 'ne':
-                if not (value != threshold):
-                    return False
-            elif operator == 'in':
-                if not (value in threshold):
-                    return False
-            elif operator == 'count':
-                # Special case for count-based criteria
-                if isinstance(value, (list, tuple)):
-                    count = len(value)
-                else:
-                    count = 1
-                
-                if not self._check_value_criteria(count, threshold):
-                    return False
-        
-        return True
-    
-    def _generate_rule_narrative(self, rule_def: Dict, signals: List[Signal], db: Session) -> Dict:
-        """Generate narrative from rule definition and signals"""
-        template = rule_def.get('narrative_template', '')
-        actions = rule_def.get('actions', [])
-        
-        # Extract values from signals for template substitution
-        template_vars = self._extract_template_variables(rule_def, signals)
+    def _generate_rule_narrative(self, compiled: CompiledRule, template_vars: Dict) -> Dict:
+        """Generate narrative from rule definition and resolved signal variables"""
+        rule_def = compiled.definition
+        actions = rule_def['then'].get('actions', [])
         
-        # Apply template variables
-        narrative_text = template
-        for var_name, var_value in template_vars.items():
-            placeholder = f"{{{var_name}}}"
-            narrative_text = narrative_text.replace(placeholder, str(var_value))
+        # Placeholders no signal provides render unchanged
+        narrative_text = compiled.template.render(template_vars)
         
         return {
             "title": rule_def.get('name', 'Rule Triggered'),
@@ -183,33 +116,32 @@ class RuleEngine:
             "severity": rule_def.get('severity', 'medium')
         }
     
-    def _extract_template_variables(self, rule_def: Dict, signals: List[Signal]) -> Dict:
-        """Extract variables for template substitution"""
+    def _extract_template_variables(self, compiled: CompiledRule, resolve: Callable[[str], Any]) -> Dict:
+        """Extract variables for template substitution; only what the template and conditions refer to is resolved"""
         variables = {}
         
-        # Extract from signals
-        for signal in signals:
-            try:
-                payload = json.loads(signal.payload)
-                
-                # Add signal data to variables
-                signal_key = f"{signal.kind}_data"
-                variables[signal_key] = payload
-                
-                # Add specific fields
-                for key, value in payload.items():
-                    variables[f"{signal.kind}_{key}"] = value
-                    
-            except Exception as e:
-                print(f"Error extracting template variables: {str(e)}")
-                continue
+        # Data of the signals the rule checks, as evidence
+        names = {f"{condition.kind}_data" for condition in compiled.tree.conditions()}
+        for name in sorted(names | compiled.template.variables):
+            value = resolve(name)
+            if value is not MISSING:
+                variables[name] = self._summarize_entity_payload(value)
         
         # Add rule-specific variables
+        rule_def = compiled.definition
         variables['rule_name'] = rule_def.get('name', 'Unknown Rule')
         variables['severity'] = rule_def.get('severity', 'medium')
         
         return variables
     
+    def _summarize_entity_payload(self, value: Any) -> Any:
+        """Entity signal data without its per-entity columns; the totals and top entities remain"""
+        if not isinstance(value, dict) or "entity_columns" not in value:
+            return value
+        
+        per_entity = {"entity_ids", "entity_columns", *value["entity_columns"]}
+        return {key: item for key, item in value.items() if key not in per_entity}
+    
     def create_rule_from_yaml(self, yaml_content: str) -> Dict:
         """Create rule definition from YAML"""
         try:
@@ -220,23 +152,56 @@ class RuleEngine:
     
     def validate_rule_definition(self, rule_def: Dict) -> bool:
         """Validate rule definition structure"""
-        required_fields = ['name', 'when', 'then']
+        return not self.rule_definition_errors(rule_def)
+    
+    def rule_definition_errors(self, rule_def: Dict) -> List[str]:
+        """Problems with a rule definition, checked in its normalized shape"""
+        if not isinstance(rule_def, dict):
+            return ["Rule definition must be a mapping"]
         
-        for field in required_fields:
-            if field not in rule_def:
-                return False
+        errors = []
+        if not isinstance(rule_def.get('name'), str) or not rule_def['name'].strip():
+            errors.append("'name' is required")
         
         # Validate 'when' clause
-        when_clause = rule_def['when']
+        when_clause = rule_def.get('when')
         if not isinstance(when_clause, dict):
+            errors.append("'when' must be a mapping")
+        elif when_clause and not self._validate_condition_node(when_clause):
+            errors.append("'when' must nest all / any / not nodes over conditions with a signal and where criteria")
+        
+        # Validate 'then' clause; narrative_template and actions may also sit at the top level
+        if not isinstance(rule_def.get('then', {}), dict):
+            errors.append("'then' must be a mapping")
+            return errors
+        
+        then_clause = normalize_rule_definition(rule_def)['then']
+        if not isinstance(then_clause.get('narrative_template'), str):
+            errors.append("'then.narrative_template' is required")
+        
+        actions = then_clause.get('actions', [])
+        if not isinstance(actions, list) or not all(isinstance(action, str) for action in actions):
+            errors.append("'then.actions' must be a list of strings")
+        
+        return errors
+    
+    def _validate_condition_node(self, node: Dict) -> bool:
+        """Validate a nested all / any / not node or a single signal condition"""
+        if not isinstance(node, dict):
             return False
         
-        # Validate 'then' clause
-        then_clause = rule_def['then']
-        if not isinstance(then_clause, dict):
+        if 'all' in node or 'any' in node:
+            children = node.get('all', node.get('any'))
+            return isinstance(children, list) and all(self._validate_condition_node(child) for child in children)
+        
+        if 'not' in node:
+            return self._validate_condition_node(node['not'])
+        
+        if not isinstance(node.get('signal'), str):
             return False
         
-        if 'narrative_template' not in then_clause:
+        where_clause = node.get('where', {})
+        if not isinstance(where_clause, dict):
             return False
         
-        return True
+        return all(isinstance(criteria, dict) for criteria in where_clause.values())
@@ -0,0 +1,195 @@
+from typing import Dict, Any, Optional, Tuple
+import threading
+import time
+from app.core.models import Rule
+from app.core.services.rule_compiler import Condition, Resolve, SignalIndex
+
+
+def _condition_label(condition: Condition) -> str:
+    """Readable form of a condition for reports"""
+    kind, where = condition.key
+    return kind if where == "{}" else f"{kind} where {where}"
+
+
+class RuleProfile:
+    """Timings and work counters of one profiled rule evaluation"""
+    
+    def __init__(self, org_id: int):
+        self.org_id = org_id
+        self.started = time.perf_counter()
+        self.total_seconds = 0.0
+        self.signals = 0
+        self.payloads_decoded = 0
+        self.index_seconds = 0.0
+        self.rules: Dict[int, Dict[str, Any]] = {}
+    
+    def record_index(self, index: SignalIndex, seconds: float):
+        """Note the cost of indexing and decoding the signals shared by every rule"""
+        self.signals = len(index.entries)
+        self.payloads_decoded = index.decoded
+        self.index_seconds = seconds
+    
+    def resolver(self, rule: Rule, index: SignalIndex) -> Resolve:
+        """Condition lookup that times each condition and counts the signals it examined"""
+        conditions = self._rule_entry(rule)["conditions"]
+        
+        def resolve(condition: Condition) -> bool:
+            started = time.perf_counter()
+            matched = condition.matches(index)
+            elapsed = time.perf_counter() - started
+            
+            stats = conditions.get(condition.key)
+            if stats is None:
+                stats = conditions[condition.key] = {
+                    "condition": _condition_label(condition),
+                    "evaluations": 0, "matched": 0, "seconds": 0.0, "signals_examined": 0
+                }
+            stats["evaluations"] += 1
+            stats["matched"] += matched
+            stats["seconds"] += elapsed
+            stats["signals_examined"] += len(index.of_kind(condition.kind))
+            return matched
+        
+        return resolve
+    
+    def record_rule(self, rule: Rule, seconds: float, triggered: bool):
+        """Note a rule's total evaluation time, narrative included, and outcome"""
+        entry = self._rule_entry(rule)
+        entry["seconds"] = seconds
+        entry["triggered"] = triggered
+    
+    def finish(self):
+        """Stop the evaluation clock"""
+        self.total_seconds = time.perf_counter() - self.started
+    
+    def report(self) -> Dict[str, Any]:
+        """Per-rule breakdown of this evaluation, slowest rules first"""
+        rules = sorted(self.rules.values(), key=lambda entry: entry["seconds"], reverse=True)
+        return {
+            "total_ms": self.total_seconds * 1000,
+            "signals": self.signals,
+            "payloads_decoded": self.payloads_decoded,
+            "index_ms": self.index_seconds * 1000,
+            "rules": [
+                {
+                    "rule_id": entry["rule_id"],
+                    "rule_name": entry["rule_name"],
+                    "ms": entry["seconds"] * 1000,
+                    "triggered": entry["triggered"],
+                    "conditions": [
+                        {
+                            "condition": stats["condition"],
+                            "evaluations": stats["evaluations"],
+                            "matched": stats["matched"],
+                            "ms": stats["seconds"] * 1000,
+                            "signals_examined": stats["signals_examined"]
+                        }
+                        for stats in sorted(entry["conditions"].values(), key=lambda stats: stats["seconds"], reverse=True)
+                    ]
+                }
+                for entry in rules
+            ]
+        }
+    
+    def _rule_entry(self, rule: Rule) -> Dict[str, Any]:
+        """Per-rule record, created on first use"""
+        entry = self.rules.get(rule.id)
+        if entry is None:
+            entry = self.rules[rule.id] = {
+                "rule_id": rule.id, "rule_name": rule.name, "seconds": 0.0, "triggered": False, "conditions": {}
+            }
+        return entry
+
+
+class RuleMetrics:
+    """Process-level aggregate of profiled evaluations, per org and rule"""
+    
+    def __init__(self):
+        self._rules: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._evaluations: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, profile: RuleProfile):
+        """Fold one evaluation's profile into the aggregate"""
+        with self._lock:
+            totals = self._evaluations.setdefault(profile.org_id, {
+                "evaluations": 0, "seconds": 0.0, "signals": 0, "payloads_decoded": 0, "index_seconds": 0.0
+            })
+            totals["evaluations"] += 1
+            totals["seconds"] += profile.total_seconds
+            totals["signals"] += profile.signals
+            totals["payloads_decoded"] += profile.payloads_decoded
+            totals["index_seconds"] += profile.index_seconds
+            
+            for rule_id, entry in profile.rules.items():
+                metrics = self._rules.setdefault((profile.org_id, rule_id), {
+                    "rule_id": rule_id, "evaluations": 0, "triggers": 0,
+                    "seconds": 0.0, "max_seconds": 0.0, "conditions": {}
+                })
+                metrics["rule_name"] = entry["rule_name"]
+                metrics["evaluations"] += 1
+                metrics["triggers"] += entry["triggered"]
+                metrics["seconds"] += entry["seconds"]
+                metrics["max_seconds"] = max(metrics["max_seconds"], entry["seconds"])
+                
+                for key, stats in entry["conditions"].items():
+                    condition = metrics["conditions"].setdefault(key, {
+                        "condition": stats["condition"], "evaluations": 0, "matched": 0,
+                        "seconds": 0.0, "signals_examined": 0
+                    })
+                    for field in ("evaluations", "matched", "seconds", "signals_examined"):
+                        condition[field] += stats[field]
+    
+    def snapshot(self, org_id: int, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Aggregated metrics of an org's rules, by total time spent"""
+        with self._lock:
+            totals = dict(self._evaluations.get(org_id, {}))
+            rules = [
+                {
+                    "rule_id": metrics["rule_id"],
+                    "rule_name": metrics["rule_name"],
+                    "evaluations": metrics["evaluations"],
+                    "trigger_rate": metrics["triggers"] / metrics["evaluations"],
+                    "total_ms": metrics["seconds"] * 1000,
+                    "avg_ms": metrics["seconds"] * 1000 / metrics["evaluations"],
+                    "max_ms": metrics["max_seconds"] * 1000,
+                    "conditions": [
+                        {
+                            "condition": condition["condition"],
+                            "evaluations": condition["evaluations"],
+                            "match_rate": condition["matched"] / condition["evaluations"],
+                            "total_ms": condition["seconds"] * 1000,
+                            "avg_signals_examined": condition["signals_examined"] / condition["evaluations"]
+                        }
+                        for condition in sorted(metrics["conditions"].values(), key=lambda condition: condition["seconds"], reverse=True)
+                    ]
+                }
+                for (rule_org_id, _), metrics in self._rules.items()
+                if rule_org_id == org_id
+            ]
+        
+        rules.sort(key=lambda metrics: metrics["total_ms"], reverse=True)
+        evaluations = totals.get("evaluations", 0)
+        return {
+            "evaluations": evaluations,
+            "avg_ms": totals["seconds"] * 1000 / evaluations if evaluations else None,
+            "avg_signals": totals["signals"] / evaluations if evaluations else None,
+            "avg_payloads_decoded": totals["payloads_decoded"] / evaluations if evaluations else None,
+            "avg_index_ms": totals["index_seconds"] * 1000 / evaluations if evaluations else None,
+            "rules": rules[:limit] if limit else rules
+        }
+    
+    def reset(self, org_id: int = None):
+        """Drop aggregated metrics for one org, or for all orgs"""
+        with self._lock:
+            if org_id is None:
+                self._rules.clear()
+                self._evaluations.clear()
+                return
+            self._evaluations.pop(org_id, None)
+            for key in [key for key in self._rules if key[0] == org_id]:
+                del self._rules[key]
+
+
+# Shared by all profiled evaluations in the process
+rule_metrics = RuleMetrics()
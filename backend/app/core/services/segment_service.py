@@ -0,0 +1,189 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional
+import json
+import numpy as np
+from app.core.models import Rule, Signal
+from app.core.services.rule_compiler import (
+    AllOf, AnyOf, Condition, Constant, Node, NotOf, OPERATORS, SignalIndex, compile_criteria, rule_cache
+)
+
+ENTITY_ID_FIELD = "entity_ids"
+# Lists in entity payloads that are not aligned with entity_ids
+NON_COLUMN_FIELDS = ["top_entity_ids", "entity_columns"]
+VECTOR_DTYPE_KINDS = "biufU"  # column dtypes compared with NumPy ufuncs
+
+
+class EntityColumns:
+    """Per-entity arrays of one signal's columnar payload, aligned with its sorted entity ids"""
+    
+    def __init__(self, signal: Signal, payload: Dict[str, Any]):
+        self.signal = signal
+        self.payload = payload
+        self.entity_ids = np.asarray(payload[ENTITY_ID_FIELD])
+        
+        names = payload.get("entity_columns")
+        if names is None:
+            # Signals stored before columns were declared: every list aligned with the ids
+            names = [
+                name for name, values in payload.items()
+                if isinstance(values, list) and len(values) == len(self.entity_ids) and name not in NON_COLUMN_FIELDS
+            ]
+        self.columns = {name: payload[name] for name in names if name in payload}
+        self.columns[ENTITY_ID_FIELD] = payload[ENTITY_ID_FIELD]
+
+
+class EntityFrame:
+    """Latest signal of each kind a rule uses, laid out over the union of their entities"""
+    
+    def __init__(self, signals: List[Signal]):
+        self.signals: Dict[str, Signal] = {}
+        self.entity_columns: Dict[str, EntityColumns] = {}
+        
+        for signal in signals:
+            self.signals[signal.kind] = signal
+            payload = signal.payload if isinstance(signal.payload, dict) else self._decode(signal)
+            if isinstance(payload, dict) and isinstance(payload.get(ENTITY_ID_FIELD), list):
+                self.entity_columns[signal.kind] = EntityColumns(signal, payload)
+        
+        arrays = [columns.entity_ids for columns in self.entity_columns.values()]
+        self.entity_ids = np.unique(np.concatenate(arrays)) if arrays else np.array([], dtype=np.int64)
+        
+        # Payload ids are sorted and unique, so each kind maps into the union by binary search
+        self.positions = {
+            kind: np.searchsorted(self.entity_ids, columns.entity_ids)
+            for kind, columns in self.entity_columns.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self.entity_ids)
+    
+    def condition_mask(self, condition: Condition) -> np.ndarray:
+        """Entities for which the kind reports them and every where field holds"""
+        mask = np.zeros(len(self), dtype=bool)
+        
+        columns = self.entity_columns.get(condition.kind)
+        if columns is None:
+            # Org-level signals gate every entity at once
+            signal = self.signals.get(condition.kind)
+            if signal is not None and condition.matches(SignalIndex([signal])):
+                mask[:] = True
+            return mask
+        
+        local = np.ones(len(columns.entity_ids), dtype=bool)
+        for (field, check), criteria in zip(condition.fields, condition.where.values()):
+            if field in columns.columns:
+                local &= column_mask(columns.columns[field], criteria)
+            else:
+                value = columns.payload.get(field)
+                local &= value is not None and _safe_check(check, value)
+            if not local.any():
+                return mask
+        
+        mask[self.positions[condition.kind]] = local
+        return mask
+    
+    def _decode(self, signal: Signal) -> Optional[Dict]:
+        """Decoded payload, or None when it is not valid JSON"""
+        try:
+            return json.loads(signal.payload)
+        except Exception as e:
+            print(f"Error decoding payload of signal {signal.id}: {str(e)}")
+            return None
+
+
+def column_mask(values: List[Any], criteria: Dict) -> np.ndarray:
+    """Elements of a per-entity column that are non-null and meet the criteria"""
+    array = np.asarray(values)
+    if array.ndim != 1 or array.dtype.kind not in VECTOR_DTYPE_KINDS:
+        # Mixed or null-bearing columns fall back to the scalar checks element by element
+        check = compile_criteria(criteria)
+        return np.fromiter((value is not None and _safe_check(check, value) for value in values),
+                           dtype=bool, count=len(values))
+    
+    mask = np.ones(len(array), dtype=bool)
+    if not isinstance(criteria, dict):
+        return ~mask
+    
+    for name, threshold in criteria.items():
+        try:
+            if name == "count":
+                # Column elements are scalars, which count as one
+                mask &= _safe_check(compile_criteria(threshold), 1)
+            elif name == "in":
+                mask &= np.isin(array, list(threshold))
+            elif name in OPERATORS:
+                mask &= np.asarray(OPERATORS[name](array, threshold), dtype=bool)
+        except TypeError:
+            # Incomparable threshold: no element passes, as with scalar evaluation
+            mask[:] = False
+    return mask
+
+
+def _safe_check(check, value: Any) -> bool:
+    """Scalar check where errors count as not passing"""
+    try:
+        return bool(check(value))
+    except Exception:
+        return False
+
+
+class SegmentService:
+    """Service evaluating a rule's condition tree as boolean masks over per-entity signal columns"""
+    
+    def segment(self, rule: Rule, org_id: int, db: Session) -> Dict[str, Any]:
+        """Entities matching the rule against the latest signal of each kind it uses"""
+        compiled = rule_cache.get(rule)
+        kinds = {condition.kind for condition in compiled.tree.conditions()}
+        frame = EntityFrame(self._latest_signals(org_id, kinds, db))
+        
+        mask = self.evaluate(compiled.tree, frame)
+        entity_ids = frame.entity_ids[mask]
+        
+        return {
+            "rule_id": rule.id,
+            "rule_name": rule.name,
+            "evaluated_entities": len(frame),
+            "matched_entities": int(mask.sum()),
+            "entity_ids": entity_ids.tolist(),
+            "signal_ids": {kind: signal.id for kind, signal in frame.signals.items()}
+        }
+    
+    def evaluate(self, node: Node, frame: EntityFrame) -> np.ndarray:
+        """Boolean mask over the frame's entities for a compiled tree, skipping decided subtrees"""
+        if isinstance(node, Condition):
+            return frame.condition_mask(node)
+        
+        if isinstance(node, AnyOf):
+            mask = np.zeros(len(frame), dtype=bool)
+            for child in node.children:
+                mask |= self.evaluate(child, frame)
+                if mask.all():
+                    break
+            return mask
+        
+        if isinstance(node, AllOf):
+            mask = np.ones(len(frame), dtype=bool)
+            for child in node.children:
+                mask &= self.evaluate(child, frame)
+                if not mask.any():
+                    break
+            return mask
+        
+        if isinstance(node, NotOf):
+            return ~self.evaluate(node.child, frame)
+        
+        if isinstance(node, Constant):
+            return np.full(len(frame), node.value, dtype=bool)
+        
+        raise ValueError(f"Unsupported condition node: {type(node).__name__}")
+    
+    def _latest_signals(self, org_id: int, kinds: set, db: Session) -> List[Signal]:
+        """Most recent signal of each kind, in one query"""
+        if not kinds:
+            return []
+        latest = db.query(func.max(Signal.id)).filter(
+            Signal.org_id == org_id,
+            Signal.kind.in_(kinds)
+        ).group_by(Signal.kind)
+        return db.query(Signal).filter(Signal.id.in_(latest.scalar_subquery())).all()
@@ -0,0 +1,67 @@
+from sqlalchemy.orm import Session
+from typing import List, Dict, Callable, Any
+from datetime import datetime
+import threading
+import pandas as pd
+
+
+class SignalDataContext:
+    """Per-computation cache of source frames and derived frames shared by all signals"""
+    
+    def __init__(self, org_id: int, period_start: datetime, period_end: datetime,
+                 db: Session, dataset_id: int = None):
+        self.org_id = org_id
+        self.period_start = period_start
+        self.period_end = period_end
+        self.db = db
+        self.dataset_id = dataset_id
+        
+        self._loaders: Dict[str, Callable[["SignalDataContext"], pd.DataFrame]] = {}
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._derived: Dict[str, Any] = {}
+        self._derived_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._sealed = False
+        self.loads = 0
+    
+    @property
+    def previous_period_start(self) -> datetime:
+        """Start of the window immediately preceding the period"""
+        return self.period_start - (self.period_end - self.period_start)
+    
+    def register_source(self, name: str, loader: Callable[["SignalDataContext"], pd.DataFrame]):
+        """Register how a source frame is loaded; nothing is loaded until requested"""
+        self._loaders[name] = loader
+    
+    def has_source(self, name: str) -> bool:
+        """Whether a loader is registered for the source"""
+        return name in self._loaders
+    
+    def frame(self, name: str) -> pd.DataFrame:
+        """Return a source frame, loading it on first use"""
+        if name not in self._frames:
+            if name not in self._loaders:
+                raise KeyError(f"Unknown signal data source: {name}")
+            if self._sealed:
+                # Loading would touch the session from a worker thread
+                raise KeyError(f"Signal data source was not preloaded: {name}")
+            self._frames[name] = self._loaders[name](self)
+            self.loads += 1
+        return self._frames[name]
+    
+    def preload(self, names: List[str]):
+        """Load the given sources now and refuse lazy loads afterwards"""
+        for name in names:
+            self.frame(name)
+        self._sealed = True
+    
+    def derived(self, name: str, build: Callable[["SignalDataContext"], Any]) -> Any:
+        """Return a derived value, building it once per computation"""
+        if name not in self._derived:
+            with self._lock:
+                lock = self._derived_locks.setdefault(name, threading.Lock())
+            # Signals computed concurrently wait for a build already in progress
+            with lock:
+                if name not in self._derived:
+                    self._derived[name] = build(self)
+        return self._derived[name]
@@ -0,0 +1,136 @@
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Tuple
+from datetime import datetime, timedelta
+import json
+import math
+from app.core.models import Signal, SignalRollup
+from app.core.services.aggregate_service import UPSERT_CHUNK_SIZE, UPSERT_DIALECTS
+
+RESOLUTIONS = ["hour", "day", "week"]
+# Two-argument minimum and maximum per dialect
+LEAST = {"postgresql": func.least, "sqlite": func.min}
+GREATEST = {"postgresql": func.greatest, "sqlite": func.max}
+
+
+class SignalHistoryService:
+    """Service maintaining hourly, daily and weekly rollups of signal scores and payload metrics"""
+    
+    def record(self, org_id: int, signals: List[Signal], db: Session):
+        """Fold new signals into the rollups; the caller commits together with the signals"""
+        updates: Dict[Tuple[str, str, str, datetime], Dict[str, Any]] = {}
+        
+        for signal in signals:
+            at = signal.period_end
+            for metric, value in self.signal_metrics(signal).items():
+                for resolution in RESOLUTIONS:
+                    key = (signal.kind, metric, resolution, self.bucket_start(at, resolution))
+                    bucket = updates.get(key)
+                    if bucket is None:
+                        updates[key] = {"count": 1, "sum": value, "min": value, "max": value,
+                                        "last": value, "last_at": at}
+                        continue
+                    bucket["count"] += 1
+                    bucket["sum"] += value
+                    bucket["min"] = min(bucket["min"], value)
+                    bucket["max"] = max(bucket["max"], value)
+                    if at >= bucket["last_at"]:
+                        bucket["last"], bucket["last_at"] = value, at
+        
+        if updates:
+            self._merge(org_id, updates, db)
+    
+    def history(self, org_id: int, kind: str, metric: str, resolution: str,
+                start: datetime, end: datetime, db: Session) -> List[Dict[str, Any]]:
+        """Rollup points of one metric over [start, end) at the given resolution"""
+        rows = db.query(
+            SignalRollup.bucket_start, SignalRollup.count, SignalRollup.sum,
+            SignalRollup.min, SignalRollup.max, SignalRollup.last
+        ).filter(
+            SignalRollup.org_id == org_id,
+            SignalRollup.kind == kind,
+            SignalRollup.metric == metric,
+            SignalRollup.resolution == resolution,
+            SignalRollup.bucket_start >= self.bucket_start(start, resolution),
+            SignalRollup.bucket_start < end
+        ).order_by(SignalRollup.bucket_start).all()
+        
+        return [
+            {
+                "bucket_start": bucket_start,
+                "count": count,
+                "avg": total / count if count else None,
+                "min": minimum,
+                "max": maximum,
+                "last": last
+            }
+            for bucket_start, count, total, minimum, maximum, last in rows
+        ]
+    
+    def signal_metrics(self, signal: Signal) -> Dict[str, float]:
+        """Score plus the numeric scalar fields of a signal's payload"""
+        metrics = {}
+        if signal.score is not None:
+            metrics["score"] = float(signal.score)
+        
+        payload = signal.payload
+        if isinstance(payload, str):
+            try:
+                payload = json.loads(payload)
+            except (TypeError, ValueError):
+                payload = {}
+        
+        for key, value in (payload or {}).items():
+            # Arrays (entity scores, ids) and flags are not charted
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if math.isfinite(value):
+                metrics[key] = float(value)
+        
+        return metrics
+    
+    def bucket_start(self, at: datetime, resolution: str) -> datetime:
+        """Start of the bucket containing `at`; weeks start on Monday"""
+        if resolution == "hour":
+            return at.replace(minute=0, second=0, microsecond=0)
+        day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+        if resolution == "day":
+            return day
+        if resolution == "week":
+            return day - timedelta(days=day.weekday())
+        if resolution == "month":
+            return day.replace(day=1)
+        raise ValueError(f"Unknown resolution: {resolution}")
+    
+    def _merge(self, org_id: int, updates: Dict[Tuple[str, str, str, datetime], Dict[str, Any]], db: Session):
+        """Add bucket deltas onto the stored rollups with one atomic upsert, creating missing ones"""
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            raise ValueError(f"Signal rollups need an upsert-capable database, not {dialect}")
+        
+        now = datetime.utcnow()
+        rows = [
+            {"org_id": org_id, "kind": kind, "metric": metric, "resolution": resolution,
+             "bucket_start": bucket_start, "created_at": now, "updated_at": now, **bucket}
+            for (kind, metric, resolution, bucket_start), bucket in updates.items()
+        ]
+        
+        # The fold happens in the database, so concurrent runs add up instead of overwriting
+        table = SignalRollup.__table__
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            statement = UPSERT_DIALECTS[dialect](table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            excluded = statement.excluded
+            newer = or_(table.c.last_at.is_(None), excluded.last_at >= table.c.last_at)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.org_id, table.c.kind, table.c.metric, table.c.resolution, table.c.bucket_start],
+                set_={
+                    "count": table.c.count + excluded.count,
+                    "sum": table.c.sum + excluded.sum,
+                    "min": LEAST[dialect](func.coalesce(table.c.min, excluded.min), excluded.min),
+                    "max": GREATEST[dialect](func.coalesce(table.c.max, excluded.max), excluded.max),
+                    "last": case((newer, excluded.last), else_=table.c.last),
+                    "last_at": case((newer, excluded.last_at), else_=table.c.last_at),
+                    "updated_at": excluded.updated_at,
+                }
+            )
+            db.execute(statement)
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.config import settings
+from app.core.services.signal_context import SignalDataContext
+
+# A compute function receives the owning service and the shared data context and
+# returns (payload, score), or None when there is not enough data for the signal.
+ComputeFn = Callable[[Any, SignalDataContext], Optional[Tuple[Dict[str, Any], float]]]
+
+
+@dataclass
+class SignalDefinition:
+    """A registered signal kind with its data dependencies and compute function"""
+    kind: str
+    compute: ComputeFn
+    sources: List[str]
+    threshold: float = 0.5
+    aggregate_sources: Optional[List[str]] = None
+    
+    def required_sources(self, uses_aggregates: bool) -> List[str]:
+        """Sources to preload; windowed signals read daily buckets on org-wide runs"""
+        if uses_aggregates and self.aggregate_sources is not None:
+            return self.aggregate_sources
+        return self.sources
+
+
+@dataclass
+class SignalResult:
+    """Outcome of computing one signal kind"""
+    kind: str
+    payload: Dict[str, Any]
+    score: float
+    threshold: float
+
+
+@dataclass
+class SignalError:
+    """A signal kind that failed during a compute run, and at which stage"""
+    kind: str
+    stage: str  # compute or persist
+    message: str
+
+
+@dataclass
+class SignalComputeRun:
+    """Signals persisted by one compute run together with the kinds that failed"""
+    signals: List[Any] = field(default_factory=list)
+    errors: List[SignalError] = field(default_factory=list)
+    reused: int = 0  # signals served from an earlier run over the same data version
+
+
+SIGNAL_REGISTRY: Dict[str, SignalDefinition] = {}
+
+
+def register_signal(kind: str, sources: List[str], threshold: float = 0.5,
+                    aggregate_sources: List[str] = None):
+    """Decorator registering a compute function for a signal kind"""
+    def decorator(compute: ComputeFn) -> ComputeFn:
+        SIGNAL_REGISTRY[kind] = SignalDefinition(
+            kind=kind,
+            compute=compute,
+            sources=list(sources),
+            threshold=threshold,
+            aggregate_sources=list(aggregate_sources) if aggregate_sources is not None else None
+        )
+        return compute
+    return decorator
+
+
+def get_signal_definitions(kinds: List[str] = None) -> List[SignalDefinition]:
+    """Definitions for the requested kinds in registration order, or all of them"""
+    if not kinds:
+        return list(SIGNAL_REGISTRY.values())
+    
+    unknown = [kind for kind in kinds if kind not in SIGNAL_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown signal kinds: {', '.join(unknown)}")
+    
+    return [definition for kind, definition in SIGNAL_REGISTRY.items() if kind in kinds]
+
+
+class SignalExecutor:
+    """Runs registered signal computations concurrently over a shared data context"""
+    
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.SIGNAL_WORKERS
+    
+    def run(self, service: Any, ctx: SignalDataContext, definitions: List[SignalDefinition],
+            uses_aggregates: bool) -> Tuple[List[SignalResult], List[SignalError]]:
+        """Compute the given signals; returns results in definition order and the failures"""
+        # The session is not thread-safe, so every declared source is loaded up front
+        # on this thread and the workers only read the cached frames.
+        sources = []
+        for definition in definitions:
+            for source in definition.required_sources(uses_aggregates):
+                if source not in sources:
+                    sources.append(source)
+        ctx.preload(sources)
+        
+        workers = min(self.max_workers, len(definitions))
+        if workers <= 1:
+            outcomes = [self._compute(service, ctx, definition) for definition in definitions]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="signal") as pool:
+                outcomes = list(pool.map(lambda d: self._compute(service, ctx, d), definitions))
+        
+        results = []
+        errors = []
+        for definition, (result, error) in zip(definitions, outcomes):
+            if error:
+                errors.append(SignalError(kind=definition.kind, stage="compute", message=error))
+            elif result:
+                results.append(result)
+        
+        return results, errors
+    
+    def _compute(self, service: Any, ctx: SignalDataContext,
+                 definition: SignalDefinition) -> Tuple[Optional[SignalResult], Optional[str]]:
+        """Compute one signal, capturing its error instead of failing the whole run"""
+        try:
+            outcome = definition.compute(service, ctx)
+            if outcome is None:
+                return None, None
+            
+            payload, score = outcome
+            return SignalResult(
+                kind=definition.kind,
+                payload=payload,
+                score=score,
+                threshold=definition.threshold
+            ), None
+        
+        except Exception as e:
+            print(f"Error computing {definition.kind}: {str(e)}")
+            return None, str(e)
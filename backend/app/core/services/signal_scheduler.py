@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Tuple, Callable, Optional
+from datetime import datetime, timedelta
+import hashlib
+import threading
+import time
+from app.config import settings
+from app.core.db import SessionLocal
+from app.core.models import Organization
+from app.core.services.signal_service import SignalService
+
+
+class SignalScheduler:
+    """Recomputes signals for every org on a fixed cadence, staggered across the interval"""
+    
+    def __init__(self, interval_seconds: int = None, period_days: int = None, concurrency: int = None,
+                 session_factory: Callable = None):
+        self.interval_seconds = interval_seconds or settings.SIGNAL_SCHEDULE_INTERVAL_SECONDS
+        self.period_days = period_days or settings.SIGNAL_SCHEDULE_PERIOD_DAYS
+        self.concurrency = concurrency or settings.SIGNAL_SCHEDULER_CONCURRENCY
+        self.session_factory = session_factory or SessionLocal
+        self.signal_service = SignalService()
+        
+        self._next_run: Dict[int, float] = {}
+        self._last_inputs: Dict[int, Tuple[str, str]] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+    
+    def offset(self, org_id: int) -> float:
+        """Stable position of an org inside the interval, so orgs do not all run at once"""
+        digest = hashlib.blake2b(str(org_id).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % (self.interval_seconds * 1000) / 1000
+    
+    def next_slot(self, org_id: int, now: float) -> float:
+        """First time after `now` at which the org's slot comes around"""
+        offset = self.offset(org_id)
+        cycles = (now - offset) // self.interval_seconds + 1
+        return cycles * self.interval_seconds + offset
+    
+    def start(self):
+        """Run the scheduler loop in a background daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="signal-scheduler")
+        self._thread = threading.Thread(target=self.run_forever, name="signal-scheduler", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = None):
+        """Stop the loop and wait for in-flight orgs to finish"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+    
+    def run_forever(self):
+        """Dispatch orgs as their slots come due until stopped"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="signal-scheduler")
+        
+        while not self._stop.is_set():
+            now = time.time()
+            for org_id in self.due_orgs(now):
+                with self._lock:
+                    # An org still running from its previous slot is not queued twice
+                    if org_id in self._in_flight:
+                        continue
+                    self._in_flight.add(org_id)
+                self._pool.submit(self._run_and_release, org_id)
+            
+            # Wake for the next slot, and at least once a minute to pick up new orgs
+            upcoming = min(self._next_run.values(), default=now + 60)
+            self._stop.wait(max(0.5, min(upcoming - time.time(), 60)))
+    
+    def due_orgs(self, now: float) -> List[int]:
+        """Orgs whose slot has passed; newly seen orgs wait for their first slot"""
+        org_ids = self._list_org_ids()
+        due = []
+        
+        for org_id in org_ids:
+            next_run = self._next_run.get(org_id)
+            if next_run is None:
+                self._next_run[org_id] = self.next_slot(org_id, now)
+            elif next_run <= now:
+                due.append(org_id)
+                self._next_run[org_id] = self.next_slot(org_id, now)
+        
+        # Forget orgs that no longer exist
+        for org_id in set(self._next_run) - set(org_ids):
+            del self._next_run[org_id]
+        
+        return due
+    
+    def run_all(self) -> Dict[int, str]:
+        """Run every org once now with bounded concurrency; returns the outcome per org"""
+        org_ids = self._list_org_ids()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="signal-scheduler") as pool:
+            futures = {org_id: pool.submit(self.run_org, org_id) for org_id in org_ids}
+            wait(futures.values())
+        return {org_id: future.result() for org_id, future in futures.items()}
+    
+    def run_org(self, org_id: int) -> str:
+        """Recompute one org's signals unless its inputs are unchanged since the last run"""
+        db = self.session_factory()
+        try:
+            period_end = datetime.utcnow()
+            period_start = period_end - timedelta(days=self.period_days)
+            
+            inputs = (
+                self.signal_service.period_bucket(period_start, period_end),
+                self.signal_service.get_data_version(org_id, db)
+            )
+            if self._last_inputs.get(org_id) == inputs:
+                return "skipped"
+            
+            run = self.signal_service.run_signals(org_id, period_start, period_end, db=db)
+            if run.errors:
+                kinds = ", ".join(error.kind for error in run.errors)
+                print(f"Scheduled signal run for org {org_id} had errors: {kinds}")
+                return "failed"
+            
+            self._last_inputs[org_id] = inputs
+            return "computed"
+        
+        except Exception as e:
+            print(f"Error running scheduled signals for org {org_id}: {str(e)}")
+            return "failed"
+        finally:
+            db.close()
+    
+    def _run_and_release(self, org_id: int):
+        """Run one org from the loop and mark it no longer in flight"""
+        try:
+            self.run_org(org_id)
+        finally:
+            with self._lock:
+                self._in_flight.discard(org_id)
+    
+    def _list_org_ids(self) -> List[int]:
+        """Ids of all organizations"""
+        db = self.session_factory()
+        try:
+            return [org_id for (org_id,) in db.query(Organization.id).order_by(Organization.id).all()]
+        except Exception as e:
+            print(f"Error listing organizations for signal scheduling: {str(e)}")
+            return []
+        finally:
+            db.close()
+
+
+signal_scheduler = SignalScheduler()
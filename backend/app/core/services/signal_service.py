@@ -1,282 +1,713 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Callable
+from datetime import datetime
+import hashlib
 import json
+import numpy as np
 import pandas as pd
-from app.core.models import Signal, RawRecord, Dataset
+from app.core.db import bulk_insert
+from app.core.models import Signal, EmptySignal, RawRecord, Dataset, Event
+from app.core.services.churn_model import model_cache, build_churn_features, load_feature_events
+from app.core.services.aggregate_service import AggregateService, RATING_SCALES, WON_DEAL_STAGES
+from app.core.services.signal_context import SignalDataContext
+from app.core.services.signal_history import SignalHistoryService
+from app.core.services.signal_registry import (
+    SignalExecutor, SignalDefinition, SignalComputeRun, SignalError, register_signal, get_signal_definitions
+)
+from app.core.services.signal_sources import (
+    load_source_frame, load_entity_events, has_dated_records, INVOICE_EVENT_TYPES, TICKET_EVENT_TYPES
+)
+
+CLOSED_DEAL_STAGES = ["closed_won", "closed_lost", "won", "lost"]
+STALL_DAYS = 30
+ENTITY_RISK_THRESHOLD = 0.5  # per-entity score counted as at risk
+OVERDUE_EXPOSURE_SCALE = 10000  # overdue amount that maxes out an entity's exposure score
+TOP_ENTITIES = 10
 
 
 class SignalService:
     """Service for computing business signals and metrics"""
     
-    def compute_signals(self, org_id: int, period_start: datetime, period_end: datetime, 
-                       dataset_id: int = None, db: Session = None) -> List[Signal]:
+    def __init__(self, max_workers: int = None):
+        self.aggregate_service = AggregateService()
+        self.executor = SignalExecutor(max_workers)
+        self.history = SignalHistoryService()
+    
+    def compute_signals(self, org_id: int, period_start: datetime, period_end: datetime,
+                       dataset_id: int = None, db: Session = None, kinds: List[str] = None) -> List[Signal]:
         """Compute signals for the organization"""
-        signals = []
+        return self.run_signals(org_id, period_start, period_end, dataset_id, db, kinds).signals
+    
+    def run_signals(self, org_id: int, period_start: datetime, period_end: datetime,
+                    dataset_id: int = None, db: Session = None, kinds: List[str] = None) -> SignalComputeRun:
+        """Compute signals and persist them in one transaction, reporting failures per kind"""
+        run = SignalComputeRun()
         
-        # Compute pipeline velocity delta
-        velocity_signal = self._compute_pipeline_velocity_delta(org_id, period_start, period_end, db)
-        if velocity_signal:
-            signals.append(velocity_signal)
+        # Only the requested kinds are computed; unknown kinds raise ValueError
+        definitions = get_signal_definitions(kinds)
         
-        # Compute late invoice risk
-        invoice_signal = self._compute_late_invoice_risk(org_id, period_start, period_end, db)
-        if invoice_signal:
-            signals.append(invoice_signal)
+        # Signals already computed for this period bucket from the same data are reused,
+        # and kinds that had too little data for a signal are not computed again
+        period_bucket = self.period_bucket(period_start, period_end)
+        data_version = self.get_data_version(org_id, db, dataset_id)
+        existing = self._find_existing_signals(org_id, period_bucket, data_version, definitions, db)
+        empty = self._find_empty_kinds(org_id, period_bucket, data_version, definitions, db)
+        run.reused = len(existing)
         
-        # Compute stalled deal motif
-        deal_signal = self._compute_stalled_deal_motif(org_id, period_start, period_end, db)
-        if deal_signal:
-            signals.append(deal_signal)
+        missing = [
+            definition for definition in definitions
+            if definition.kind not in existing and definition.kind not in empty
+        ]
+        if not missing:
+            run.signals = [existing[definition.kind] for definition in definitions if definition.kind in existing]
+            return run
         
-        # Compute support churn flag
-        support_signal = self._compute_support_churn_flag(org_id, period_start, period_end, db)
-        if support_signal:
-            signals.append(support_signal)
+        # Fold newly ingested records into the daily buckets before reading windows
+        if dataset_id is None:
+            self.aggregate_service.refresh(org_id, db)
         
-        return signals
-    
-    def _compute_pipeline_velocity_delta(self, org_id: int, period_start: datetime, 
-                                       period_end: datetime, db: Session) -> Signal:
-        """Compute pipeline velocity change"""
-        try:
-            # Get deals data from raw records
-            deals_data = self._get_deals_data(org_id, period_start, period_end, db)
-            
-            if not deals_data:
-                return None
-            
-            # Calculate velocity metrics
-            current_period_velocity = self._calculate_deal_velocity(deals_data, period_start, period_end)
-            previous_period_start = period_start - (period_end - period_start)
-            previous_period_end = period_start
-            previous_period_velocity = self._calculate_deal_velocity(deals_data, previous_period_start, previous_period_end)
-            
-            # Calculate delta
-            if previous_period_velocity > 0:
-                velocity_delta = (current_period_velocity - previous_period_velocity) / previous_period_velocity
-            else:
-                velocity_delta = 0
-            
-            # Normalize score (-1 to 1, where 0 is no change)
-            score = max(-1, min(1, velocity_delta))
-            
-            signal = Signal(
+        # Each source is loaded at most once and shared by every signal
+        ctx = self.build_context(org_id, period_start, period_end, db, dataset_id)
+        uses_aggregates = self._uses_aggregates(ctx)
+        
+        # Kinds whose sources are not available to this org (no trained model) produce nothing
+        computable = [
+            definition for definition in missing
+            if all(ctx.has_source(source) for source in definition.required_sources(uses_aggregates))
+        ]
+        results, run.errors = self.executor.run(self, ctx, computable, uses_aggregates)
+        
+        signals = [
+            Signal(
                 org_id=org_id,
-                kind="pipeline_velocity_delta",
+                kind=result.kind,
                 period_start=period_start,
                 period_end=period_end,
-                payload=json.dumps({
-                    "current_velocity": current_period_velocity,
-                    "previous_velocity": previous_period_velocity,
-                    "delta": velocity_delta,
-                    "deals_count": len(deals_data)
-                }),
-                score=score,
-                threshold=0.1
+                payload=json.dumps(result.payload),
+                score=result.score,
+                threshold=result.threshold,
+                period_bucket=period_bucket,
+                data_version=data_version
             )
-            
-            db.add(signal)
-            db.commit()
-            db.refresh(signal)
-            
-            return signal
-            
+            for result in results
+        ]
+        
+        # Kinds that computed without error but returned nothing are remembered for this version
+        produced = {result.kind for result in results} | {error.kind for error in run.errors}
+        empty_markers = [
+            EmptySignal(org_id=org_id, kind=definition.kind, period_bucket=period_bucket, data_version=data_version)
+            for definition in missing if definition.kind not in produced
+        ]
+        
+        # All signals of the run, their history rollups and the empty markers are written together or not at all
+        try:
+            self.history.record(org_id, signals, db)
+            db.add_all(empty_markers)
+            computed = {signal.kind: signal for signal in bulk_insert(db, signals)}
+            if not signals:
+                db.commit()
+        except IntegrityError:
+            # A concurrent run stored the same versions first; use its rows
+            computed = self._find_existing_signals(org_id, period_bucket, data_version, missing, db)
         except Exception as e:
-            print(f"Error computing pipeline velocity: {str(e)}")
+            db.rollback()
+            print(f"Error saving signals: {str(e)}")
+            computed = {}
+            run.errors.extend(
+                SignalError(kind=result.kind, stage="persist", message=str(e)) for result in results
+            )
+        
+        existing.update(computed)
+        run.signals = [existing[definition.kind] for definition in definitions if definition.kind in existing]
+        return run
+    
+    def period_bucket(self, period_start: datetime, period_end: datetime) -> str:
+        """Day-granular key for a compute period: its length and the day it ends on"""
+        days = round((period_end - period_start).total_seconds() / 86400)
+        return f"{days}d@{period_end.date().isoformat()}"
+    
+    def day_window(self, period_start: datetime, period_end: datetime) -> tuple:
+        """Compute window snapped back to midnights, so raw frames and daily buckets cover the same rows"""
+        start = period_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = period_end.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Windows shorter than a day keep their exact bounds
+        return (start, end) if end > start else (period_start, period_end)
+    
+    def get_data_version(self, org_id: int, db: Session, dataset_id: int = None) -> str:
+        """Hash of the ingestion watermarks of the datasets and events a run reads, and the model version"""
+        query = db.query(
+            RawRecord.dataset_id, func.max(RawRecord.id), func.count(RawRecord.id)
+        ).join(
+            Dataset, RawRecord.dataset_id == Dataset.id
+        ).filter(
+            Dataset.org_id == org_id,
+            Dataset.is_active == True,
+            RawRecord.status == "processed"
+        )
+        if dataset_id:
+            query = query.filter(Dataset.id == dataset_id)
+        
+        watermarks = sorted(query.group_by(RawRecord.dataset_id).all())
+        
+        # Entity signals read events, which are not tied to a dataset
+        events = db.query(func.max(Event.id), func.count(Event.id)).filter(Event.org_id == org_id).one()
+        
+        scope = f"dataset:{dataset_id}" if dataset_id else "org"
+        key = scope + "|" + ",".join(f"{ds}:{max_id}:{count}" for ds, max_id, count in watermarks)
+        key += f"|events:{events[0]}:{events[1]}"
+        
+        # Retraining a model invalidates the signals it scored
+        key += f"|model:{model_cache.current_version(org_id)}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _find_existing_signals(self, org_id: int, period_bucket: str, data_version: str,
+                               definitions: List[SignalDefinition], db: Session) -> Dict[str, Signal]:
+        """Stored signals of the given kinds for a period bucket and data version"""
+        rows = db.query(Signal).filter(
+            Signal.org_id == org_id,
+            Signal.period_bucket == period_bucket,
+            Signal.data_version == data_version,
+            Signal.kind.in_([definition.kind for definition in definitions])
+        ).all()
+        return {signal.kind: signal for signal in rows}
+    
+    def _find_empty_kinds(self, org_id: int, period_bucket: str, data_version: str,
+                          definitions: List[SignalDefinition], db: Session) -> set:
+        """Kinds recorded as having no result for a period bucket and data version"""
+        rows = db.query(EmptySignal.kind).filter(
+            EmptySignal.org_id == org_id,
+            EmptySignal.period_bucket == period_bucket,
+            EmptySignal.data_version == data_version,
+            EmptySignal.kind.in_([definition.kind for definition in definitions])
+        ).all()
+        return {kind for (kind,) in rows}
+    
+    def build_context(self, org_id: int, period_start: datetime, period_end: datetime,
+                      db: Session, dataset_id: int = None) -> SignalDataContext:
+        """Create the data context for one compute run with all sources registered"""
+        # Periods are memoized per day (see period_bucket), so the data read is day-aligned too
+        ctx = SignalDataContext(org_id, *self.day_window(period_start, period_end), db, dataset_id)
+        
+        # Deals cover the previous window too, for velocity comparisons
+        ctx.register_source("deals", lambda c: self._get_deals_data(
+            c.org_id, c.previous_period_start, c.period_end, c.db, c.dataset_id))
+        ctx.register_source("invoices", lambda c: self._get_invoices_data(
+            c.org_id, c.period_start, c.period_end, c.db, c.dataset_id))
+        ctx.register_source("tickets", lambda c: self._get_tickets_data(
+            c.org_id, c.period_start, c.period_end, c.db, c.dataset_id))
+        ctx.register_source("daily_aggregates", lambda c: self.aggregate_service.load_frame(
+            c.org_id, c.previous_period_start, c.period_end, c.db))
+        ctx.register_source("entity_events", lambda c: load_entity_events(
+            c.org_id, c.db, c.previous_period_start, c.period_end))
+        # Model features are only read when the org has a trained model to score them
+        if model_cache.current_version(org_id) is not None:
+            ctx.register_source("feature_events", lambda c: load_feature_events(c.org_id, c.db, c.period_end))
+        
+        return ctx
+    
+    def _uses_aggregates(self, ctx: SignalDataContext) -> bool:
+        """Org-wide runs read windows from daily buckets; dataset-scoped runs scan raw frames"""
+        return ctx.dataset_id is None
+    
+    @register_signal("churn_propensity", sources=["feature_events"], threshold=0.2)
+    def _compute_churn_propensity(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Score every account with the org's trained churn model in one predict_proba call"""
+        loaded = model_cache.get(ctx.org_id)
+        
+        if loaded is None:
             return None
+        
+        model, metadata = loaded
+        features = build_churn_features(ctx.frame("feature_events"), ctx.period_end)
+        if features.empty:
+            return None
+        
+        probabilities = model.predict_proba(features[metadata["features"]].to_numpy())[:, 1]
+        
+        payload, score = self._entity_signal_payload(features.index.to_numpy(), probabilities, {})
+        payload["model_version"] = metadata["version"]
+        return payload, score
     
-    def _compute_late_invoice_risk(self, org_id: int, period_start: datetime, 
-                                 period_end: datetime, db: Session) -> Signal:
+    def _entity_activity(self, ctx: SignalDataContext) -> pd.DataFrame:
+        """Per-entity event counts for both windows, ticket load and recency, indexed by entity id"""
+        events = ctx.frame("entity_events")
+        if events.empty:
+            return pd.DataFrame(columns=["current_events", "previous_events", "current_tickets", "days_since_last_event"])
+        
+        timestamp = events["timestamp"]
+        current = (timestamp >= ctx.period_start) & (timestamp < ctx.period_end)
+        previous = (timestamp >= ctx.previous_period_start) & (timestamp < ctx.period_start)
+        frame = pd.DataFrame({
+            "entity_id": events["entity_id"],
+            "current": current,
+            "previous": previous,
+            "ticket": current & events["event_type"].isin(TICKET_EVENT_TYPES),
+            "timestamp": timestamp.where(current | previous),
+        })
+        frame = frame[current | previous]
+        
+        activity = frame.groupby("entity_id").agg(
+            current_events=("current", "sum"),
+            previous_events=("previous", "sum"),
+            current_tickets=("ticket", "sum"),
+            last_event_at=("timestamp", "max"),
+        ).sort_index()
+        activity["days_since_last_event"] = (pd.Timestamp(ctx.period_end) - activity.pop("last_event_at")).dt.total_seconds() / 86400
+        return activity
+    
+    def _entity_signal_payload(self, entity_ids: np.ndarray, scores: np.ndarray,
+                               columns: Dict[str, np.ndarray]) -> tuple:
+        """Columnar payload of per-entity scores sorted by entity id, with the org-level score"""
+        at_risk = scores >= ENTITY_RISK_THRESHOLD
+        top = np.argsort(-scores, kind="stable")[:TOP_ENTITIES]
+        
+        payload = {
+            "total_entities": int(len(entity_ids)),
+            "at_risk_entities": int(at_risk.sum()),
+            "at_risk_percentage": float(at_risk.mean()) if len(entity_ids) else 0.0,
+            "top_entity_ids": entity_ids[top].tolist(),
+            "entity_ids": entity_ids.tolist(),
+            "scores": np.round(scores, 4).tolist(),
+            "entity_columns": ["scores", *columns],
+        }
+        for name, values in columns.items():
+            payload[name] = np.round(values, 4).tolist() if values.dtype.kind == "f" else values.tolist()
+        
+        # The org-level score is the share of entities at risk
+        return payload, payload["at_risk_percentage"]
+    
+    def _deals_in_period(self, ctx: SignalDataContext) -> pd.DataFrame:
+        """Deals opened before the period end and still open or closed inside the period"""
+        deals = ctx.frame("deals")
+        if deals.empty:
+            return deals
+        in_period = deals["closed_at"].isna() | (deals["closed_at"] >= ctx.period_start)
+        return deals[in_period].reset_index(drop=True)
+    
+    def _deals_with_stage_age(self, ctx: SignalDataContext) -> pd.DataFrame:
+        """Period deals with their stage age in days and open flag"""
+        deals = ctx.derived("deals_in_period", self._deals_in_period)
+        if deals.empty:
+            return deals
+        return deals.assign(
+            stage_age_days=self._deal_stage_age_days(deals, ctx.period_end),
+            is_open=self._open_deal_mask(deals),
+        )
+    
+    @register_signal("pipeline_velocity_delta", sources=["deals"], threshold=0.1,
+                     aggregate_sources=["daily_aggregates"])
+    def _compute_pipeline_velocity_delta(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Compute pipeline velocity change"""
+        # Velocity compares the period against the window before it
+        windows = self._deal_velocity_windows(ctx)
+        
+        if windows is None:
+            return None
+        
+        # Calculate velocity metrics
+        current_period_velocity, current_closed, previous_period_velocity, previous_closed = windows
+        
+        # Calculate delta
+        if previous_period_velocity > 0:
+            velocity_delta = (current_period_velocity - previous_period_velocity) / previous_period_velocity
+        else:
+            velocity_delta = 0
+        
+        # Normalize score (-1 to 1, where 0 is no change)
+        score = max(-1, min(1, velocity_delta))
+        
+        return {
+            "current_velocity": current_period_velocity,
+            "previous_velocity": previous_period_velocity,
+            "delta": velocity_delta,
+            "deals_count": current_closed + previous_closed,
+            "current_closed_deals": current_closed,
+            "previous_closed_deals": previous_closed
+        }, score
+    
+    @register_signal("late_invoice_risk", sources=["invoices"], threshold=0.3,
+                     aggregate_sources=["daily_aggregates"])
+    def _compute_late_invoice_risk(self, ctx: SignalDataContext) -> Optional[tuple]:
         """Compute late invoice risk"""
-        try:
-            # Get invoices data
-            invoices_data = self._get_invoices_data(org_id, period_start, period_end, db)
-            
-            if not invoices_data:
-                return None
-            
-            # Calculate risk metrics
-            total_invoices = len(invoices_data)
-            late_invoices = sum(1 for inv in invoices_data if self._is_invoice_late(inv))
-            late_percentage = late_invoices / total_invoices if total_invoices > 0 else 0
-            
-            # Calculate total late amount
-            late_amount = sum(float(inv.get('amount', 0)) for inv in invoices_data if self._is_invoice_late(inv))
-            
-            # Risk score based on percentage and amount
-            risk_score = min(1.0, (late_percentage * 0.7) + (min(late_amount / 10000, 1.0) * 0.3))
-            
-            signal = Signal(
-                org_id=org_id,
-                kind="late_invoice_risk",
-                period_start=period_start,
-                period_end=period_end,
-                payload=json.dumps({
-                    "total_invoices": total_invoices,
-                    "late_invoices": late_invoices,
-                    "late_percentage": late_percentage,
-                    "late_amount": late_amount,
-                    "risk_score": risk_score
-                }),
-                score=risk_score,
-                threshold=0.3
-            )
-            
-            db.add(signal)
-            db.commit()
-            db.refresh(signal)
-            
-            return signal
-            
-        except Exception as e:
-            print(f"Error computing late invoice risk: {str(e)}")
+        # Get invoice counts for the period
+        window = self._invoice_window(ctx)
+        
+        if window is None:
             return None
+        
+        # Calculate risk metrics
+        total_invoices, late_invoices, late_amount = window
+        late_percentage = late_invoices / total_invoices if total_invoices > 0 else 0
+        
+        # Risk score based on percentage and amount
+        risk_score = min(1.0, (late_percentage * 0.7) + (min(late_amount / 10000, 1.0) * 0.3))
+        
+        return {
+            "total_invoices": total_invoices,
+            "late_invoices": late_invoices,
+            "late_percentage": late_percentage,
+            "late_amount": late_amount,
+            "risk_score": risk_score
+        }, risk_score
     
-    def _compute_stalled_deal_motif(self, org_id: int, period_start: datetime, 
-                                  period_end: datetime, db: Session) -> Signal:
+    @register_signal("stalled_deal_motif", sources=["deals"], threshold=0.4)
+    def _compute_stalled_deal_motif(self, ctx: SignalDataContext) -> Optional[tuple]:
         """Compute stalled deal patterns"""
-        try:
-            # Get deals data
-            deals_data = self._get_deals_data(org_id, period_start, period_end, db)
-            
-            if not deals_data:
-                return None
-            
-            # Find stalled deals (no stage change in 30+ days)
-            stalled_deals = []
-            for deal in deals_data:
-                if self._is_deal_stalled(deal):
-                    stalled_deals.append(deal)
-            
-            stalled_count = len(stalled_deals)
-            total_deals = len(deals_data)
-            stalled_percentage = stalled_count / total_deals if total_deals > 0 else 0
-            
-            # Calculate average stall duration
-            stall_durations = [self._get_deal_stall_duration(deal) for deal in stalled_deals]
-            avg_stall_duration = sum(stall_durations) / len(stall_durations) if stall_durations else 0
-            
-            # Score based on percentage and duration
-            score = min(1.0, (stalled_percentage * 0.6) + (min(avg_stall_duration / 60, 1.0) * 0.4))
-            
-            signal = Signal(
-                org_id=org_id,
-                kind="stalled_deal_motif",
-                period_start=period_start,
-                period_end=period_end,
-                payload=json.dumps({
-                    "total_deals": total_deals,
-                    "stalled_deals": stalled_count,
-                    "stalled_percentage": stalled_percentage,
-                    "avg_stall_duration": avg_stall_duration,
-                    "stalled_deal_ids": [deal.get('deal_id', 'unknown') for deal in stalled_deals]
-                }),
-                score=score,
-                threshold=0.4
-            )
-            
-            db.add(signal)
-            db.commit()
-            db.refresh(signal)
-            
-            return signal
-            
-        except Exception as e:
-            print(f"Error computing stalled deal motif: {str(e)}")
+        # Get deals data with stage age, shared with any other deal signal
+        deals = ctx.derived("deals_with_stage_age", self._deals_with_stage_age)
+        
+        if deals.empty:
             return None
+        
+        # Find stalled deals (no stage change in 30+ days)
+        stage_age = deals["stage_age_days"]
+        stalled = deals["is_open"] & (stage_age >= STALL_DAYS)
+        
+        stalled_count = int(stalled.sum())
+        total_deals = len(deals)
+        stalled_percentage = stalled_count / total_deals if total_deals > 0 else 0
+        
+        # Calculate average stall duration
+        avg_stall_duration = float(stage_age[stalled].mean()) if stalled_count else 0
+        
+        # Score based on percentage and duration
+        score = min(1.0, (stalled_percentage * 0.6) + (min(avg_stall_duration / 60, 1.0) * 0.4))
+        
+        return {
+            "total_deals": total_deals,
+            "stalled_deals": stalled_count,
+            "stalled_percentage": stalled_percentage,
+            "avg_stall_duration": avg_stall_duration,
+            "stalled_deal_ids": deals.loc[stalled, "deal_id"].fillna("unknown").tolist()
+        }, score
     
-    def _compute_support_churn_flag(self, org_id: int, period_start: datetime, 
-                                  period_end: datetime, db: Session) -> Signal:
+    @register_signal("support_churn_flag", sources=["tickets"], threshold=0.5,
+                     aggregate_sources=["daily_aggregates"])
+    def _compute_support_churn_flag(self, ctx: SignalDataContext) -> Optional[tuple]:
         """Compute support churn indicators"""
-        try:
-            # Get support tickets data
-            tickets_data = self._get_tickets_data(org_id, period_start, period_end, db)
-            
-            if not tickets_data:
-                return None
-            
-            # Calculate churn indicators
-            high_severity_tickets = sum(1 for ticket in tickets_data if ticket.get('severity') in ['high', 'critical'])
-            unresolved_tickets = sum(1 for ticket in tickets_data if ticket.get('status') not in ['resolved', 'closed'])
-            
-            total_tickets = len(tickets_data)
-            
-            # Churn risk factors
-            severity_risk = high_severity_tickets / total_tickets if total_tickets > 0 else 0
-            resolution_risk = unresolved_tickets / total_tickets if total_tickets > 0 else 0
-            
-            # Combined churn score
-            churn_score = (severity_risk * 0.6) + (resolution_risk * 0.4)
-            
-            signal = Signal(
-                org_id=org_id,
-                kind="support_churn_flag",
-                period_start=period_start,
-                period_end=period_end,
-                payload=json.dumps({
-                    "total_tickets": total_tickets,
-                    "high_severity_tickets": high_severity_tickets,
-                    "unresolved_tickets": unresolved_tickets,
-                    "severity_risk": severity_risk,
-                    "resolution_risk": resolution_risk,
-                    "churn_score": churn_score
-                }),
-                score=churn_score,
-                threshold=0.5
-            )
-            
-            db.add(signal)
-            db.commit()
-            db.refresh(signal)
-            
-            return signal
-            
-        except Exception as e:
-            print(f"Error computing support churn flag: {str(e)}")
+        # Get support ticket counts for the period
+        window = self._ticket_window(ctx)
+        
+        if window is None:
+            return None
+        
+        # Calculate churn indicators
+        total_tickets, high_severity_tickets, unresolved_tickets = window
+        
+        # Churn risk factors
+        severity_risk = high_severity_tickets / total_tickets if total_tickets > 0 else 0
+        resolution_risk = unresolved_tickets / total_tickets if total_tickets > 0 else 0
+        
+        # Combined churn score
+        churn_score = (severity_risk * 0.6) + (resolution_risk * 0.4)
+        
+        return {
+            "total_tickets": total_tickets,
+            "high_severity_tickets": high_severity_tickets,
+            "unresolved_tickets": unresolved_tickets,
+            "severity_risk": severity_risk,
+            "resolution_risk": resolution_risk,
+            "churn_score": churn_score
+        }, churn_score
+    
+    @register_signal("revenue_trend", sources=["deals"], threshold=0.1,
+                     aggregate_sources=["daily_aggregates"])
+    def _compute_revenue_trend(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Compute won revenue change against the previous window"""
+        windows = self._won_revenue_windows(ctx)
+        
+        if windows is None:
+            return None
+        
+        (current_won, current_revenue), (previous_won, previous_revenue) = windows
+        
+        if previous_revenue > 0:
+            revenue_delta = (current_revenue - previous_revenue) / previous_revenue
+        else:
+            revenue_delta = 0
+        
+        # Normalize score (-1 to 1, where 0 is no change)
+        score = max(-1, min(1, revenue_delta))
+        
+        return {
+            "current_revenue": current_revenue,
+            "previous_revenue": previous_revenue,
+            "delta": revenue_delta,
+            "current_won_deals": current_won,
+            "previous_won_deals": previous_won
+        }, score
+    
+    @register_signal("customer_satisfaction", sources=["tickets"], threshold=0.4,
+                     aggregate_sources=["daily_aggregates"])
+    def _compute_customer_satisfaction(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Compute customer satisfaction from ticket ratings"""
+        window = self._satisfaction_window(ctx)
+        
+        if window is None:
+            return None
+        
+        rated_tickets, total_tickets, total_satisfaction, dissatisfied = window
+        avg_satisfaction = total_satisfaction / rated_tickets
+        
+        # Score rises as satisfaction falls, like the other risk signals
+        score = 1.0 - avg_satisfaction
+        
+        return {
+            "rated_tickets": rated_tickets,
+            "total_tickets": total_tickets,
+            "avg_satisfaction": avg_satisfaction,
+            "dissatisfied_tickets": dissatisfied,
+            "dissatisfied_percentage": dissatisfied / rated_tickets
+        }, score
+    
+    @register_signal("account_churn_risk", sources=["entity_events"], threshold=0.2)
+    def _compute_account_churn_risk(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Compute churn risk for every account in one pass over its events"""
+        activity = ctx.derived("entity_activity", self._entity_activity)
+        
+        if activity.empty:
             return None
+        
+        period_days = max((ctx.period_end - ctx.period_start).total_seconds() / 86400, 1.0)
+        current = activity["current_events"].to_numpy(dtype=float)
+        previous = activity["previous_events"].to_numpy(dtype=float)
+        
+        # Activity decline against the previous window, staleness and support load
+        decline = np.clip(np.divide(previous - current, previous, out=np.zeros_like(current), where=previous > 0), 0, 1)
+        recency = np.clip(activity["days_since_last_event"].to_numpy(dtype=float) / period_days, 0, 1)
+        support = np.clip(activity["current_tickets"].to_numpy(dtype=float) / np.maximum(current, 1), 0, 1)
+        scores = (decline * 0.5) + (recency * 0.3) + (support * 0.2)
+        
+        return self._entity_signal_payload(activity.index.to_numpy(), scores, {
+            "activity_decline": decline,
+            "days_since_last_event": activity["days_since_last_event"].to_numpy(dtype=float),
+            "current_tickets": activity["current_tickets"].to_numpy(dtype=int),
+        })
     
-    def _get_deals_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session) -> List[Dict]:
+    @register_signal("account_overdue_exposure", sources=["entity_events"], threshold=0.2)
+    def _compute_account_overdue_exposure(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """Compute unpaid overdue invoice exposure for every customer in one group-by"""
+        events = ctx.frame("entity_events")
+        
+        if events.empty:
+            return None
+        
+        invoices = events[events["event_type"].isin(INVOICE_EVENT_TYPES)]
+        overdue = invoices["paid_at"].isna() & (invoices["due_date"] < ctx.period_end)
+        overdue = overdue.fillna(False)
+        if not overdue.any():
+            return None
+        
+        exposure = invoices.loc[overdue].groupby("entity_id").agg(
+            overdue_amount=("amount", "sum"),
+            overdue_invoices=("amount", "size"),
+        ).sort_index()
+        
+        amounts = exposure["overdue_amount"].fillna(0.0).to_numpy(dtype=float)
+        scores = np.minimum(amounts / OVERDUE_EXPOSURE_SCALE, 1.0)
+        
+        payload, score = self._entity_signal_payload(exposure.index.to_numpy(), scores, {
+            "overdue_amount": amounts,
+            "overdue_invoices": exposure["overdue_invoices"].to_numpy(dtype=int),
+        })
+        payload["total_overdue_amount"] = float(amounts.sum())
+        return payload, score
+    
+    def _get_deals_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session,
+                        dataset_id: int = None) -> pd.DataFrame:
         """Get deals data from raw records"""
-        # This would typically query a deals dataset
-        # For MVP, we'll return sample data
-        return []
+        deals = load_source_frame(org_id, "deals", db, dataset_id, start=period_start, end=period_end)
+        if deals.empty:
+            return deals
+        
+        # Deals opened before the period end that were still open or closed inside it
+        in_period = deals["created_at"].isna() | (deals["created_at"] < period_end)
+        in_period &= deals["closed_at"].isna() | (deals["closed_at"] >= period_start)
+        return deals[in_period].reset_index(drop=True)
     
-    def _get_invoices_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session) -> List[Dict]:
+    def _get_invoices_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session,
+                           dataset_id: int = None) -> pd.DataFrame:
         """Get invoices data from raw records"""
-        # This would typically query an invoices dataset
-        # For MVP, we'll return sample data
-        return []
+        invoices = load_source_frame(org_id, "invoices", db, dataset_id, start=period_start, end=period_end)
+        if invoices.empty:
+            return invoices
+        
+        # Invoices due in the period (issue date when no due date is known)
+        due = invoices["due_date"].fillna(invoices["issued_at"])
+        return self._restrict_to_period(invoices, due, period_start, period_end,
+                                        lambda: has_dated_records(org_id, "invoices", db, dataset_id))
     
-    def _get_tickets_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session) -> List[Dict]:
+    def _get_tickets_data(self, org_id: int, period_start: datetime, period_end: datetime, db: Session,
+                          dataset_id: int = None) -> pd.DataFrame:
         """Get support tickets data from raw records"""
-        # This would typically query a tickets dataset
-        # For MVP, we'll return sample data
-        return []
+        tickets = load_source_frame(org_id, "tickets", db, dataset_id, start=period_start, end=period_end)
+        if tickets.empty:
+            return tickets
+        
+        return self._restrict_to_period(tickets, tickets["opened_at"], period_start, period_end,
+                                        lambda: has_dated_records(org_id, "tickets", db, dataset_id))
+    
+    def _restrict_to_period(self, frame: pd.DataFrame, timestamps: pd.Series,
+                            start: datetime, end: datetime, dated: Callable[[], bool]) -> pd.DataFrame:
+        """Keep rows whose timestamp falls inside [start, end)"""
+        # Dated records outside the period were already skipped in SQL, so ask whether any exist
+        if timestamps.isna().all() and not dated():
+            # Source carries no usable timestamp; nothing to restrict on
+            return frame
+        
+        in_period = (timestamps >= start) & (timestamps < end)
+        return frame[in_period].reset_index(drop=True)
+    
+    def _deal_velocity_windows(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """(current velocity, closed deals, previous velocity, closed deals) for the two windows"""
+        windows = [(ctx.period_start, ctx.period_end), (ctx.previous_period_start, ctx.period_start)]
+        
+        if self._uses_aggregates(ctx):
+            buckets = ctx.frame("daily_aggregates")
+            stats = [self.aggregate_service.window(buckets, "deals_closed", start, end) for start, end in windows]
+        else:
+            deals = ctx.frame("deals")
+            if deals.empty:
+                return None
+            stats = [self._deal_cycle_stats(deals, start, end) for start, end in windows]
+        
+        (current_closed, current_days), (previous_closed, previous_days) = stats
+        if current_closed + previous_closed == 0:
+            return None
+        
+        return (
+            self._calculate_deal_velocity(current_closed, current_days),
+            current_closed,
+            self._calculate_deal_velocity(previous_closed, previous_days),
+            previous_closed,
+        )
+    
+    def _deal_cycle_stats(self, deals: pd.DataFrame, start: datetime, end: datetime) -> tuple:
+        """(closed deals, total cycle days) for deals closed in [start, end)"""
+        closed_in_window = deals["closed_at"].notna() & (deals["closed_at"] >= start) & (deals["closed_at"] < end)
+        cycle_days = (deals.loc[closed_in_window, "closed_at"] - deals.loc[closed_in_window, "created_at"]).dt.total_seconds() / 86400
+        cycle_days = cycle_days.dropna()
+        
+        return len(cycle_days), float(cycle_days.sum())
+    
+    def _won_revenue_windows(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """((won deals, won amount) current, (won deals, won amount) previous)"""
+        windows = [(ctx.period_start, ctx.period_end), (ctx.previous_period_start, ctx.period_start)]
+        
+        if self._uses_aggregates(ctx):
+            buckets = ctx.frame("daily_aggregates")
+            stats = [self.aggregate_service.window(buckets, "deals_won", start, end) for start, end in windows]
+        else:
+            deals = ctx.frame("deals")
+            if deals.empty:
+                return None
+            won = deals["stage"].str.lower().isin(WON_DEAL_STAGES).fillna(False)
+            stats = []
+            for start, end in windows:
+                in_window = won & deals["closed_at"].notna() & (deals["closed_at"] >= start) & (deals["closed_at"] < end)
+                stats.append((int(in_window.sum()), float(deals.loc[in_window, "amount"].fillna(0.0).sum())))
+        
+        if stats[0][0] + stats[1][0] == 0:
+            return None
+        
+        return stats[0], stats[1]
+    
+    def _rating_scale(self, max_rating: float) -> float:
+        """Upper bound of the rating scale a set of ratings was given on"""
+        for scale in RATING_SCALES[:-1]:
+            if max_rating <= scale:
+                return scale
+        return RATING_SCALES[-1]
     
-    def _calculate_deal_velocity(self, deals_data: List[Dict], start: datetime, end: datetime) -> float:
+    def _calculate_deal_velocity(self, closed_deals: int, total_cycle_days: float) -> float:
         """Calculate average deal velocity in days"""
-        # Placeholder implementation
-        return 30.0
+        return total_cycle_days / closed_deals if closed_deals else 0.0
     
-    def _is_invoice_late(self, invoice: Dict) -> bool:
-        """Check if invoice is late"""
-        due_date = invoice.get('due_date')
-        if not due_date:
-            return False
+    def _invoice_window(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """(invoices due, late invoices, late amount) for the period"""
+        if self._uses_aggregates(ctx):
+            buckets = ctx.frame("daily_aggregates")
+            start, end = ctx.period_start, ctx.period_end
+            total_invoices, _ = self.aggregate_service.window(buckets, "invoices_due", start, end)
+            if not total_invoices:
+                return None
+            # Every bucket in the window is due before period_end, so unpaid means late
+            paid_late, paid_late_amount = self.aggregate_service.window(buckets, "invoices_paid_late", start, end)
+            unpaid, unpaid_amount = self.aggregate_service.window(buckets, "invoices_unpaid", start, end)
+            return total_invoices, paid_late + unpaid, paid_late_amount + unpaid_amount
         
-        try:
-            due_date = pd.to_datetime(due_date)
-            return due_date < datetime.utcnow()
-        except:
-            return False
-    
-    def _is_deal_stalled(self, deal: Dict) -> bool:
-        """Check if deal is stalled"""
-        # Placeholder implementation
-        return False
-    
-    def _get_deal_stall_duration(self, deal: Dict) -> int:
-        """Get deal stall duration in days"""
-        # Placeholder implementation
-        return 45
+        invoices = ctx.frame("invoices")
+        if invoices.empty:
+            return None
+        
+        # Calculate risk metrics over the whole frame at once
+        late = self._late_invoice_mask(invoices, ctx.period_end)
+        late_amount = float(invoices["amount"].where(late, 0.0).fillna(0.0).sum())
+        return len(invoices), int(late.sum()), late_amount
+    
+    def _ticket_window(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """(tickets opened, high severity tickets, unresolved tickets) for the period"""
+        if self._uses_aggregates(ctx):
+            buckets = ctx.frame("daily_aggregates")
+            start, end = ctx.period_start, ctx.period_end
+            total_tickets, _ = self.aggregate_service.window(buckets, "tickets_opened", start, end)
+            if not total_tickets:
+                return None
+            high_severity_tickets, _ = self.aggregate_service.window(buckets, "tickets_high_severity", start, end)
+            unresolved_tickets, _ = self.aggregate_service.window(buckets, "tickets_unresolved", start, end)
+            return total_tickets, high_severity_tickets, unresolved_tickets
+        
+        tickets = ctx.frame("tickets")
+        if tickets.empty:
+            return None
+        
+        high_severity_tickets = int(tickets["severity"].str.lower().isin(["high", "critical"]).sum())
+        unresolved_tickets = int((~tickets["status"].str.lower().isin(["resolved", "closed"]).fillna(False)).sum())
+        return len(tickets), high_severity_tickets, unresolved_tickets
+    
+    def _satisfaction_window(self, ctx: SignalDataContext) -> Optional[tuple]:
+        """(rated tickets, tickets opened, summed 0-1 satisfaction, dissatisfied tickets) for the period"""
+        # Ratings arrive on 0-1, 1-5, 1-10 or 0-100 scales; normalize to 0-1
+        if self._uses_aggregates(ctx):
+            buckets = ctx.frame("daily_aggregates")
+            start, end = ctx.period_start, ctx.period_end
+            rated_tickets, rating_total = self.aggregate_service.window(buckets, "tickets_rated", start, end)
+            if not rated_tickets:
+                return None
+            total_tickets, _ = self.aggregate_service.window(buckets, "tickets_opened", start, end)
+            # The smallest scale no rating in the window exceeds
+            scale = next((
+                scale for scale in RATING_SCALES[:-1]
+                if not self.aggregate_service.window(buckets, f"tickets_rated_over_{scale:g}", start, end)[0]
+            ), RATING_SCALES[-1])
+            dissatisfied, _ = self.aggregate_service.window(buckets, f"tickets_dissatisfied_{scale:g}", start, end)
+            return rated_tickets, total_tickets, rating_total / scale, dissatisfied
+        
+        tickets = ctx.frame("tickets")
+        ratings = tickets["csat"].dropna()
+        if ratings.empty:
+            return None
+        
+        satisfaction = (ratings / self._rating_scale(float(ratings.max()))).clip(0, 1)
+        return len(ratings), len(tickets), float(satisfaction.sum()), int((satisfaction < 0.5).sum())
+    
+    def _late_invoice_mask(self, invoices: pd.DataFrame, as_of: datetime) -> pd.Series:
+        """Invoices past due and unpaid as of `as_of`, or paid after their due date"""
+        due = invoices["due_date"]
+        paid = invoices["paid_at"]
+        
+        unpaid_overdue = paid.isna() & (due < as_of)
+        paid_late = paid.notna() & (paid > due)
+        return (due.notna() & (unpaid_overdue | paid_late)).fillna(False)
+    
+    def _open_deal_mask(self, deals: pd.DataFrame) -> pd.Series:
+        """Deals that are neither closed nor in a closed stage"""
+        closed_stage = deals["stage"].str.lower().isin(CLOSED_DEAL_STAGES).fillna(False)
+        return deals["closed_at"].isna() & ~closed_stage
+    
+    def _deal_stage_age_days(self, deals: pd.DataFrame, as_of: datetime) -> pd.Series:
+        """Days each deal has spent in its current stage as of `as_of`"""
+        last_change = deals["stage_changed_at"].fillna(deals["updated_at"]).fillna(deals["created_at"])
+        return (pd.Timestamp(as_of) - last_change).dt.total_seconds() / 86400
@@ -0,0 +1,218 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import Dict, Tuple
+from datetime import datetime
+import json
+import numpy as np
+import pandas as pd
+from app.core.models import RawRecord, Dataset, Event, Entity
+
+# Typed column schemas for each source frame; aliases map alternative
+# source column names onto the canonical one.
+DEAL_COLUMNS = {
+    "deal_id": "string",
+    "account": "string",
+    "amount": "float",
+    "stage": "string",
+    "created_at": "datetime",
+    "closed_at": "datetime",
+    "stage_changed_at": "datetime",
+    "updated_at": "datetime",
+}
+INVOICE_COLUMNS = {
+    "invoice_id": "string",
+    "account": "string",
+    "amount": "float",
+    "issued_at": "datetime",
+    "due_date": "datetime",
+    "paid_at": "datetime",
+}
+TICKET_COLUMNS = {
+    "ticket_id": "string",
+    "account": "string",
+    "opened_at": "datetime",
+    "severity": "string",
+    "status": "string",
+    "csat": "float",
+}
+# Properties read from Event rows alongside the entity/event columns
+ENTITY_EVENT_PROPERTIES = {
+    "amount": "float",
+    "due_date": "datetime",
+    "paid_at": "datetime",
+}
+INVOICE_EVENT_TYPES = ["invoice"]
+TICKET_EVENT_TYPES = ["ticket", "support_ticket"]
+COLUMN_ALIASES = {
+    "due_date": ["due_at"],
+    "issued_at": ["invoice_date"],
+    "ticket_id": ["case_id"],
+    "deal_id": ["opportunity"],
+    "csat": ["satisfaction", "satisfaction_score", "csat_score"],
+}
+
+# Source name -> (marker key identifying its records, column schema)
+SOURCES = {
+    "deals": ("deal_id", DEAL_COLUMNS),
+    "invoices": ("invoice_id", INVOICE_COLUMNS),
+    "tickets": ("ticket_id", TICKET_COLUMNS),
+}
+# Source name -> columns bounding when a record is relevant: (active from, active until),
+# each the first non-null of its columns. Deals span their life, invoices and tickets one date.
+SOURCE_SPANS = {
+    "deals": (["created_at"], ["closed_at"]),
+    "invoices": (["due_date", "issued_at"], ["due_date", "issued_at"]),
+    "tickets": (["opened_at"], ["opened_at"]),
+}
+
+
+def load_source_frame(org_id: int, source: str, db: Session, dataset_id: int = None,
+                      min_record_id: int = None, aggregate_batch: str = None,
+                      start: datetime = None, end: datetime = None) -> pd.DataFrame:
+    """Load raw records of a source from the org's datasets into a typed frame"""
+    columns = SOURCES[source][1]
+    
+    # One query per source: records of the org's active datasets with the marker key
+    query = _source_query(org_id, source, db, dataset_id).with_entities(
+        RawRecord.id, RawRecord.created_at, RawRecord.payload
+    )
+    if min_record_id:
+        query = query.filter(RawRecord.id > min_record_id)
+    if aggregate_batch:
+        query = query.filter(RawRecord.aggregate_batch == aggregate_batch)
+    
+    # Records whose span misses [start, end) are skipped; unknown spans are loaded and filtered by the caller
+    if end is not None:
+        query = query.filter(or_(RawRecord.active_from.is_(None), RawRecord.active_from < end))
+    if start is not None:
+        query = query.filter(or_(RawRecord.active_until.is_(None), RawRecord.active_until >= start))
+    rows = query.all()
+    
+    if not rows:
+        return pd.DataFrame(columns=["record_id", "ingested_at", *columns])
+    
+    payloads = []
+    record_ids = []
+    ingested = []
+    for record_id, created_at, payload in rows:
+        try:
+            payloads.append(json.loads(payload))
+            record_ids.append(record_id)
+            ingested.append(created_at)
+        except (TypeError, ValueError):
+            continue
+    
+    frame = pd.DataFrame.from_records(payloads)
+    frame.insert(0, "record_id", np.asarray(record_ids, dtype=np.int64))
+    frame.insert(1, "ingested_at", pd.to_datetime(pd.Series(ingested, index=frame.index), errors="coerce"))
+    return coerce_columns(frame, columns)
+
+
+def has_dated_records(org_id: int, source: str, db: Session, dataset_id: int = None) -> bool:
+    """Whether any record of the source was stored with a known span"""
+    query = _source_query(org_id, source, db, dataset_id).filter(
+        or_(RawRecord.active_from.isnot(None), RawRecord.active_until.isnot(None))
+    )
+    return db.query(query.exists()).scalar()
+
+
+def record_spans(frame: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """(active from, active until) of each row of an ingested table; None where unknown or unbounded"""
+    unbounded = pd.Series([None] * len(frame), index=frame.index, dtype="object")
+    sources = [
+        source for source, (marker, _) in SOURCES.items()
+        if any(name in frame for name in [marker] + COLUMN_ALIASES.get(marker, []))
+    ]
+    # Rows read by several sources (or none) cannot carry one span
+    if len(sources) != 1:
+        return unbounded, unbounded
+    
+    source = sources[0]
+    typed = coerce_columns(frame.copy(), SOURCES[source][1])
+    spans = []
+    for names in SOURCE_SPANS[source]:
+        bound = typed[names[0]]
+        for name in names[1:]:
+            bound = bound.fillna(typed[name])
+        spans.append(pd.Series(
+            [None if pd.isna(value) else value.to_pydatetime() for value in bound],
+            index=frame.index, dtype="object"
+        ))
+    return spans[0], spans[1]
+
+
+def _source_query(org_id: int, source: str, db: Session, dataset_id: int = None):
+    """Processed records of the org's active datasets that carry the source's marker key"""
+    marker = SOURCES[source][0]
+    markers = [marker] + COLUMN_ALIASES.get(marker, [])
+    
+    query = db.query(RawRecord).join(
+        Dataset, RawRecord.dataset_id == Dataset.id
+    ).filter(
+        Dataset.org_id == org_id,
+        Dataset.is_active == True,
+        RawRecord.status == "processed"
+    )
+    if dataset_id:
+        query = query.filter(Dataset.id == dataset_id)
+    
+    marker_filter = RawRecord.payload.contains(f'"{markers[0]}"')
+    for alias in markers[1:]:
+        marker_filter |= RawRecord.payload.contains(f'"{alias}"')
+    return query.filter(marker_filter)
+
+
+def load_entity_events(org_id: int, db: Session, start: datetime, end: datetime) -> pd.DataFrame:
+    """Load the org's events joined to their entities in one query"""
+    # Events in [start, end), plus every earlier invoice since it stays outstanding until paid
+    rows = db.query(
+        Event.entity_id, Entity.type, Event.type, Event.timestamp, Event.properties
+    ).join(
+        Entity, Event.entity_id == Entity.id
+    ).filter(
+        Event.org_id == org_id,
+        Event.timestamp < end,
+        or_(Event.timestamp >= start, Event.type.in_(INVOICE_EVENT_TYPES))
+    ).all()
+    
+    # Only invoice events carry properties the entity signals read
+    invoice_types = set(INVOICE_EVENT_TYPES)
+    positions = []
+    properties = []
+    for position, row in enumerate(rows):
+        if not row[4] or (row[2] or "").lower() not in invoice_types:
+            continue
+        try:
+            properties.append(json.loads(row[4]))
+            positions.append(position)
+        except (TypeError, ValueError):
+            continue
+    
+    frame = pd.DataFrame.from_records(properties, index=positions).reindex(pd.RangeIndex(len(rows)))
+    frame["entity_id"] = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    frame["entity_type"] = pd.Series([row[1] for row in rows], dtype="string")
+    frame["event_type"] = pd.Series([row[2] for row in rows], dtype="string").str.lower()
+    frame["timestamp"] = pd.Series([row[3] for row in rows], dtype="object")
+    
+    frame = coerce_columns(frame, {"timestamp": "datetime", **ENTITY_EVENT_PROPERTIES})
+    return frame[["entity_id", "entity_type", "event_type", "timestamp", *ENTITY_EVENT_PROPERTIES]]
+
+
+def coerce_columns(frame: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+    """Cast source columns to their declared types, filling absent ones with nulls"""
+    for column, dtype in columns.items():
+        if column not in frame:
+            for alias in COLUMN_ALIASES.get(column, []):
+                if alias in frame:
+                    frame[column] = frame[alias]
+                    break
+        
+        values = frame[column] if column in frame else pd.Series(pd.NA, index=frame.index)
+        if dtype == "datetime":
+            frame[column] = pd.to_datetime(values, errors="coerce", utc=True).dt.tz_localize(None)
+        elif dtype == "float":
+            frame[column] = pd.to_numeric(values, errors="coerce").astype("float64")
+        else:
+            frame[column] = values.astype("string").replace({"nan": pd.NA, "": pd.NA})
+    
+    return frame
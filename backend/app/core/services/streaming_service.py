@@ -0,0 +1,261 @@
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import json
+import math
+import pandas as pd
+from app.config import settings
+from app.core.db import bulk_insert
+from app.core.models import StreamingStat, Signal
+from app.core.services.signal_history import SignalHistoryService
+from app.core.services.signal_sources import load_source_frame
+
+ORG_SUBJECT = "org"
+MAX_GAP_DAYS = 31  # empty days folded into a volume counter when it rolls over
+
+# Detector -> (source it observes, signal kind it raises)
+STREAMING_DETECTORS = {
+    "invoice_amount": ("invoices", "invoice_amount_anomaly"),
+    "ticket_volume": ("tickets", "ticket_volume_spike"),
+    "deal_stage_dwell": ("deals", "deal_stage_dwell_anomaly"),
+}
+STREAMING_SIGNAL_KINDS = [kind for _, kind in STREAMING_DETECTORS.values()]
+
+
+class StreamingSignalService:
+    """Service keeping constant-size running statistics per org and subject and flagging anomalies as data arrives"""
+    
+    def __init__(self, alpha: float = None, z_threshold: float = None, warmup: int = None,
+                 lookback_days: int = None):
+        self.alpha = alpha or settings.STREAMING_ALPHA
+        self.z_threshold = z_threshold or settings.STREAMING_Z_THRESHOLD
+        self.warmup = warmup or settings.STREAMING_WARMUP
+        self.lookback_days = lookback_days or settings.STREAMING_LOOKBACK_DAYS
+    
+    def observe_records(self, org_id: int, db: Session) -> List[Signal]:
+        """Feed raw records ingested since each detector's watermark through the detectors"""
+        anomalies = []
+        
+        for detector, (source, _) in STREAMING_DETECTORS.items():
+            watermark = self.get_watermark(org_id, detector, db)
+            frame = load_source_frame(org_id, source, db, min_record_id=watermark)
+            if frame.empty:
+                continue
+            anomalies.extend(self._observe(org_id, detector, frame, db))
+        
+        return self._persist(org_id, anomalies, db)
+    
+    def get_watermark(self, org_id: int, detector: str, db: Session) -> int:
+        """Highest RawRecord id a detector has observed"""
+        watermark = db.query(func.max(StreamingStat.last_record_id)).filter(
+            StreamingStat.org_id == org_id,
+            StreamingStat.detector == detector,
+            StreamingStat.subject == ORG_SUBJECT
+        ).scalar()
+        return watermark or 0
+    
+    def _observe(self, org_id: int, detector: str, frame: pd.DataFrame, db: Session) -> List[Dict[str, Any]]:
+        """Run one detector over a frame in event-time order, updating its stats in place"""
+        if detector == "invoice_amount":
+            times = frame["issued_at"].fillna(frame["ingested_at"])
+            subjects = [ORG_SUBJECT] + [f"account:{a}" for a in frame["account"].dropna().unique()]
+        elif detector == "ticket_volume":
+            times = frame["opened_at"].fillna(frame["ingested_at"])
+            subjects = [ORG_SUBJECT]
+        else:
+            times = frame["stage_changed_at"].fillna(frame["updated_at"]).fillna(frame["ingested_at"])
+            subjects = [ORG_SUBJECT] + [f"deal:{d}" for d in frame["deal_id"].dropna().unique()]
+        
+        frame = frame.assign(event_time=times).sort_values(["event_time", "record_id"], kind="stable")
+        stats = self._load_stats(org_id, detector, subjects, db, stage_prefix=detector == "deal_stage_dwell")
+        cutoff = datetime.utcnow() - timedelta(days=self.lookback_days)
+        
+        anomalies = []
+        for row in frame.to_dict("records"):
+            if pd.isna(row["event_time"]):
+                continue
+            event_time = row["event_time"].to_pydatetime()
+            
+            if detector == "invoice_amount":
+                anomaly = self._observe_invoice(org_id, stats, row, db)
+            elif detector == "ticket_volume":
+                anomaly = self._observe_ticket(org_id, stats, event_time, db)
+            else:
+                anomaly = self._observe_deal(org_id, stats, row, event_time, db)
+            
+            # Old events still train the statistics but do not raise signals
+            if anomaly and event_time >= cutoff:
+                anomaly.update(detector=detector, record_id=int(row["record_id"]), observed_at=event_time)
+                anomalies.append(anomaly)
+        
+        org_stat = self._stat(org_id, detector, ORG_SUBJECT, stats, db)
+        org_stat.last_record_id = max(org_stat.last_record_id or 0, int(frame["record_id"].max()))
+        return anomalies
+    
+    def _observe_invoice(self, org_id: int, stats: Dict[str, StreamingStat], row: Dict[str, Any],
+                         db: Session) -> Optional[Dict[str, Any]]:
+        """Track invoice amounts per org and per account; judge against the most specific warm subject"""
+        amount = row["amount"]
+        if pd.isna(amount):
+            return None
+        
+        subjects = [ORG_SUBJECT]
+        if not pd.isna(row["account"]):
+            subjects.insert(0, f"account:{row['account']}")
+        
+        anomaly = None
+        for subject in subjects:
+            stat = self._stat(org_id, "invoice_amount", subject, stats, db)
+            deviation = self._update(stat, float(amount))
+            if anomaly is None and deviation is not None:
+                anomaly = deviation if abs(deviation["z_score"]) >= self.z_threshold else {}
+                if anomaly:
+                    anomaly["subject"] = subject
+        
+        return anomaly or None
+    
+    def _observe_ticket(self, org_id: int, stats: Dict[str, StreamingStat], event_time: datetime,
+                        db: Session) -> Optional[Dict[str, Any]]:
+        """Count tickets per day and flag the first moment a day's volume spikes"""
+        stat = self._stat(org_id, "ticket_volume", ORG_SUBJECT, stats, db)
+        day = event_time.date()
+        
+        if stat.bucket_start is None:
+            stat.bucket_start = day
+            stat.bucket_count = 0
+        elif day > stat.bucket_start:
+            # Roll the counter over: the closed day and any empty days feed the statistics
+            self._update(stat, float(stat.bucket_count))
+            gap = min((day - stat.bucket_start).days - 1, MAX_GAP_DAYS)
+            for _ in range(gap):
+                self._update(stat, 0.0)
+            stat.bucket_start = day
+            stat.bucket_count = 0
+        elif day < stat.bucket_start:
+            # Late ticket for a day already folded in
+            return None
+        
+        stat.bucket_count += 1
+        stat.last_seen_at = event_time
+        
+        deviation = self._deviation(stat, float(stat.bucket_count))
+        if deviation is None or deviation["z_score"] < self.z_threshold or stat.state == day.isoformat():
+            return None
+        
+        stat.state = day.isoformat()
+        deviation.update(subject=ORG_SUBJECT, day=day.isoformat())
+        return deviation
+    
+    def _observe_deal(self, org_id: int, stats: Dict[str, StreamingStat], row: Dict[str, Any],
+                      event_time: datetime, db: Session) -> Optional[Dict[str, Any]]:
+        """Track each deal's current stage and learn how long deals dwell in each stage"""
+        if pd.isna(row["deal_id"]) or pd.isna(row["stage"]):
+            return None
+        
+        deal = self._stat(org_id, "deal_stage_dwell", f"deal:{row['deal_id']}", stats, db)
+        stage = str(row["stage"]).lower()
+        
+        if deal.state is None:
+            deal.state, deal.last_seen_at = stage, event_time
+            return None
+        if stage == deal.state or event_time <= deal.last_seen_at:
+            return None
+        
+        # The deal left its stage: its dwell time feeds that stage's statistics
+        previous_stage = deal.state
+        dwell_days = (event_time - deal.last_seen_at).total_seconds() / 86400
+        deal.state, deal.last_seen_at = stage, event_time
+        
+        stage_stat = self._stat(org_id, "deal_stage_dwell", f"stage:{previous_stage}", stats, db)
+        deviation = self._update(stage_stat, dwell_days)
+        if deviation is None or deviation["z_score"] < self.z_threshold:
+            return None
+        
+        deviation.update(subject=f"stage:{previous_stage}", deal_id=str(row["deal_id"]), next_stage=stage)
+        return deviation
+    
+    def _deviation(self, stat: StreamingStat, value: float) -> Optional[Dict[str, Any]]:
+        """How far a value sits from a warm subject's running mean, in standard deviations"""
+        if (stat.count or 0) < self.warmup or not stat.variance:
+            return None
+        
+        std = math.sqrt(stat.variance)
+        return {
+            "value": value,
+            "mean": stat.mean,
+            "std": std,
+            "z_score": (value - stat.mean) / std
+        }
+    
+    def _update(self, stat: StreamingStat, value: float) -> Optional[Dict[str, Any]]:
+        """Fold one value into the EWMA mean/variance; returns its deviation beforehand"""
+        deviation = self._deviation(stat, value)
+        count = (stat.count or 0) + 1
+        
+        if count == 1:
+            stat.mean, stat.variance = value, 0.0
+        else:
+            # Plain running average until the EWMA window is filled
+            alpha = max(self.alpha, 1.0 / count)
+            diff = value - stat.mean
+            increment = alpha * diff
+            stat.mean += increment
+            stat.variance = (1 - alpha) * (stat.variance + diff * increment)
+        
+        stat.count = count
+        stat.last_value = value
+        return deviation
+    
+    def _load_stats(self, org_id: int, detector: str, subjects: List[str], db: Session,
+                    stage_prefix: bool = False) -> Dict[str, StreamingStat]:
+        """Load the stats of the given subjects (and all stage stats) in one query"""
+        subject_filter = StreamingStat.subject.in_(subjects)
+        if stage_prefix:
+            subject_filter = or_(subject_filter, StreamingStat.subject.like("stage:%"))
+        
+        rows = db.query(StreamingStat).filter(
+            StreamingStat.org_id == org_id,
+            StreamingStat.detector == detector,
+            subject_filter
+        ).all()
+        return {row.subject: row for row in rows}
+    
+    def _stat(self, org_id: int, detector: str, subject: str, stats: Dict[str, StreamingStat],
+              db: Session) -> StreamingStat:
+        """Stat row of a subject, created empty on first sight"""
+        stat = stats.get(subject)
+        if stat is None:
+            stat = StreamingStat(org_id=org_id, detector=detector, subject=subject, count=0,
+                                 mean=0.0, variance=0.0, bucket_count=0, last_record_id=0)
+            db.add(stat)
+            stats[subject] = stat
+        return stat
+    
+    def _persist(self, org_id: int, anomalies: List[Dict[str, Any]], db: Session) -> List[Signal]:
+        """Write anomaly signals and the updated stats in one transaction"""
+        signals = []
+        for anomaly in anomalies:
+            kind = STREAMING_DETECTORS[anomaly.pop("detector")][1]
+            observed_at = anomaly.pop("observed_at")
+            # Score reaches the threshold exactly at the z-score threshold
+            score = min(1.0, abs(anomaly["z_score"]) / (2 * self.z_threshold))
+            signals.append(Signal(
+                org_id=org_id,
+                kind=kind,
+                period_start=observed_at,
+                period_end=observed_at,
+                payload=json.dumps(anomaly, default=str),
+                score=score,
+                threshold=0.5
+            ))
+        
+        try:
+            if signals:
+                SignalHistoryService().record(org_id, signals, db)
+                return bulk_insert(db, signals)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving streaming signals: {str(e)}")
+        return []
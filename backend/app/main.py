@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api.v1 import auth, sources, ingest, entities, narratives, signals, playbooks
+from app.core.services.signal_scheduler import signal_scheduler
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -27,6 +28,17 @@ app.include_router(signals.router, prefix=settings.API_V1_STR)
 app.include_router(playbooks.router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+async def start_signal_scheduler():
+    if settings.SIGNAL_SCHEDULER_ENABLED:
+        signal_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_signal_scheduler():
+    signal_scheduler.stop()
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Nour - Narrative Intelligence Platform"}
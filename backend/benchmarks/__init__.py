@@ -0,0 +1 @@
+# Benchmark harnesses for core services
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Entity resolution benchmark for Nour
+
+Generates labeled synthetic duplicate clusters, runs them through
+EntityResolver against an in-memory database and reports pairwise
+precision / recall / F1 together with throughput, peak memory and the
+time a fresh process needs to warm-start from the index snapshot.
+
+Usage (from the backend directory):
+    python -m benchmarks.resolver_benchmark --sizes 100 500 1000
+    python -m benchmarks.resolver_benchmark --name-threshold 0.75 --json
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+# Add the backend directory to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.core.models import Organization, RawRecord
+from app.core.services.resolver_index import ResolverIndexStore
+from app.core.services.resolver_service import EntityResolver
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Omar", "Fatima", "Yusuf", "Aisha",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas",
+    "Taylor", "Moore", "Jackson", "Martin", "Lee", "Haddad", "Nasser", "Khan", "Rahman",
+]
+COMPANY_WORDS = [
+    "Acme", "Global", "Tech", "Innovate", "Enterprise", "Blue", "Summit", "Vertex",
+    "Nova", "Apex", "Harbor", "Pioneer", "Quantum", "Sterling", "Atlas", "Orbit",
+]
+COMPANY_SUFFIXES = ["Corp", "Inc", "Ltd", "LLC", "Co", "Group", "Labs", "Systems"]
+DOMAINS = ["example.com", "mail.com", "corp.io", "acme.org", "startup.dev"]
+
+
+def _typo(value: str, rng: random.Random) -> str:
+    """Apply a single random character edit"""
+    if len(value) < 3:
+        return value
+    pos = rng.randrange(1, len(value) - 1)
+    edit = rng.choice(["swap", "delete", "insert", "replace"])
+    if edit == "swap":
+        return value[:pos] + value[pos + 1] + value[pos] + value[pos + 2:]
+    if edit == "delete":
+        return value[:pos] + value[pos + 1:]
+    if edit == "insert":
+        return value[:pos] + rng.choice(string.ascii_lowercase) + value[pos:]
+    return value[:pos] + rng.choice(string.ascii_lowercase) + value[pos + 1:]
+
+
+def _format_phone(digits: str, rng: random.Random) -> str:
+    """Render phone digits in one of several common formats"""
+    style = rng.randrange(3)
+    if style == 0:
+        return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+    if style == 1:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    return digits
+
+
+def _make_person(rng: random.Random) -> Dict[str, Any]:
+    """Create a clean person record"""
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    digits = "".join(rng.choice(string.digits) for _ in range(10))
+    return {
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{rng.randrange(100)}@{rng.choice(DOMAINS)}",
+        "phone": digits,
+    }
+
+
+def _make_company(rng: random.Random) -> Dict[str, Any]:
+    """Create a clean company record"""
+    return {
+        "company": f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_SUFFIXES)}",
+        "account": f"ACC{rng.randrange(10 ** 6):06d}",
+    }
+
+
+def _perturb(record: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Create a noisy duplicate of a clean record"""
+    dup = dict(record)
+    if "name" in dup:
+        if rng.random() < 0.5:
+            dup["name"] = _typo(dup["name"], rng)
+        if rng.random() < 0.3:
+            dup["name"] = dup["name"].upper()
+        if rng.random() < 0.3:
+            dup["email"] = _typo(dup["email"], rng)
+        if rng.random() < 0.2:
+            dup.pop("email")
+        dup["phone"] = _format_phone(record["phone"], rng)
+    if "company" in dup:
+        if rng.random() < 0.6:
+            dup["company"] = _typo(dup["company"], rng)
+        if rng.random() < 0.3:
+            dup["company"] = dup["company"].lower()
+    return dup
+
+
+def generate_dataset(size: int, dup_rate: float, seed: int) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Generate `size` records grouped into labeled duplicate clusters"""
+    rng = random.Random(seed)
+    records = []
+    labels = []
+    cluster_id = 0
+
+    while len(records) < size:
+        base = _make_person(rng) if rng.random() < 0.7 else _make_company(rng)
+        members = [base]
+        while rng.random() < dup_rate and len(members) < 6:
+            members.append(_perturb(base, rng))
+
+        for member in members[:size - len(records)]:
+            records.append(member)
+            labels.append(cluster_id)
+        cluster_id += 1
+
+    # Interleave clusters so duplicates do not arrive back to back
+    order = list(range(len(records)))
+    rng.shuffle(order)
+    return [records[i] for i in order], [labels[i] for i in order]
+
+
+def _pairs(counts: Counter) -> int:
+    """Number of unordered pairs within each group"""
+    return sum(n * (n - 1) // 2 for n in counts.values())
+
+
+def pairwise_scores(predicted: List[int], truth: List[int]) -> Dict[str, float]:
+    """Pairwise precision, recall and F1 of a clustering against labels"""
+    true_positive = _pairs(Counter(zip(predicted, truth)))
+    predicted_pairs = _pairs(Counter(predicted))
+    true_pairs = _pairs(Counter(truth))
+
+    precision = true_positive / predicted_pairs if predicted_pairs else 1.0
+    recall = true_positive / true_pairs if true_pairs else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def run_benchmark(size: int, dup_rate: float, seed: int, thresholds: Dict[str, float]) -> Dict[str, Any]:
+    """Resolve one synthetic dataset and collect quality and speed metrics"""
+    records, labels = generate_dataset(size, dup_rate, seed)
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    snapshot_dir = tempfile.TemporaryDirectory()
+
+    try:
+        org = Organization(name=f"benchmark-{size}", domain=f"bench-{size}.nour.local")
+        db.add(org)
+        db.commit()
+
+        raw_records = [
+            RawRecord(id=i + 1, dataset_id=0, source_pk=str(i), payload=json.dumps(record), status="processed")
+            for i, record in enumerate(records)
+        ]
+
+        resolver = EntityResolver(index_store=ResolverIndexStore(snapshot_dir.name))
+        for field, value in thresholds.items():
+            if value is not None:
+                setattr(resolver, field, value)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        entities = resolver.resolve_entities(raw_records, org.id, db)
+        elapsed = time.perf_counter() - started
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if len(entities) != len(records):
+            raise RuntimeError(f"Resolver returned {len(entities)} entities for {len(records)} records")
+
+        # Time a fresh process picking up the snapshot written by the run above
+        warm_started = time.perf_counter()
+        ResolverIndexStore(snapshot_dir.name).get(org.id, db)
+        warm_start = time.perf_counter() - warm_started
+
+        scores = pairwise_scores([entity.id for entity in entities], labels)
+        return {
+            "records": size,
+            "clusters": len(set(labels)),
+            "entities": len({entity.id for entity in entities}),
+            **scores,
+            "seconds": elapsed,
+            "records_per_sec": size / elapsed if elapsed > 0 else float("inf"),
+            "peak_memory_mb": peak_bytes / (1024 * 1024),
+            "warm_start_ms": warm_start * 1000,
+        }
+    finally:
+        db.close()
+        engine.dispose()
+        snapshot_dir.cleanup()
+
+
+def main():
+    """Main function to run the resolver benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark EntityResolver accuracy and throughput")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000], help="dataset sizes to run")
+    parser.add_argument("--dup-rate", type=float, default=0.5, help="probability of adding another duplicate to a cluster")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data generation")
+    parser.add_argument("--name-threshold", type=float, default=None)
+    parser.add_argument("--email-threshold", type=float, default=None)
+    parser.add_argument("--phone-threshold", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="emit results as JSON")
+    args = parser.parse_args()
+
+    thresholds = {
+        "name_threshold": args.name_threshold,
+        "email_threshold": args.email_threshold,
+        "phone_threshold": args.phone_threshold,
+    }
+
+    results = [run_benchmark(size, args.dup_rate, args.seed, thresholds) for size in args.sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'records':>8} {'clusters':>8} {'entities':>8} {'precision':>9} {'recall':>7} {'f1':>6} {'rec/s':>9} {'peak MB':>8} {'warm ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['records']:>8} {r['clusters']:>8} {r['entities']:>8} {r['precision']:>9.3f} "
+            f"{r['recall']:>7.3f} {r['f1']:>6.3f} {r['records_per_sec']:>9.1f} {r['peak_memory_mb']:>8.1f} {r['warm_start_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
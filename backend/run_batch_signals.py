@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Cross-tenant batch signal job for Nour
+Computes signals and evaluates rules for every active organization,
+sharding orgs across a process pool, and reports per-org timings
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.db import engine, Base
+from app.core.models import *  # Import all models
+from app.core.services.batch_jobs import run_batch
+
+def print_report(report):
+    """Print one org's outcome as it completes"""
+    print(
+        f"org {report['org_id']:>6} {report['status']:>8} "
+        f"signals {report.get('signals', 0):>3} (reused {report.get('reused', 0):>3}) "
+        f"triggered {report.get('triggered', 0):>3}/{report.get('rules', 0):<3} "
+        f"compute {report.get('compute_seconds', 0):>7.2f}s evaluate {report.get('evaluate_seconds', 0):>6.2f}s "
+        f"total {report['total_seconds']:>7.2f}s"
+    )
+    for error in report.get("errors", []):
+        print(f"    ⚠️  {error}")
+
+def main():
+    """Main function to run the batch signal job"""
+    parser = argparse.ArgumentParser(description="Compute signals and evaluate rules for all organizations")
+    parser.add_argument("--org-id", type=int, nargs="*", help="organizations to run (default: all active)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--signal-workers", type=int, default=1, help="signal threads inside each worker")
+    parser.add_argument("--period-days", type=int, default=90, help="length of the signal period")
+    parser.add_argument("--kinds", nargs="*", default=None, help="signal kinds to compute (default: all)")
+    parser.add_argument("--json", action="store_true", help="emit the reports as JSON")
+    args = parser.parse_args()
+    
+    Base.metadata.create_all(bind=engine)
+    
+    started = time.perf_counter()
+    reports = run_batch(
+        org_ids=args.org_id,
+        workers=args.workers,
+        period_days=args.period_days,
+        kinds=args.kinds,
+        signal_workers=args.signal_workers,
+        on_report=None if args.json else print_report
+    )
+    elapsed = time.perf_counter() - started
+    
+    if args.json:
+        print(json.dumps({"elapsed_seconds": elapsed, "orgs": reports}, indent=2))
+        return
+    
+    failed = sum(1 for report in reports if report["status"] == "failed")
+    print(f"\n✅ {len(reports)} orgs in {elapsed:.1f}s ({failed} failed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Signal scheduler worker for Nour
+Recomputes signals for every organization on a fixed cadence, as an
+alternative to running the scheduler inside the API process
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.config import settings
+from app.core.db import engine, Base
+from app.core.models import *  # Import all models
+from app.core.services.signal_scheduler import SignalScheduler
+
+def main():
+    """Main function to run the signal scheduler"""
+    parser = argparse.ArgumentParser(description="Recompute signals for every organization on a schedule")
+    parser.add_argument("--interval", type=int, default=settings.SIGNAL_SCHEDULE_INTERVAL_SECONDS, help="seconds between runs for each org")
+    parser.add_argument("--period-days", type=int, default=settings.SIGNAL_SCHEDULE_PERIOD_DAYS, help="length of the signal period")
+    parser.add_argument("--concurrency", type=int, default=settings.SIGNAL_SCHEDULER_CONCURRENCY, help="orgs computed at the same time")
+    parser.add_argument("--once", action="store_true", help="run every org once and exit")
+    args = parser.parse_args()
+    
+    Base.metadata.create_all(bind=engine)
+    scheduler = SignalScheduler(args.interval, args.period_days, args.concurrency)
+    
+    if args.once:
+        outcomes = scheduler.run_all()
+        for org_id, outcome in outcomes.items():
+            print(f"org {org_id}: {outcome}")
+        return
+    
+    print(f"⏱️  Recomputing signals every {args.interval}s with {args.concurrency} concurrent orgs")
+    print("Press Ctrl+C to stop the scheduler")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+if __name__ == "__main__":
+    main()
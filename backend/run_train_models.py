@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Offline model training for Nour
+Fits the churn propensity model for each organization from its event
+history and saves it where signal computation picks it up
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.db import SessionLocal, engine, Base
+from app.core.models import *  # Import all models
+from app.core.services.churn_model import ChurnModelTrainer
+
+def main():
+    """Main function to train signal models"""
+    parser = argparse.ArgumentParser(description="Train churn propensity models from event history")
+    parser.add_argument("--org-id", type=int, nargs="*", help="organizations to train (default: all)")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None, help="feature cut-off (default: now minus the horizon)")
+    parser.add_argument("--horizon-days", type=int, default=90, help="days after the cut-off in which churn is labelled")
+    args = parser.parse_args()
+    
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    trainer = ChurnModelTrainer()
+    
+    try:
+        org_ids = args.org_id or [org_id for (org_id,) in db.query(Organization.id).order_by(Organization.id).all()]
+        for org_id in org_ids:
+            try:
+                metadata = trainer.train(org_id, db, args.as_of, args.horizon_days)
+                print(f"✅ org {org_id}: version {metadata['version']}, {metadata['entities']} entities, "
+                      f"{metadata['churned']} churned, holdout AUC {metadata['holdout_auc']:.3f}")
+            except ValueError as e:
+                print(f"⚠️  org {org_id}: skipped ({e})")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
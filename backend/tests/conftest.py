@@ -0,0 +1,43 @@
+"""Shared fixtures: an in-memory database with one organization"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.db import Base
+from app.core.models import Organization
+from app.core.services.rule_compiler import rule_cache
+
+
+@pytest.fixture
+def db():
+    """Session on a fresh in-memory SQLite database shared by every connection"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_rule_cache():
+    """Each test database reuses rule ids, so compiled rules must not leak between tests"""
+    rule_cache.clear()
+    yield
+    rule_cache.clear()
+
+
+@pytest.fixture
+def org(db):
+    """Organization owning the test data"""
+    org = Organization(name="Test Org", domain="test.example")
+    db.add(org)
+    db.commit()
+    return org
@@ -0,0 +1,111 @@
+"""Windows read from daily aggregates must equal the same windows computed from raw records"""
+
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.models import Dataset, RawRecord
+from app.core.services.aggregate_service import AggregateService
+from app.core.services.signal_service import SignalService
+
+
+def _stamp(rng, moment):
+    return moment.strftime("%Y-%m-%d") + f" {rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+
+
+@pytest.fixture
+def records(db, org):
+    """Deals, invoices and tickets over the last 200 days with time-of-day timestamps"""
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    sales, finance, support = [
+        Dataset(name=name, source_type="csv", acl_tag=tag, org_id=org.id)
+        for name, tag in [("Sales", "sales"), ("Invoices", "finance"), ("Tickets", "support")]
+    ]
+    db.add_all([sales, finance, support])
+    db.commit()
+
+    rows = []
+    for i in range(300):
+        created = now - timedelta(days=rng.randrange(200))
+        closed = created + timedelta(days=rng.randrange(5, 60)) if rng.random() < 0.5 else None
+        closed = closed if closed and closed < now else None
+        rows.append((sales, {
+            "deal_id": f"D{i}", "account": f"A{i % 40}", "amount": rng.randrange(1000, 90000),
+            "stage": "closed_won" if closed else rng.choice(["prospecting", "proposal", "negotiation"]),
+            "created_at": _stamp(rng, created), "closed_at": _stamp(rng, closed) if closed else None,
+            "owner": "owner", "touches": 3
+        }))
+    for i in range(400):
+        issued = now - timedelta(days=rng.randrange(200))
+        paid = issued + timedelta(days=rng.randrange(5, 50)) if rng.random() < 0.6 else None
+        paid = paid if paid and paid < now else None
+        rows.append((finance, {
+            "invoice_id": f"I{i}", "account": f"A{i % 40}", "amount": rng.randrange(100, 9000),
+            "issued_at": _stamp(rng, issued), "due_at": _stamp(rng, issued + timedelta(days=30)),
+            "paid_at": _stamp(rng, paid) if paid else None, "terms": "net30"
+        }))
+    for i in range(300):
+        opened = now - timedelta(days=rng.randrange(200))
+        # Recent ratings on a 1-5 scale, older ones on 1-10 or 0-100, plus out-of-range values
+        csat = rng.randint(1, 5) if (now - opened).days < 60 else rng.choice([rng.randint(1, 10), rng.uniform(0, 100), -3, 140])
+        rows.append((support, {
+            "ticket_id": f"T{i}", "account": f"A{i % 40}", "opened_at": _stamp(rng, opened),
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+            "status": rng.choice(["open", "resolved", "closed"]), "description": "d", "csat": csat
+        }))
+
+    db.add_all([
+        RawRecord(dataset_id=dataset.id, source_pk=str(position), status="processed", payload=json.dumps(payload))
+        for position, (dataset, payload) in enumerate(rows)
+    ])
+    db.commit()
+    return now
+
+
+def _flatten(value):
+    if value is None:
+        return [None]
+    if isinstance(value, (tuple, list)):
+        return [item for part in value for item in _flatten(part)]
+    if isinstance(value, dict):
+        return [item for key in sorted(value) for item in [key] + _flatten(value[key])]
+    return [value]
+
+
+def _same(left, right):
+    left, right = _flatten(left), _flatten(right)
+    return len(left) == len(right) and all(
+        a == b if not isinstance(a, float) and not isinstance(b, float) else math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+        for a, b in zip(left, right)
+    )
+
+
+def test_aggregate_windows_match_raw_windows(db, org, records, monkeypatch):
+    assert AggregateService().refresh(org.id, db) > 0
+    service = SignalService()
+    now = records
+
+    ends = [now, now.replace(hour=0, minute=0, second=0, microsecond=0), now - timedelta(days=33, hours=5)]
+    for end in ends:
+        for length in (7, 30, 90):
+            start = end - timedelta(days=length)
+            windows = []
+            for aggregated in (True, False):
+                monkeypatch.setattr(service, "_uses_aggregates", lambda ctx, aggregated=aggregated: aggregated)
+                ctx = service.build_context(org.id, start, end, db)
+                windows.append((
+                    service._invoice_window(ctx), service._ticket_window(ctx), service._satisfaction_window(ctx),
+                    service._deal_velocity_windows(ctx), service._won_revenue_windows(ctx),
+                    service._compute_customer_satisfaction(ctx)
+                ))
+            assert _same(*windows), (end, length, windows)
+
+
+def test_refresh_folds_each_record_once(db, org, records):
+    aggregates = AggregateService()
+    assert aggregates.refresh(org.id, db) > 0
+    assert aggregates.refresh(org.id, db) == 0
@@ -0,0 +1,101 @@
+"""Incremental rule evaluation must report what a full evaluation finds, each trigger once"""
+
+import json
+import random
+from datetime import datetime
+
+from app.core.models import Rule, Signal
+from app.core.services.incremental_rules import IncrementalRuleEvaluator
+from app.core.services.rule_engine import RuleEngine
+
+KINDS = ["a", "b", "c", "d"]
+
+
+def add_signals(db, org, rng, count):
+    now = datetime.utcnow()
+    db.add_all([
+        Signal(org_id=org.id, kind=rng.choice(KINDS), score=0.5, threshold=0.5, period_start=now, period_end=now,
+               payload=json.dumps({"x": rng.randint(0, 12), "y": rng.randint(0, 12)}))
+        for _ in range(count)
+    ])
+    db.commit()
+
+
+def random_when(rng):
+    def condition():
+        return {"signal": rng.choice(KINDS), "where": {rng.choice(["x", "y"]): {rng.choice(["gte", "lt"]): rng.randint(0, 10)}}}
+    return rng.choice([
+        {"all": [condition() for _ in range(rng.randint(1, 3))]},
+        {"any": [condition() for _ in range(2)]},
+        {"not": condition()},
+        condition()
+    ])
+
+
+def test_incremental_matches_full_evaluation(db, org):
+    rng = random.Random(3)
+    rules = [
+        Rule(org_id=org.id, name=f"r{i}", definition=json.dumps({
+            "name": f"r{i}", "when": random_when(rng), "narrative_template": "{rule_name} {a_x}"
+        }))
+        for i in range(80)
+    ]
+    db.add_all(rules)
+    db.commit()
+
+    incremental, engine = IncrementalRuleEvaluator(), RuleEngine()
+    reported = set()
+    for step in range(10):
+        add_signals(db, org, rng, rng.choice([0, 1, 3]))
+        if step == 4:
+            db.add(Rule(org_id=org.id, name="late", definition=json.dumps({
+                "name": "late", "when": {"signal": "a", "where": {"x": {"gte": 0}}}, "narrative_template": "late"
+            })))
+            db.commit()
+        if step == 6:
+            # An edited rule is a new rule version and may trigger again
+            rules[0].definition = json.dumps({"name": "r0", "when": {"signal": "b"}, "narrative_template": "edited"})
+            db.commit()
+            reported.discard(rules[0].id)
+
+        active = db.query(Rule).filter(Rule.org_id == org.id, Rule.enabled == True).all()
+        signals = db.query(Signal).filter(Signal.org_id == org.id).all()
+        full = {result["rule_id"]: result for result in engine.evaluate_rules(active, signals, db) if result["triggered"]}
+        new = {result["rule_id"]: result for result in incremental.evaluate(org.id, active, db)["results"]}
+
+        assert set(new) == set(full) - reported, step
+        assert all(new[rule_id]["narrative"] == full[rule_id]["narrative"] for rule_id in new)
+        reported |= set(new)
+
+    assert reported
+
+
+def test_workers_share_reported_triggers(db, org):
+    db.add_all([
+        Rule(org_id=org.id, name=f"r{kind}", definition=json.dumps({"name": f"r{kind}", "when": {"signal": kind}, "narrative_template": kind}))
+        for kind in "abc"
+    ])
+    db.commit()
+    first, second = IncrementalRuleEvaluator(), IncrementalRuleEvaluator()
+    rng = random.Random(1)
+
+    def new_triggers(worker):
+        return sorted(result["rule_name"] for result in worker.evaluate(org.id, db.query(Rule).all(), db)["results"])
+
+    def add(kind):
+        now = datetime.utcnow()
+        db.add(Signal(org_id=org.id, kind=kind, payload="{}", score=rng.random(), threshold=0.5, period_start=now, period_end=now))
+        db.commit()
+
+    add("a")
+    assert new_triggers(first) == ["ra"]
+    assert new_triggers(second) == []
+
+    add("b")
+    assert new_triggers(second) == ["rb"]
+    assert new_triggers(first) == []
+
+    add("c")
+    add("a")
+    assert new_triggers(first) == ["rc"]
+    assert new_triggers(second) == []
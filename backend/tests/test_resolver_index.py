@@ -0,0 +1,73 @@
+"""Resolver index snapshots: save, load, rebase across processes and catch-up with the database"""
+
+import hashlib
+import json
+
+from app.core.models import Entity, RawRecord
+from app.core.services.resolver_index import ResolverIndexStore
+from app.core.services.resolver_service import EntityResolver
+
+
+def people(prefix, count):
+    """Records of distinct people; the same prefix and position always describe the same person"""
+    records = []
+    for i in range(count):
+        token = hashlib.sha1(f"{prefix}{i}".encode()).hexdigest()
+        records.append(RawRecord(payload=json.dumps({"name": f"{token[:8]} {token[8:16]}", "email": f"{token[16:26]}@{token[26:32]}.io"})))
+    return records
+
+
+def generation(directory, org):
+    with open(directory / f"org_{org.id}" / "header.json") as f:
+        return json.load(f)["generation"]
+
+
+def test_snapshot_save_load_and_rebase(db, org, tmp_path):
+    first = EntityResolver(ResolverIndexStore(str(tmp_path)))
+    assert len(first.resolve_entities(people("a", 30), org.id, db)) == 30
+    saved = generation(tmp_path, org)
+
+    # Nothing changed, so no new generation is written
+    first.resolve_entities([], org.id, db)
+    assert generation(tmp_path, org) == saved
+
+    # A second process saves on top of the first one's snapshot, then the first rebases onto it
+    second = EntityResolver(ResolverIndexStore(str(tmp_path)))
+    second.resolve_entities(people("b", 10), org.id, db)
+    first.resolve_entities(people("c", 5), org.id, db)
+    assert generation(tmp_path, org) == saved + 2
+
+    third = ResolverIndexStore(str(tmp_path))
+    loaded = third.get(org.id, db)
+    stored = {entity_id for (entity_id,) in db.query(Entity.id).filter(Entity.org_id == org.id)}
+    assert len(loaded) == len(stored) == 45
+    assert loaded.entity_ids() == stored
+
+    # The rebased snapshot kept the older watermark, so one more save settles it
+    third.save(org.id)
+    assert not ResolverIndexStore(str(tmp_path)).get(org.id, db).dirty
+
+    # Records seen by the other process match its entities instead of creating new ones
+    first.resolve_entities(people("b", 3), org.id, db)
+    assert db.query(Entity).count() == 45
+
+
+def test_deleted_entities_leave_the_index(db, org, tmp_path):
+    store = ResolverIndexStore(str(tmp_path))
+    EntityResolver(store).resolve_entities(people("a", 10), org.id, db)
+
+    victim = db.query(Entity).first()
+    db.delete(victim)
+    db.commit()
+
+    # A fresh process loading the stale snapshot drops the entity on catch-up
+    loaded = ResolverIndexStore(str(tmp_path)).get(org.id, db)
+    assert victim.id not in loaded.entity_ids()
+    assert len(loaded) == 9
+
+
+def test_matching_does_not_depend_on_leading_characters(db, org, tmp_path):
+    resolver = EntityResolver(ResolverIndexStore(str(tmp_path)))
+    resolver.resolve_entities([RawRecord(payload=json.dumps({"name": "Katherine Jones"}))], org.id, db)
+    resolver.resolve_entities([RawRecord(payload=json.dumps({"name": "Catherine Jones"}))], org.id, db)
+    assert db.query(Entity).count() == 1
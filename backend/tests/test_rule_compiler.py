@@ -0,0 +1,149 @@
+"""Compiled `when` clauses must agree with the interpreter they replaced"""
+
+import json
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from app.config import settings
+from app.core.models import Signal
+from app.core.services.rule_compiler import SignalIndex, compile_definition
+
+KINDS = ["churn", "payment", "ticket"]
+FIELDS = ["score", "count", "tags", "label"]
+OPERATORS = ["gte", "lte", "gt", "lt", "eq", "ne", "in"]
+
+
+def interpret(conditions: Dict, signals: List[Signal]) -> bool:
+    """The rule engine's original interpreter: a single condition or one flat all / any list"""
+    if not conditions:
+        return True
+    if "all" in conditions:
+        return all(_condition(condition, signals) for condition in conditions["all"])
+    if "any" in conditions:
+        return any(_condition(condition, signals) for condition in conditions["any"])
+    return _condition(conditions, signals)
+
+
+def interpret_nested(node: Dict, signals: List[Signal]) -> bool:
+    """The original interpreter applied recursively, with `not` negating its child"""
+    if "all" in node:
+        return all(interpret_nested(child, signals) for child in node["all"])
+    if "any" in node:
+        return any(interpret_nested(child, signals) for child in node["any"])
+    if "not" in node:
+        return not interpret_nested(node["not"], signals)
+    return _condition(node, signals)
+
+
+def _condition(condition: Dict, signals: List[Signal]) -> bool:
+    kind = condition.get("signal")
+    if not kind:
+        return False
+    matching = [signal for signal in signals if signal.kind == kind]
+    if not matching:
+        return False
+    return all(_where(field, criteria, matching) for field, criteria in (condition.get("where") or {}).items())
+
+
+def _where(field: str, criteria: Dict, signals: List[Signal]) -> bool:
+    for signal in signals:
+        try:
+            value = json.loads(signal.payload).get(field)
+            if value is not None and _criteria(value, criteria):
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def _criteria(value: Any, criteria: Dict) -> bool:
+    for name, threshold in criteria.items():
+        if name == "gte" and not value >= threshold:
+            return False
+        if name == "lte" and not value <= threshold:
+            return False
+        if name == "gt" and not value > threshold:
+            return False
+        if name == "lt" and not value < threshold:
+            return False
+        if name == "eq" and not value == threshold:
+            return False
+        if name == "ne" and not value != threshold:
+            return False
+        if name == "in" and value not in threshold:
+            return False
+        if name == "count" and not _criteria(len(value) if isinstance(value, (list, tuple)) else 1, threshold):
+            return False
+    return True
+
+
+def random_condition(rng: random.Random) -> Dict:
+    condition = {"signal": rng.choice(KINDS + [""])}
+    where = {}
+    for _ in range(rng.randint(0, 2)):
+        field = rng.choice(FIELDS)
+        if rng.random() < 0.15:
+            where[field] = {"count": {rng.choice(["gte", "lt"]): rng.randint(0, 3)}}
+        elif rng.random() < 0.15:
+            where[field] = {"in": rng.choice([[1, 2, 3], ["a", "b"], "abc"])}
+        else:
+            where[field] = {rng.choice(OPERATORS[:-1]): rng.choice([rng.randint(0, 10), "b"])}
+    if where or rng.random() < 0.5:
+        condition["where"] = where
+    return condition
+
+
+def random_node(rng: random.Random, depth: int) -> Dict:
+    roll = rng.random()
+    if depth == 0 or roll < 0.4:
+        return random_condition(rng)
+    if roll < 0.6:
+        return {"not": random_node(rng, depth - 1)}
+    return {rng.choice(["all", "any"]): [random_node(rng, depth - 1) for _ in range(rng.randint(0, 3))]}
+
+
+def random_signals(rng: random.Random) -> List[Signal]:
+    signals = []
+    for position in range(rng.randint(0, 6)):
+        payload = {field: rng.choice([rng.randint(0, 10), None, "a", "c", [1, 2], 4.5]) for field in FIELDS if rng.random() < 0.7}
+        text = "not json" if rng.random() < 0.05 else json.dumps(payload)
+        signals.append(Signal(id=position + 1, kind=rng.choice(KINDS), payload=text))
+    return signals
+
+
+@pytest.fixture(autouse=True)
+def frequent_reorder(monkeypatch):
+    """Re-sort conditions often so reordered trees are compared too"""
+    monkeypatch.setattr(settings, "RULE_REORDER_INTERVAL", 5)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_flat_when_matches_original_interpreter(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        roll = rng.random()
+        if roll < 0.1:
+            when = {}
+        elif roll < 0.4:
+            when = random_condition(rng)
+        else:
+            when = {rng.choice(["all", "any"]): [random_condition(rng) for _ in range(rng.randint(0, 4))]}
+        compiled = compile_definition({"name": "r", "when": when, "then": {"narrative_template": ""}})
+
+        for _ in range(30):
+            signals = random_signals(rng)
+            assert compiled.predicate(SignalIndex(signals)) == interpret(when, signals), when
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_nested_when_matches_recursive_interpreter(seed):
+    rng = random.Random(100 + seed)
+    for _ in range(40):
+        when = random_node(rng, 3)
+        compiled = compile_definition({"name": "r", "when": when, "then": {"narrative_template": ""}})
+
+        for _ in range(30):
+            signals = random_signals(rng)
+            assert compiled.predicate(SignalIndex(signals)) == interpret_nested(when, signals), when
@@ -0,0 +1,70 @@
+"""Rule pack import: all-or-nothing validation, and skip or replace of existing rules"""
+
+import json
+
+import pytest
+import yaml
+
+from app.core.models import Rule
+from app.core.services.rule_compiler import rule_cache
+from app.core.services.rule_pack_service import RulePackError, RulePackService
+
+
+def pack_rule(name, threshold=1, **columns):
+    return {
+        "name": name,
+        "when": {"signal": "churn", "where": {"score": {"gte": threshold}}},
+        "then": {"narrative_template": f"{name} at {threshold}", "actions": ["notify"]},
+        **columns
+    }
+
+
+def test_valid_pack_creates_rules_and_warms_cache(db, org):
+    rules = [pack_rule(f"r{i}", i, priority=i, category="sales") for i in range(5)]
+    result = RulePackService().import_pack(org.id, yaml.safe_dump({"rules": rules}), db, filename="pack.yaml")
+
+    assert result["created"] == 5 and result["updated"] == 0 and result["skipped"] == []
+    stored = {rule.name: rule for rule in db.query(Rule).filter(Rule.org_id == org.id)}
+    assert sorted(stored) == [f"r{i}" for i in range(5)]
+    assert stored["r3"].priority == 3 and stored["r3"].category == "sales"
+    assert len(rule_cache) == 5
+
+
+def test_invalid_pack_is_rejected_whole(db, org):
+    entries = [
+        pack_rule("ok"),
+        pack_rule("dup"),
+        pack_rule("dup"),
+        pack_rule("flag", priority=True),
+        "not a rule",
+    ]
+    with pytest.raises(RulePackError) as raised:
+        RulePackService().import_pack(org.id, json.dumps(entries), db, filename="pack.json")
+
+    assert sorted(error["index"] for error in raised.value.errors) == [2, 3, 4]
+    assert db.query(Rule).count() == 0
+
+
+@pytest.mark.parametrize("content", ["rules: [", "rules: 1", "42"])
+def test_malformed_pack_is_rejected(db, org, content):
+    with pytest.raises(RulePackError):
+        RulePackService().import_pack(org.id, content, db, filename="pack.yaml")
+    assert db.query(Rule).count() == 0
+
+
+def test_existing_rules_are_skipped_unless_replaced(db, org):
+    service = RulePackService()
+    service.import_pack(org.id, json.dumps([pack_rule("kept", 1), pack_rule("other", 1)]), db)
+
+    result = service.import_pack(org.id, json.dumps([pack_rule("kept", 5), pack_rule("new", 1)]), db)
+    assert result["created"] == 1 and result["updated"] == 0 and result["skipped"] == ["kept"]
+    kept = db.query(Rule).filter(Rule.name == "kept").one()
+    assert json.loads(kept.definition)["when"]["where"]["score"] == {"gte": 1}
+
+    result = service.import_pack(org.id, json.dumps([pack_rule("kept", 7, priority=2)]), db, replace=True)
+    assert result["created"] == 0 and result["updated"] == 1
+    db.refresh(kept)
+    assert json.loads(kept.definition)["when"]["where"]["score"] == {"gte": 7}
+    assert kept.priority == 2
+    assert rule_cache.get(kept).template.source == "kept at 7"
+    assert db.query(Rule).filter(Rule.org_id == org.id).count() == 3